@@ -0,0 +1,195 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Callable, Optional
+
+from stock_agent.utils.trace_util import registry
+
+# Graph runs allowed at once across all clients (each fans out to four agents and dozens of provider calls)
+MAX_CONCURRENT_RUNS = int(os.environ.get("STOCK_AGENT_MAX_CONCURRENT_RUNS", "4"))
+# Runs one client may have running or queued
+MAX_RUNS_PER_CLIENT = int(os.environ.get("STOCK_AGENT_MAX_RUNS_PER_CLIENT", "2"))
+MAX_QUEUE = int(os.environ.get("STOCK_AGENT_ADMISSION_QUEUE", "32"))
+# Requests whose predicted (or actual) wait exceeds this are rejected with 429 instead of queueing
+MAX_WAIT = float(os.environ.get("STOCK_AGENT_ADMISSION_MAX_WAIT_SECONDS", "60"))
+# Starting guess for a run's duration, replaced by an EWMA of observed runs
+INITIAL_SERVICE_SECONDS = 90.0
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+IN_FLIGHT = registry.gauge("stock_agent_admission_in_flight", "Graph runs currently admitted.")
+QUEUE_DEPTH = registry.gauge("stock_agent_admission_queue_depth", "Requests waiting for a run slot.", ("priority",))
+REJECTED = registry.counter(
+    "stock_agent_admission_rejected_total", "Requests rejected by admission control.", ("reason", "priority"))
+WAIT_SECONDS = registry.histogram("stock_agent_admission_wait_seconds", "Time spent queued before admission.", ("priority",))
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Rejected by admission control: {reason}")
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class Ticket:
+    """A granted run slot. release() is idempotent."""
+
+    def __init__(self, controller: "AdmissionController", client_id: Optional[str]):
+        self._controller = controller
+        self.client_id = client_id
+        self.granted_at = time.monotonic()
+        self.released = False
+
+    def release(self, observe: bool = True):
+        """Free the slot; observe=False keeps unused slots out of the service-time estimate."""
+        if not self.released:
+            self.released = True
+            self._controller._release(self, observe)
+
+    async def guard(self, source: AsyncIterator[dict]) -> AsyncIterator[dict]:
+        """Hold the slot while `source` runs; release it however the run ends."""
+        try:
+            async for event in source:
+                yield event
+        finally:
+            self.release()
+
+
+class _Waiter:
+    __slots__ = ("priority", "client_id", "future", "enqueued_at")
+
+    def __init__(self, priority: int, client_id: Optional[str], future: asyncio.Future):
+        self.priority = priority
+        self.client_id = client_id
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class AdmissionController:
+    """
+    Bounds concurrent graph runs. Requests over the limit wait in a bounded priority queue
+    (interactive before batch, FIFO within a priority). A request is turned away up front when
+    its client is over quota, the queue is full, or its predicted wait exceeds the deadline,
+    and turned away later if the deadline passes while it waits.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_RUNS,
+        per_client: int = MAX_RUNS_PER_CLIENT,
+        max_queue: int = MAX_QUEUE,
+        max_wait: float = MAX_WAIT,
+        service_estimate: float = INITIAL_SERVICE_SECONDS,
+    ):
+        self.max_concurrent = max_concurrent
+        self.per_client = per_client
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.service_estimate = service_estimate
+        self.active = 0
+        self._heap: list = []  # (priority, seq, waiter); cancelled waiters are skipped lazily
+        self._seq = itertools.count()
+        self._queued = defaultdict(int)  # priority -> live waiters
+        self._per_client = defaultdict(int)  # client -> running + queued
+
+    def queue_depth(self) -> int:
+        return sum(self._queued.values())
+
+    def estimate_wait(self, ahead: int) -> float:
+        """Predicted wait for a request with `ahead` waiters in front of it."""
+        return (ahead + 1) / self.max_concurrent * self.service_estimate
+
+    async def acquire(self, client_id: Optional[str] = None, priority: str = "interactive", max_wait: Optional[float] = -1) -> Ticket:
+        """
+        Wait for a run slot. max_wait=-1 uses the controller default; None waits indefinitely
+        and skips the queue bound (durable jobs). client_id=None skips the per-client quota.
+        """
+        level = PRIORITIES[priority]
+        max_wait = self.max_wait if max_wait == -1 else max_wait
+        if client_id is not None and self._per_client.get(client_id, 0) >= self.per_client:
+            self._reject("client_quota", priority, self.service_estimate)
+
+        ahead = sum(n for p, n in self._queued.items() if p <= level)
+        if self.active < self.max_concurrent and ahead == 0:
+            return self._grant(client_id)
+        if max_wait is not None:
+            estimate = self.estimate_wait(ahead)
+            if self.queue_depth() >= self.max_queue:
+                self._reject("queue_full", priority, estimate)
+            if estimate > max_wait:
+                self._reject("deadline", priority, estimate)
+
+        waiter = _Waiter(level, client_id, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, (level, next(self._seq), waiter))
+        self._enqueue(waiter, priority)
+        try:
+            await asyncio.wait_for(waiter.future, timeout=max_wait)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                waiter.future.result().release(observe=False)  # granted as the deadline passed
+            else:
+                self._dequeue(waiter, priority)
+            self._reject("timeout", priority, self.estimate_wait(self.queue_depth()))
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                waiter.future.result().release(observe=False)  # granted just as the client went away
+            else:
+                self._dequeue(waiter, priority)
+            raise
+        WAIT_SECONDS.observe(time.monotonic() - waiter.enqueued_at, priority=priority)
+        return waiter.future.result()
+
+    def _grant(self, client_id: Optional[str], counted: bool = False) -> Ticket:
+        self.active += 1
+        if client_id is not None and not counted:
+            self._per_client[client_id] += 1
+        IN_FLIGHT.set(self.active)
+        return Ticket(self, client_id)
+
+    def _enqueue(self, waiter: _Waiter, priority: str):
+        self._queued[waiter.priority] += 1
+        if waiter.client_id is not None:
+            self._per_client[waiter.client_id] += 1
+        QUEUE_DEPTH.set(self._queued[waiter.priority], priority=priority)
+
+    def _dequeue(self, waiter: _Waiter, priority: str):
+        self._queued[waiter.priority] -= 1
+        self._forget_client(waiter.client_id)
+        QUEUE_DEPTH.set(self._queued[waiter.priority], priority=priority)
+
+    def _forget_client(self, client_id: Optional[str]):
+        if client_id is None:
+            return
+        self._per_client[client_id] -= 1
+        if self._per_client[client_id] <= 0:
+            del self._per_client[client_id]
+
+    def _reject(self, reason: str, priority: str, retry_after: float):
+        REJECTED.inc(reason=reason, priority=priority)
+        raise AdmissionRejected(reason, retry_after)
+
+    def _release(self, ticket: Ticket, observe: bool = True):
+        self.active -= 1
+        self._forget_client(ticket.client_id)
+        if observe:
+            duration = time.monotonic() - ticket.granted_at
+            self.service_estimate = 0.8 * self.service_estimate + 0.2 * duration
+        IN_FLIGHT.set(self.active)
+        # Hand freed slots to the best waiting request
+        while self._heap and self.active < self.max_concurrent:
+            _, _, waiter = heapq.heappop(self._heap)
+            if waiter.future.done():
+                continue  # timed out or cancelled; already dequeued
+            name = next(n for n, p in PRIORITIES.items() if p == waiter.priority)
+            self._queued[waiter.priority] -= 1
+            QUEUE_DEPTH.set(self._queued[waiter.priority], priority=name)
+            waiter.future.set_result(self._grant(waiter.client_id, counted=True))
+
+
+def admitted(ticket: Ticket, source: Callable[[str], AsyncIterator[dict]]) -> Callable[[str], AsyncIterator[dict]]:
+    """Wrap a run source so the ticket's slot is held for exactly the run's lifetime."""
+    return lambda run_id: ticket.guard(source(run_id))
@@ -0,0 +1,188 @@
+import asyncio
+import fcntl
+import os
+import struct
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Callable, Optional, Set
+
+# in-process: single worker (default). unix: fan events out across `uvicorn --workers N`
+# processes on one host through a Unix-domain socket hub; no external service needed.
+BROKER_KIND = os.environ.get("STOCK_AGENT_BROKER", "inprocess")
+BROKER_PATH = os.environ.get("STOCK_AGENT_BROKER_PATH", os.path.join(tempfile.gettempdir(), "stock_agent_broker.sock"))
+# Bytes allowed to queue towards one peer before its events are dropped (slow peer protection)
+MAX_PEER_BUFFER = 4 * 1024 * 1024
+RECONNECT_DELAY = 0.2
+
+_LENGTH = struct.Struct("!I")
+
+Handler = Callable[[str, str], None]
+
+
+class Broker(ABC):
+    """
+    Pub/sub for run events. publish() may be called from any worker process; `handler`
+    (the local ConnectionManager) is called in every process with each (topic, message).
+    Both publish() and the handler run on the event loop thread.
+    """
+
+    def __init__(self):
+        self.handler: Optional[Handler] = None
+        self.published = 0
+        self.dropped = 0
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    def publish(self, topic: str, message: str):
+        ...
+
+    def _deliver(self, topic: str, message: str):
+        if self.handler is not None:
+            self.handler(topic, message)
+
+
+class InProcessBroker(Broker):
+    """Delivers straight to the local handler; only correct with a single worker process."""
+
+    def publish(self, topic: str, message: str):
+        self.published += 1
+        self._deliver(topic, message)
+
+
+class UnixSocketBroker(Broker):
+    """
+    Cross-process broker for the workers of one host. The first worker to take the lock
+    file hosts a hub on a Unix-domain socket; the others connect to it. Every frame a worker
+    publishes is delivered locally at once and relayed by the hub to all other workers.
+    If the hub worker exits, the OS releases its lock and a remaining worker takes over.
+    """
+
+    def __init__(self, path: str = BROKER_PATH):
+        super().__init__()
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.is_hub = False
+        self._lock_fd: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._upstream: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
+    async def start(self, timeout: float = 5.0):
+        self._task = asyncio.create_task(self._maintain())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            print(f"ERROR: Broker could not reach {self.path} within {timeout}s; events stay local until it does.")
+        print(f"INFO: UnixSocketBroker ready (pid={os.getpid()}, hub={self.is_hub}, path={self.path})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        for writer in list(self._peers) + ([self._upstream] if self._upstream else []):
+            writer.close()
+        if self._server is not None:
+            self._server.close()
+            if self.is_hub and os.path.exists(self.path):
+                os.unlink(self.path)
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # releases the flock
+            self._lock_fd = None
+
+    def publish(self, topic: str, message: str):
+        self.published += 1
+        self._deliver(topic, message)
+        frame = _encode(topic, message)
+        if self.is_hub:
+            for peer in self._peers:
+                self._write(peer, frame)
+        elif self._upstream is not None:
+            self._write(self._upstream, frame)
+        else:
+            self.dropped += 1  # between hubs; local subscribers still got it
+
+    def _write(self, writer: asyncio.StreamWriter, frame: bytes):
+        if writer.transport.get_write_buffer_size() > MAX_PEER_BUFFER:
+            self.dropped += 1
+            return
+        writer.write(frame)
+
+    def _try_lock(self) -> bool:
+        fd = os.open(self.lock_path, os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    async def _maintain(self):
+        # Re-elect whenever the connection to the hub is lost
+        while True:
+            if self._try_lock():
+                await self._host()
+                return
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                await asyncio.sleep(RECONNECT_DELAY)  # hub still binding, or a stale socket file
+                continue
+            self._upstream = writer
+            self._ready.set()
+            async for topic, message, _ in _read_frames(reader):
+                self._deliver(topic, message)
+            self._upstream = None
+            print("INFO: Broker hub connection lost, re-electing.")
+
+    async def _host(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # we hold the lock, so this is a stale socket from a dead hub
+        self._server = await asyncio.start_unix_server(self._serve_peer, path=self.path)
+        self.is_hub = True
+        self._ready.set()
+        await self._server.serve_forever()
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._peers.add(writer)
+        try:
+            async for topic, message, frame in _read_frames(reader):
+                for peer in self._peers:
+                    if peer is not writer:
+                        self._write(peer, frame)
+                self._deliver(topic, message)
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+
+def _encode(topic: str, message: str) -> bytes:
+    body = topic.encode() + b"\n" + message.encode()
+    return _LENGTH.pack(len(body)) + body
+
+
+async def _read_frames(reader: asyncio.StreamReader):
+    """Yield (topic, message, raw frame) until the connection closes."""
+    while True:
+        try:
+            header = await reader.readexactly(_LENGTH.size)
+            body = await reader.readexactly(_LENGTH.unpack(header)[0])
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+        topic, _, message = body.partition(b"\n")
+        yield topic.decode(), message.decode(), header + body
+
+
+def make_broker(kind: str = BROKER_KIND) -> Broker:
+    if kind == "inprocess":
+        return InProcessBroker()
+    if kind == "unix":
+        return UnixSocketBroker()
+    raise ValueError(f"Unknown STOCK_AGENT_BROKER '{kind}' (expected 'inprocess' or 'unix')")
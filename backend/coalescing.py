@@ -0,0 +1,168 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Callable, Dict, Hashable, Optional
+
+from stock_agent.utils.trace_util import registry
+
+# A finished run is still shared for this many seconds, so near-simultaneous requests that
+# arrive just after it completes replay its buffer instead of starting a new graph run.
+COALESCE_WINDOW = float(os.environ.get("STOCK_AGENT_COALESCE_WINDOW_SECONDS", "30"))
+
+# Once the last subscriber disconnects, the run is cancelled unless someone reconnects within this grace period.
+CANCEL_GRACE = float(os.environ.get("STOCK_AGENT_CANCEL_GRACE_SECONDS", "5"))
+
+# Events kept per run for late joiners and Last-Event-ID reconnects; older ones are dropped.
+REPLAY_BUFFER_SIZE = int(os.environ.get("STOCK_AGENT_REPLAY_BUFFER_EVENTS", "2048"))
+
+COALESCED_REQUESTS = registry.counter(
+    "stock_agent_coalesced_requests_total", "Analysis requests that started a run or joined an identical one.", ("mode", "outcome"))
+
+
+def request_key(company: str, user_input: Optional[str], mode: str) -> tuple:
+    """Requests with the same key produce the same analysis and can share one run."""
+    prompt = user_input if user_input else f"Analyze {company} stock."
+    return (company.strip().upper(), " ".join(prompt.split()).lower(), mode)
+
+
+class SharedRun:
+    """
+    One in-flight run plus a bounded buffer of the events it has emitted, numbered from 1,
+    replayed to each subscriber from wherever it starts (or resumes) reading.
+    """
+
+    def __init__(self, key: Hashable, run_id: str, buffer_size: int = REPLAY_BUFFER_SIZE):
+        self.key = key
+        self.run_id = run_id
+        self.events: deque = deque(maxlen=buffer_size)  # (seq, event)
+        self.last_seq = 0
+        self.done = False
+        self.subscribers = 0
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.cancel_reason: Optional[str] = None
+        self._changed = asyncio.Event()
+
+    def append(self, event: dict):
+        self.last_seq += 1
+        self.events.append((self.last_seq, event))
+        self._notify()
+
+    def finish(self):
+        self.done = True
+        self.finished_at = time.monotonic()
+        self._notify()
+
+    def _notify(self):
+        # Wake every waiting subscriber; later waits use a fresh event
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def since(self, after: int) -> tuple[int, list]:
+        """(number of events after `after` no longer buffered, buffered events after `after`)."""
+        first = self.events[0][0] if self.events else self.last_seq + 1
+        missed = max(0, first - after - 1)
+        return missed, list(islice(self.events, max(0, after + 1 - first), None))
+
+    async def batches(self, after: int = 0) -> AsyncIterator[tuple[int, list]]:
+        """
+        Everything buffered after `after`, then live events until the run finishes. Events
+        that accumulate while the subscriber is busy are returned together as one batch.
+        """
+        while True:
+            missed, batch = self.since(after)
+            if batch or missed:
+                after = batch[-1][0] if batch else after + missed
+                yield missed, batch
+                continue
+            if self.done:
+                return
+            await self._changed.wait()
+
+
+class RunCoalescer:
+    """
+    Attaches identical concurrent requests to a single run. The run is driven by its own
+    task, so a subscriber disconnecting never cuts the stream short for the others; once
+    all of them are gone (and none reconnects within the grace period) the run is cancelled.
+    """
+
+    def __init__(self, window: float = COALESCE_WINDOW, cancel_grace: float = CANCEL_GRACE):
+        self.window = window
+        self.cancel_grace = cancel_grace
+        self.runs: Dict[Hashable, SharedRun] = {}
+        self.by_id: Dict[str, SharedRun] = {}
+
+    def attach(self, key: Hashable, source: Callable[[str], AsyncIterator[dict]]) -> SharedRun:
+        """
+        Return the shared run for `key`, starting `source(run_id)` if there is none
+        (or the last one finished more than `window` seconds ago).
+        """
+        self._evict()
+        mode = key[-1] if isinstance(key, tuple) else ""
+        run = self.runs.get(key)
+        if run is not None:
+            COALESCED_REQUESTS.inc(mode=mode, outcome="joined")
+            print(f"DEBUG: Coalesced request onto run {run.run_id} ({len(run.events)} events buffered).")
+            return run
+        run = SharedRun(key, uuid.uuid4().hex)
+        self.runs[key] = run
+        self.by_id[run.run_id] = run
+        run.task = asyncio.create_task(self._produce(run, source))
+        COALESCED_REQUESTS.inc(mode=mode, outcome="started")
+        return run
+
+    def lookup(self, key: Hashable) -> Optional[SharedRun]:
+        """The run a request with `key` would join, if any."""
+        self._evict()
+        return self.runs.get(key)
+
+    def get(self, run_id: str) -> Optional[SharedRun]:
+        """The run with `run_id` if it is still running or within the window (for reconnects)."""
+        self._evict()
+        return self.by_id.get(run_id)
+
+    async def stream(self, run: SharedRun, after: int = 0) -> AsyncIterator[tuple[int, list]]:
+        run.subscribers += 1
+        try:
+            async for missed, batch in run.batches(after):
+                yield missed, batch
+        finally:
+            run.subscribers -= 1
+            if run.subscribers == 0 and not run.done:
+                asyncio.get_running_loop().call_later(self.cancel_grace, self._cancel_if_abandoned, run)
+
+    def _cancel_if_abandoned(self, run: SharedRun):
+        if run.subscribers == 0 and not run.done and run.task is not None:
+            print(f"INFO: All subscribers of run {run.run_id} disconnected; cancelling it.")
+            run.cancel_reason = "client_disconnected"
+            run.task.cancel(msg=run.cancel_reason)
+
+    async def _produce(self, run: SharedRun, source: Callable[[str], AsyncIterator[dict]]):
+        try:
+            async for event in source(run.run_id):
+                run.append(event)
+        except asyncio.CancelledError:
+            run.append({'cancelled': run.cancel_reason or 'cancelled'})
+            raise
+        except Exception as e:
+            print(f"ERROR: Shared run {run.run_id} failed: {e}")
+            run.append({'error': 'Error during stream execution', 'details': str(e)})
+        finally:
+            run.finish()
+            if self.window <= 0:
+                self._forget(run)
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [run for run in self.by_id.values() if run.done and now - run.finished_at > self.window]
+        for run in expired:
+            self._forget(run)
+
+    def _forget(self, run: SharedRun):
+        self.by_id.pop(run.run_id, None)
+        if self.runs.get(run.key) is run:
+            del self.runs[run.key]
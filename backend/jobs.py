@@ -0,0 +1,302 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from stock_agent.utils.config_util import data_path
+
+DEFAULT_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", "2"))
+# Workers also poll, so jobs submitted by another process sharing the database get picked up
+POLL_INTERVAL = 2.0
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+# A running job belongs to its worker while the lease holds; the worker renews it every
+# LEASE_SECONDS / 3, so only jobs whose process died (or hung) go back to the queue
+LEASE_SECONDS = float(os.environ.get("ANALYSIS_JOB_LEASE_SECONDS", "60"))
+MAX_ATTEMPTS = int(os.environ.get("ANALYSIS_JOB_MAX_ATTEMPTS", "3"))
+
+# runner(payload, emit, job_id) -> result; emit(event_dict) records a progress event
+Runner = Callable[[dict, Callable[[dict], None], str], Awaitable[Any]]
+
+
+class JobStore:
+    """SQLite-backed durable job queue and per-job event log."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    result TEXT,
+                    error TEXT,
+                    owner TEXT,
+                    lease_until REAL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (status, created_at);
+                CREATE TABLE IF NOT EXISTS job_events (
+                    job_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    attempt INTEGER,
+                    PRIMARY KEY (job_id, seq)
+                );
+            """)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:  # databases created before leases
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            if "attempt" not in {row["name"] for row in self._conn.execute("PRAGMA table_info(job_events)")}:
+                self._conn.execute("ALTER TABLE job_events ADD COLUMN attempt INTEGER")
+                self._conn.execute(
+                    "UPDATE job_events SET attempt = (SELECT attempts FROM jobs WHERE jobs.id = job_events.job_id)")
+
+    def _row(self, row: Optional[sqlite3.Row]) -> Optional[dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def add(self, kind: str, payload: dict) -> dict:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, kind, json.dumps(payload), time.time()))
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._row(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def claim(self, owner: str, lease: float = LEASE_SECONDS) -> Optional[dict]:
+        """Atomically move the oldest queued job to running under `owner`'s lease (safe across processes)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire_leases()
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+                if row is not None:
+                    now = time.time()
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1, owner = ?, "
+                        "lease_until = ? WHERE id = ?", (now, owner, now + lease, row["id"]))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def renew(self, job_id: str, owner: str, lease: float = LEASE_SECONDS) -> bool:
+        """Extend the lease; False if the job is no longer running under this owner."""
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (time.time() + lease, job_id, owner)).rowcount == 1
+
+    def finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None, owner: Optional[str] = None):
+        """Record the outcome; with `owner`, only if that worker still holds the job."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ?, lease_until = NULL "
+                "WHERE id = ? AND (? IS NULL OR owner = ?)",
+                (status, time.time(), json.dumps(result) if result is not None else None, error, job_id, owner, owner))
+
+    def requeue(self, job_id: str, owner: Optional[str] = None):
+        """Give a job back to the queue, or fail it once it has used MAX_ATTEMPTS."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "error = CASE WHEN attempts >= ? THEN ? ELSE error END, "
+                "finished_at = CASE WHEN attempts >= ? THEN ? END, started_at = NULL, lease_until = NULL "
+                "WHERE id = ? AND status = 'running' AND (? IS NULL OR owner = ?)",
+                (MAX_ATTEMPTS, MAX_ATTEMPTS, f"Interrupted {MAX_ATTEMPTS} times", MAX_ATTEMPTS, time.time(),
+                 job_id, owner, owner))
+
+    def requeue_expired(self) -> int:
+        """Running jobs whose worker stopped renewing the lease go back to the queue (or fail)."""
+        with self._lock:
+            return self._expire_leases()
+
+    def _expire_leases(self) -> int:
+        now = time.time()
+        expired = "status = 'running' AND COALESCE(lease_until, 0) < ?"
+        failed = self._conn.execute(
+            f"UPDATE jobs SET status = 'failed', finished_at = ?, error = ?, lease_until = NULL "
+            f"WHERE {expired} AND attempts >= ?", (now, f"Interrupted {MAX_ATTEMPTS} times", now, MAX_ATTEMPTS)).rowcount
+        requeued = self._conn.execute(
+            f"UPDATE jobs SET status = 'queued', started_at = NULL, lease_until = NULL WHERE {expired}", (now,)).rowcount
+        return failed + requeued
+
+    def append_event(self, job_id: str, event: dict) -> int:
+        """Record an event of the job's current attempt; seq keeps counting across attempts."""
+        with self._lock:
+            row = self._conn.execute(
+                "INSERT INTO job_events (job_id, seq, data, attempt) "
+                "VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?), ?, "
+                "(SELECT attempts FROM jobs WHERE id = ?)) RETURNING seq",
+                (job_id, job_id, json.dumps(event), job_id)).fetchone()
+        return row["seq"]
+
+    def events(self, job_id: str, after: int = 0) -> list[tuple[int, dict]]:
+        """Events after `after` from the job's current attempt (none while it waits to be retried)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, data FROM job_events WHERE job_id = ? AND seq > ? "
+                "AND attempt = (SELECT attempts FROM jobs WHERE id = ? AND status != 'queued') ORDER BY seq", (job_id, after, job_id)).fetchall()
+        return [(row["seq"], json.loads(row["data"])) for row in rows]
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+class JobQueue:
+    """
+    Runs submitted jobs on a fixed pool of asyncio worker tasks, independent of the HTTP
+    request that submitted them. Jobs and their progress events are persisted, so clients
+    can attach later and interrupted jobs resume after a restart.
+
+    SQLite calls never run on the event loop: reads go through asyncio.to_thread, and the
+    writes a running job makes (events, then its outcome) go through one writer thread, so
+    they land in the order they were made.
+    """
+
+    def __init__(self, runner: Runner, db_path: Optional[str] = None, workers: int = DEFAULT_WORKERS):
+        self.runner = runner
+        self.store = JobStore(db_path or data_path("jobs.sqlite3"))
+        self.workers = workers
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: list[asyncio.Task] = []
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-writer")
+        self._submitted = 0  # bumped on every submit, so a worker can't miss one between claim and wait
+        self._queued = asyncio.Condition()
+        self._progress = asyncio.Condition()
+
+    async def _write(self, method, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._writer, lambda: method(*args, **kwargs))
+
+    async def start(self):
+        # Only expired leases: jobs other workers on this database are running keep running
+        requeued = await asyncio.to_thread(self.store.requeue_expired)
+        if requeued:
+            print(f"INFO: Recovered {requeued} interrupted job(s).")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        print(f"INFO: Job queue started with {self.workers} worker(s).")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self._writer.shutdown)  # let queued event writes land
+
+    async def submit(self, kind: str, payload: dict) -> dict:
+        job = await asyncio.to_thread(self.store.add, kind, payload)
+        async with self._queued:
+            self._submitted += 1
+            self._queued.notify()
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def events(self, job_id: str, after: int = 0) -> AsyncIterator[tuple[int, dict]]:
+        """Replay a job's events after `after`, then follow live ones until the job finishes."""
+        while True:
+            for seq, event in await asyncio.to_thread(self.store.events, job_id, after):
+                after = seq
+                yield seq, event
+            job = await self.get(job_id)
+            if job is None or job["status"] in TERMINAL_STATUSES:
+                for seq, event in await asyncio.to_thread(self.store.events, job_id, after):  # emitted just before finishing
+                    yield seq, event
+                return
+            async with self._progress:
+                try:
+                    await asyncio.wait_for(self._progress.wait(), timeout=POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _next_job(self) -> dict:
+        while True:
+            seen = self._submitted
+            job = await asyncio.to_thread(self.store.claim, self.owner)
+            if job is not None:
+                return job
+            async with self._queued:
+                try:
+                    await asyncio.wait_for(self._queued.wait_for(lambda: self._submitted != seen), timeout=POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                job = await self._next_job()
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # e.g. a locked or unavailable database; the lease returns an unfinished job to the queue
+                print(f"ERROR: Job worker {index} error: {e}")
+                await asyncio.sleep(POLL_INTERVAL)
+
+    async def _run(self, job: dict):
+        job_id = job["id"]
+
+        loop = asyncio.get_running_loop()
+
+        def emit(event: dict):
+            written = loop.run_in_executor(self._writer, self.store.append_event, job_id, event)
+            written.add_done_callback(lambda _: loop.create_task(self._notify_progress()))
+
+        print(f"INFO: Job {job_id} ({job['kind']}) started, attempt {job['attempts']}.")
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            result = await self.runner(job["payload"], emit, job_id)
+        except asyncio.CancelledError:
+            # Shutting down: leave the job for the next start instead of losing it
+            await asyncio.shield(self._write(self.store.requeue, job_id, self.owner))
+            raise
+        except Exception as e:
+            print(f"ERROR: Job {job_id} failed: {e}")
+            await self._write(self.store.finish, job_id, "failed", error=str(e), owner=self.owner)
+        else:
+            await self._write(self.store.finish, job_id, "succeeded", result=result, owner=self.owner)
+            print(f"INFO: Job {job_id} finished.")
+        finally:
+            heartbeat.cancel()
+        await self._notify_progress()
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            if not await asyncio.to_thread(self.store.renew, job_id, self.owner):
+                print(f"ERROR: Job {job_id} lease lost; another worker may have taken it over.")
+                return
+
+    async def _notify_progress(self):
+        async with self._progress:
+            self._progress.notify_all()
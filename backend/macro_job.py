@@ -1,109 +1,189 @@
-import pandas as pd
-import requests
-from datetime import datetime
 import os
-from google.cloud import firestore
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from stock_agent.utils.config_util import load_config
 
 # Get the directory where the current script (macro_job.py) is located
 current_dir = Path(__file__).parent
 # Construct the path to the key file within the same directory
 firestore_key_path = current_dir / "firestore-key.json"
 
-# Initialize Firestore client using the correct path
-# Ensure the path is converted to a string for the function
-try:
-    db = firestore.Client.from_service_account_json(str(firestore_key_path))
-except FileNotFoundError:
-    print(f"ERROR: Firestore key file not found at {firestore_key_path}")
-    db = None # Set db to None if key is not found to prevent further errors
-except Exception as e:
-    print(f"ERROR: Failed to initialize Firestore client: {e}")
-    db = None
-
-
-# Removed 'self' parameter and corrected db access
-def get_macro_document():
-    if not db:
-        print("ERROR: Firestore client not initialized. Cannot get document.")
-        return None
-    user_doc = db.collection("users").document('ramus') # Use global 'db'
-    today = datetime.now().strftime("%Y-%m-%d")
-    document = user_doc.collection('macro_economics').document(today)
-    return document
-
-# Removed 'self' parameter
-def save_macro_economics_data(document):
-        """
-        "FEDFUNDS",  # 연방 기금 금리
-        "DGS10",     # 10년 만기 국채 금리
-        "CPIAUCNS",  # 소비자 물가 지수
-        "PCEPI",     # 개인 소비 지출 물가 지수
-        "PPIACO",    # 생산자 물가 지수
-        "GDPC1",     # 실질 국내총생산
-        "UNRATE",    # 실업률
-        "M2SL",      # M2 (광의 통화량)
-        "INDPRO",    # 산업 생산 지수
-        "UMCSENT",   # 미시간 대학교 소비자 심리 지수
-        "T10Y2Y",    # 장단기 금리차
-        "VIXCLS",    # 공포지수
-        "PAYEMS",    # 비농업 부문 고용자 수 
-        "HOUST",     # 주택 판매 지수
-        "CPILFENS",  # 미국 도시지역 소비자물가지수 중 식품과 에너지를 제외한 “Core CPI”
-        "ICSA",      # 초기 실업수당 청구건수
-        "BAMLC0A0CM" # 회사채 스프레드를 나타내는 Series ID 
-        "SP500"      # S&P 500 지수
-        """
-        # 가져올 데이터 시리즈 ID 목록
-        series_ids = [
-            "FEDFUNDS", "DGS10", "CPIAUCNS", "PCEPI", "PPIACO", "GDPC1",
-            "UNRATE", "M2SL", "INDPRO", "UMCSENT", "T10Y2Y", "VIXCLS", "PAYEMS", "HOUST",
-            "CPILFENS", "ICSA", "BAMLC0A0CM", "SP500"
-        ]
-        # FRED API 키 (본인의 키로 변경)
-        api_key = os.environ["FRED_API_KEY"]
-        # 데이터 요청 종료 날짜 (오늘 날짜로 설정)
-        end_date = datetime.now().strftime("%Y-%m-%d")
-
-        # 데이터 요청 시작 날짜 (최근 1년으로 설정, 필요에 따라 조절 가능)
-        start_date = (datetime.now() - pd.DateOffset(months=6)).strftime("%Y-%m-%d")
-
-        all_data = {}
-
-        for series_id in series_ids:
-            try:
-                # observations API 호출 (최신 데이터만 가져오도록 범위 지정)
-                observations_url = f"https://api.stlouisfed.org/fred/series/observations?series_id={series_id}&api_key={api_key}&file_type=json&observation_start={start_date}&observation_end={end_date}"
-                response = requests.get(observations_url).json()
-                observations = response.get("observations")
-
-                if observations:
-                    # dates = [obs["date"] for obs in observations]
-                    # values = [float(obs["value"]) if obs["value"] != "." and obs["value"] is not None else None for obs in observations]
-                    all_data[series_id] = [{"date": obs["date"], "value": float(obs["value"]) if obs["value"] != "." and obs["value"] is not None else None} for obs in observations]  # List of dictionaries
-                    # all_data[series_id] = pd.Series(values, index=pd.to_datetime(dates))
-                else:
-                    print(f"No observations found for {series_id}")
-
-            except requests.exceptions.RequestException as e:
-                print(f"Error fetching data for {series_id}: {e}")
-            except (KeyError, IndexError) as e:
-                print(f"Error parsing JSON for {series_id}: {e}")
-
-        document.set(all_data)
+# Where the daily macro documents go (one document per date). The storage backend is
+# chosen by STOCK_AGENT_STORAGE: Firestore when the key file above exists, local SQLite otherwise.
+MACRO_COLLECTION = os.environ.get("STOCK_AGENT_MACRO_COLLECTION", "users/ramus/macro_economics")
+
+# Built on first use, so importing this module from the API server costs nothing.
+@lru_cache(maxsize=1)
+def get_storage():
+    from stock_agent.utils.storage_util import make_document_store
+    return make_document_store(firestore_key_path=str(firestore_key_path))
+
+
+# 가져올 데이터 시리즈 ID 목록
+SERIES_IDS = [
+    "FEDFUNDS",  # 연방 기금 금리
+    "DGS10",     # 10년 만기 국채 금리
+    "CPIAUCNS",  # 소비자 물가 지수
+    "PCEPI",     # 개인 소비 지출 물가 지수
+    "PPIACO",    # 생산자 물가 지수
+    "GDPC1",     # 실질 국내총생산
+    "UNRATE",    # 실업률
+    "M2SL",      # M2 (광의 통화량)
+    "INDPRO",    # 산업 생산 지수
+    "UMCSENT",   # 미시간 대학교 소비자 심리 지수
+    "T10Y2Y",    # 장단기 금리차
+    "VIXCLS",    # 공포지수
+    "PAYEMS",    # 비농업 부문 고용자 수
+    "HOUST",     # 주택 판매 지수
+    "CPILFENS",  # 미국 도시지역 소비자물가지수 중 식품과 에너지를 제외한 "Core CPI"
+    "ICSA",      # 초기 실업수당 청구건수
+    "BAMLC0A0CM",  # 회사채 스프레드를 나타내는 Series ID
+    "SP500",     # S&P 500 지수
+]
+
+# Overridable so the job can run against a local stub (see benchmarks/bench_macro_job.py)
+FRED_BASE_URL = os.environ.get("STOCK_AGENT_FRED_BASE_URL", "https://api.stlouisfed.org")
+FRED_WORKERS = int(os.environ.get("STOCK_AGENT_FRED_WORKERS", "6"))
+# (connect, read) timeout per request, so one hanging series cannot stall the job
+FRED_TIMEOUT = (3.05, float(os.environ.get("STOCK_AGENT_FRED_TIMEOUT_SECONDS", "10")))
+FRED_RETRIES = int(os.environ.get("STOCK_AGENT_FRED_RETRIES", "3"))
+FRED_BACKOFF = 0.5  # seconds, doubled per attempt, with jitter
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+# History fetched once for a new series; the macro features need a year of it for YoY changes
+MACRO_BACKFILL_MONTHS = int(os.environ.get("STOCK_AGENT_MACRO_BACKFILL_MONTHS", "24"))
+
+
+class FredError(Exception):
+    pass
+
+
+def parse_observations(observations: list) -> tuple[list, "np.ndarray"]:
+    """
+    FRED observations -> (dates, float64 values) with missing values ("." or null) as NaN.
+    Values are converted in one vectorized pass instead of float() per row.
+    """
+    import numpy as np
+    dates = [obs["date"] for obs in observations]
+    raw = np.array([obs["value"] for obs in observations], dtype=object)
+    raw[(raw == ".") | (raw == None)] = "nan"  # noqa: E711 (elementwise comparison)
+    return dates, raw.astype(np.float64)
+
+
+def to_records(dates: list, values) -> list:
+    """Columns -> the [{"date", "value"}] layout stored in Firestore, NaN as None."""
+    import numpy as np
+    column = values.astype(object)
+    column[np.isnan(values)] = None
+    return [{"date": date, "value": value} for date, value in zip(dates, column.tolist())]
+
+
+def fetch_series(session: requests.Session, series_id: str, api_key: str, start_date: str, end_date: str) -> tuple:
+    """Fetch and parse one series, retrying transient failures with exponential backoff."""
+    params = {"series_id": series_id, "api_key": api_key, "file_type": "json",
+              "observation_start": start_date, "observation_end": end_date}
+    url = f"{FRED_BASE_URL}/fred/series/observations"
+    for attempt in range(FRED_RETRIES + 1):
+        try:
+            response = session.get(url, params=params, timeout=FRED_TIMEOUT)
+            if response.status_code in _RETRY_STATUSES:
+                raise FredError(f"HTTP {response.status_code}")
+            response.raise_for_status()
+            observations = response.json().get("observations")
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, FredError) as e:
+            if attempt == FRED_RETRIES:
+                raise FredError(f"{series_id}: {e} after {attempt + 1} attempts") from e
+            time.sleep(FRED_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+            continue
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise FredError(f"{series_id}: {e}") from e  # 4xx or malformed body: retrying won't help
+        if not observations:
+            raise FredError(f"{series_id}: no observations")
+        try:
+            return parse_observations(observations)
+        except (KeyError, TypeError, ValueError) as e:
+            raise FredError(f"{series_id}: unexpected observations format: {e}") from e
+
+
+def fetch_macro_series(series_ids: list, api_key: str, start_date, end_date: str, workers: int = FRED_WORKERS) -> tuple[dict, dict]:
+    """
+    Fetch all series concurrently on a bounded pool sharing one keep-alive session.
+    `start_date` is one date for every series or a {series: date} dict. Returns ({series: (dates, values)}, {series: error}); a failed series never blocks the others.
+    """
+    all_data, failed = {}, {}
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fred") as pool:
+            starts = start_date if isinstance(start_date, dict) else dict.fromkeys(series_ids, start_date)
+            futures = {pool.submit(fetch_series, session, series_id, api_key, starts[series_id], end_date): series_id
+                       for series_id in series_ids}
+            for future in as_completed(futures):
+                series_id = futures[future]
+                try:
+                    all_data[series_id] = future.result()
+                except FredError as e:
+                    failed[series_id] = str(e)
+    return all_data, failed
+
+
+@lru_cache(maxsize=1)
+def get_store():
+    from stock_agent.utils.timeseries_util import TimeSeriesStore
+    return TimeSeriesStore()
+
+
+def update_macro_store(store=None, series_ids: list = SERIES_IDS, end_date: Optional[str] = None) -> dict:
+    """
+    Bring the local time-series store up to date. Each series is requested only from a few
+    observations before its last stored date (re-checking recent prints for revisions); a
+    series seen for the first time is backfilled MACRO_BACKFILL_MONTHS.
+    Returns a report: {"updated": {series: {"appended", "revised"}}, "failed": {series: error},
+    "fetched": {series: (dates, values)}, "seconds": float}.
+    """
+    store = store or get_store()
+    # FRED API 키 (본인의 키로 변경)
+    api_key = os.environ["FRED_API_KEY"]
+    # 데이터 요청 종료 날짜 (오늘 날짜로 설정)
+    end_date = end_date or datetime.now().strftime("%Y-%m-%d")
+    # 처음 보는 시리즈는 최근 MACRO_BACKFILL_MONTHS 개월을 가져온다
+    import pandas as pd
+    backfill_start = (pd.Timestamp(end_date) - pd.DateOffset(months=MACRO_BACKFILL_MONTHS)).strftime("%Y-%m-%d")
+    starts = {series_id: store.fetch_start(series_id) or backfill_start for series_id in series_ids}
+
+    started = time.perf_counter()
+    fetched, failed = fetch_macro_series(series_ids, api_key, starts, end_date)
+    for series_id, error in failed.items():
+        print(f"ERROR: Failed to fetch {error}")
+    updated = {series_id: store.upsert(series_id, *columns) for series_id, columns in fetched.items()}
+    report = {"updated": updated, "failed": failed, "fetched": fetched, "seconds": round(time.perf_counter() - started, 3)}
+    appended = sum(u["appended"] for u in updated.values())
+    revised = sum(u["revised"] for u in updated.values())
+    print(f"INFO: Macro economics update: {len(updated)}/{len(series_ids)} series, {appended} new and {revised} revised observations in {report['seconds']}s")
+    return report
 
 # background 에서 하루에 한번 실행
 def save_macro_economics():
-    if not db:
-        print("ERROR: Firestore client not initialized. Skipping macro economics save.")
-        return
-
-    document = get_macro_document()
-    if document and not document.get().exists:
-        print(f"INFO: Macro economics data for today does not exist. Saving...")
-        save_macro_economics_data(document)
-        print(f"INFO: Macro economics data saved.")
-    elif document:
-        print(f"INFO: Macro economics data for today already exists. Skipping save.")
-    else:
-        print("ERROR: Could not get Firestore document. Skipping macro economics save.")
+    load_config()
+    report = update_macro_store()
+    if not report["fetched"]:
+        return report
+    try:
+        storage = get_storage()
+        # Today's document holds only the observations fetched today (new prints and re-checked
+        # recent ones) instead of another six-month copy of every series. A merge upsert needs
+        # no read first, and re-running the job on the same day just fills in more series.
+        storage.upsert(MACRO_COLLECTION, datetime.now().strftime("%Y-%m-%d"),
+                       {series_id: to_records(*columns) for series_id, columns in report["fetched"].items()})
+        print(f"INFO: Macro economics changes saved to {type(storage).__name__}.")
+    except Exception as e:
+        print(f"ERROR: Failed to save macro economics document: {e}. Data kept in the local time-series store.")
+    return report
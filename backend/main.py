@@ -1,19 +1,25 @@
 import asyncio
-import json
-from typing import List
+from typing import List, Literal
 from contextlib import asynccontextmanager # Import asynccontextmanager
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, Header, HTTPException, Request, WebSocket
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from langchain_core.messages import HumanMessage, AIMessage
 import sys
 import os
-from fastapi_utilities import repeat_at # Use repeat_at for cron scheduling
+import uuid
 
 # Add the parent directory (project root) to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from backend.websocket_manager import ConnectionManager
+from backend.jobs import JobQueue
+from backend.coalescing import RunCoalescer, SharedRun, request_key
+from backend.sse import encode_event, parse_event_id, sse_stream
+from backend.admission import AdmissionController, AdmissionRejected, admitted
+from backend.scheduler import Scheduler, ScheduledJob
+
 # Import the function to be scheduled
 try:
     from backend.macro_job import save_macro_economics
@@ -28,93 +34,72 @@ try:
     from stock_agent.app import graph
     # Import the new WebSocketCallbackHandler
     from stock_agent.utils.callback_util import WebSocketCallbackHandler
+    from stock_agent.utils.trace_util import trace_run, render_prometheus, PROMETHEUS_CONTENT_TYPE
+    from stock_agent.utils.cancel_util import CancelToken, cancel_scope
+    from stock_agent.quick_scan import normalize_tickers, scan_universe_stream, format_score
+    from stock_agent.utils.screener_util import ScreenerError, screener
 except ImportError as e:
     print(f"Error importing graph or WebSocketCallbackHandler: {e}")
     graph = None
     WebSocketCallbackHandler = None # Set to None if import fails
+    trace_run = None
+    render_prometheus = None
+    scan_universe_stream = None
+    normalize_tickers = None
+    screener = None
 
 
-# --- Scheduled Task Function ---
-# Moved the scheduling logic into a separate async function
-@repeat_at(cron="0 0 * * *", raise_exceptions=True) # Run daily at midnight using repeat_at
-async def schedule_macro_job() -> None:
-    """
-    Schedules the save_macro_economics function to run daily at midnight.
-    """
-    if save_macro_economics:
-        print("INFO: Running scheduled task: save_macro_economics")
-        try:
-            # Assuming save_macro_economics is synchronous.
-            # If it'`s async, use 'await save_macro_economics()'
-            # Consider running synchronous blocking code in a thread pool executor
-            # if it might block the asyncio event loop for too long.
-            # For now, calling it directly.
-            # save_macro_economics()
-            print("INFO: Scheduled task save_macro_economics completed successfully.")
-        except Exception as e:
-            print(f"ERROR: Scheduled task save_macro_economics failed: {e}")
-    else:
-        print("ERROR: save_macro_economics function not loaded, skipping scheduled task.")
+# --- Scheduled Jobs ---
+# Blocking jobs run in the scheduler's thread pool, never on the event loop; only the worker
+# holding the scheduler lock runs them. History and loop lag: GET /scheduler
+scheduler = Scheduler()
+if save_macro_economics:
+    # Daily at midnight; a day missed while the server was down is fetched on startup
+    scheduler.add(ScheduledJob("macro_ingestion", save_macro_economics, every=24 * 3600, at="00:00", jitter=300))
+else:
+    print("ERROR: save_macro_economics function not loaded, macro ingestion is not scheduled.")
+
+def warm_macro_features():
+    """Recompute the macro regime features once new data is stored, before an agent asks."""
+    from stock_agent.utils.macro_util import macro_features
+    macro_features.get()
+
+def compact_tool_caches():
+    from stock_agent.tools.custom_tools import expire_tool_caches
+    from stock_agent.utils.cache_util import cache_stats
+    expired = expire_tool_caches()
+    stats = cache_stats()
+    print(f"INFO: Expired {sum(expired.values())} cached provider responses; "
+          f"{stats['bytes'] / 2**20:.1f}/{stats['limit_bytes'] / 2**20:.0f} MiB in use.")
+
+scheduler.add(ScheduledJob("macro_features_warmup", warm_macro_features, every=15 * 60, jitter=30))
+scheduler.add(ScheduledJob("cache_compaction", compact_tool_caches, every=10 * 60, jitter=30, catch_up=False))
 
 # --- Lifespan Context Manager ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Code to run on startup
     print("INFO: Starting up FastAPI application...")
-
-    # --- Run save_macro_economics once on startup ---
-    if save_macro_economics:
-        print("INFO: Running initial save_macro_economics on startup...")
-        try:
-            # Call the synchronous function directly.
-            # Consider running in a thread pool if it's long-running to avoid blocking startup.
-            # save_macro_economics()
-            print("INFO: Initial save_macro_economics completed.")
-        except Exception as e:
-            print(f"ERROR: Initial save_macro_economics failed: {e}")
-    else:
-        print("ERROR: save_macro_economics function not loaded, skipping initial run.")
-    # -------------------------------------------------
-
-    # Start the recurring scheduled task
-    asyncio.create_task(schedule_macro_job())
-    print("INFO: Scheduled macro job task created for daily execution.")
+    # Run-event broker (cross-worker with STOCK_AGENT_BROKER=unix) and background analysis workers (see /jobs)
+    await manager.start()
+    await job_queue.start()
+    await scheduler.start()
     yield
     # Code to run on shutdown (optional)
     print("INFO: Shutting down FastAPI application...")
+    await scheduler.stop()
+    await job_queue.stop()
+    await manager.stop()
 
 # --- FastAPI App Initialization with Lifespan ---
 app = FastAPI(lifespan=lifespan)
 
-# --- WebSocket Connection Manager ---
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        print("DEBUG: ConnectionManager initialized.")
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"DEBUG: WebSocket connected. Total connections: {len(self.active_connections)}")
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            print(f"DEBUG: WebSocket disconnected. Total connections: {len(self.active_connections)}")
-
-    async def broadcast(self, message: str):
-        # Create a list of tasks for sending messages concurrently
-        tasks = [connection.send_text(message) for connection in self.active_connections]
-        # Wait for all tasks to complete (or handle exceptions)
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        for i, result in enumerate(results):
-             if isinstance(result, Exception):
-                 print(f"Error sending message to connection {i}: {result}")
-                 # Optionally disconnect the problematic client
-                 # self.disconnect(self.active_connections[i]) # Be careful with modifying list while iterating
-
 # Global instance of the Connection Manager
 manager = ConnectionManager()
+# Shares in-flight runs between identical /stream_endpoint requests
+coalescer = RunCoalescer()
+# Bounds concurrent graph runs (global limit, per-client quota, bounded priority queue)
+admission = AdmissionController()
 
 # --- CORS Middleware ---
 origins = [
@@ -129,43 +114,40 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"], # Allow all methods (GET, POST, OPTIONS, etc.)
     allow_headers=["*"],
+    expose_headers=["X-Run-Id", "Retry-After"], # Lets the browser read the run id to subscribe to its tool events
 )
 
 # --- WebSocket Endpoint ---
 @app.websocket("/ws/tool_usage")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
-    try:
-        while True:
-            # Keep the connection alive, listening for messages (optional)
-            # data = await websocket.receive_text()
-            # print(f"Received message via WebSocket: {data}") # Example: echo back
-            # await manager.broadcast(f"Client message: {data}")
-            await asyncio.sleep(1) # Prevent busy-waiting if not actively receiving
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
-        print("DEBUG: WebSocket client disconnected.")
-    except Exception as e:
-        print(f"Error in WebSocket connection: {e}")
-        manager.disconnect(websocket)
+async def websocket_endpoint(websocket: WebSocket, run_id: str | None = None):
+    # Clients subscribe to the run ids returned by /stream_endpoint (?run_id=a,b),
+    # or later with {"action": "subscribe", "run_id": ...} messages
+    run_ids = [r for r in (run_id or "").split(",") if r]
+    await manager.serve(websocket, run_ids)
 
 
 # --- Stream Request Model ---
 class StreamRequest(BaseModel):
     company: str
     user_input: str | None = None
+    mode: Literal["full", "quick"] = "full" # quick: single-pass screening, one LLM call per ticker
+    tickers: List[str] | None = None # quick mode universe (defaults to [company])
+    concurrency: int = 32 # clamped server-side to 1..STOCK_AGENT_QUICK_SCAN_MAX_CONCURRENCY
+    priority: Literal["interactive", "batch"] = "interactive" # batch requests queue behind interactive ones
 
-# --- Event Generator for Streaming ---
-async def event_generator(company: str, user_input: str, websocket_manager: ConnectionManager):
+# --- Analysis Event Source ---
+async def analysis_events(company: str, user_input: str, websocket_manager: ConnectionManager, run_id: str):
     """
-    Generates server-sent events from the LangGraph stream and uses WebSocket callback.
+    Runs the LangGraph analysis and yields its output as event dicts
+    ({"run_id"}, {"content"}, {"error"}, {"trace"}), publishing tool events
+    to the WebSocket subscribers of `run_id`. Shared by the SSE endpoint and the job workers.
     """
     if graph is None or WebSocketCallbackHandler is None:
-        yield f"data: {json.dumps({'error': 'Graph or Callback Handler not loaded'})}\n\n"
+        yield {'error': 'Graph or Callback Handler not loaded'}
         return
 
     # Instantiate the WebSocketCallbackHandler with the manager
-    callback_handler = WebSocketCallbackHandler(websocket_manager)
+    callback_handler = WebSocketCallbackHandler(websocket_manager, run_id)
     config = {"callbacks": [callback_handler]}
     print("DEBUG: Using WebSocketCallbackHandler for graph.astream.")
 
@@ -173,55 +155,256 @@ async def event_generator(company: str, user_input: str, websocket_manager: Conn
     input_message = user_input if user_input else f"Analyze {company} stock."
     initial_state = {"messages": [HumanMessage(content=input_message)], "company": company}
 
-    print(f"DEBUG: Entering event_generator for company: {company}")
+    print(f"DEBUG: Entering analysis_events for company: {company}")
+    run_trace = None
+    token = CancelToken()
+    websocket_manager.open_run(run_id)
     try:
+        yield {'run_id': run_id}
         print("DEBUG: Starting graph.astream with WebSocket callback...")
-        async for event in graph.astream(initial_state, config=config, stream_mode="updates"):
-            try:
-                if isinstance(event, dict):
-                    for node_name, update_value in event.items():
-                        if isinstance(update_value, dict) and 'messages' in update_value:
-                            new_messages = update_value['messages']
-                            for msg in new_messages:
-                                if isinstance(msg, AIMessage):
-                                    content_to_send = None
-                                    if hasattr(msg, 'content'):
-                                        content_to_send = str(msg.content)
-                                    elif hasattr(msg, 'dict'):
-                                        msg_dict = msg.dict()
-                                        if 'content' in msg_dict:
-                                            content_to_send = str(msg_dict['content'])
-
-                                    if content_to_send:
-                                        formatted_content = f"{node_name}: {content_to_send}"
-                                        json_data = json.dumps({"content": formatted_content})
-                                        yield f"data: {json_data}\n\n"
-            except Exception as e:
-                print(f"Error processing stream event: {e}. Event: {event}")
-                error_content = json.dumps({'error': 'Error processing stream event', 'details': str(e)})
-                yield f"data: {json.dumps({'content': error_content})}\n\n"
-            await asyncio.sleep(0.01)
+        with trace_run(run_id) as run_trace, cancel_scope(token):
+            async for event in graph.astream(initial_state, config=config, stream_mode="updates"):
+                try:
+                    if isinstance(event, dict):
+                        for node_name, update_value in event.items():
+                            if isinstance(update_value, dict) and 'messages' in update_value:
+                                new_messages = update_value['messages']
+                                for msg in new_messages:
+                                    if isinstance(msg, AIMessage):
+                                        content_to_send = None
+                                        if hasattr(msg, 'content'):
+                                            content_to_send = str(msg.content)
+                                        elif hasattr(msg, 'dict'):
+                                            msg_dict = msg.dict()
+                                            if 'content' in msg_dict:
+                                                content_to_send = str(msg_dict['content'])
+
+                                        if content_to_send:
+                                            yield {"content": f"{node_name}: {content_to_send}", "node": node_name}
+                except Exception as e:
+                    print(f"Error processing stream event: {e}. Event: {event}")
+                    yield {'error': 'Error processing stream event', 'details': str(e)}
 
         print("DEBUG: Graph stream finished.")
+        yield {'trace': run_trace.summary()}
+    except (asyncio.CancelledError, GeneratorExit) as e:
+        # Async branches are cancelled with this task; threads stop at their next checkpoint
+        token.cancel((e.args[0] if e.args else None) or "cancelled")
+        print(f"INFO: Run {run_id} cancelled ({token.reason}).")
+        raise
     except Exception as e:
         print(f"ERROR during graph stream: {e}")
-        error_content = json.dumps({'error': 'Error during stream execution', 'details': str(e)})
-        yield f"data: {json.dumps({'content': error_content})}\n\n"
+        yield {'error': 'Error during stream execution', 'details': str(e)}
+    finally:
+        websocket_manager.close_run(run_id)
+        if run_trace is not None:
+            summary = run_trace.summary()
+            if token.cancelled:
+                summary["cancelled"] = token.reason
+            print(f"INFO: Critical path summary: {summary}")
+        print("DEBUG: Exiting analysis_events.")
+
+# --- Event Stream for a Shared Run ---
+def run_stream_response(run: SharedRun, after: int = 0) -> StreamingResponse:
+    """
+    SSE response for a shared run, starting after event `after` (0 replays from the start).
+    """
+    headers = {"X-Run-Id": run.run_id, "Cache-Control": "no-cache"}
+    return StreamingResponse(sse_stream(coalescer.stream(run, after), run.run_id), media_type="text/event-stream", headers=headers)
+
+
+# --- Quick Scan Event Source ---
+async def quick_scan_events(tickers: List[str], concurrency: int, run_id: str):
+    """
+    Yields one event per ticker as soon as its quick score is ready.
+    """
+    if scan_universe_stream is None:
+        yield {'error': 'Quick scan graph not loaded'}
+        return
+
+    run_trace = None
+    try:
+        yield {'run_id': run_id}
+        with trace_run(run_id) as run_trace:
+            async for result in scan_universe_stream(tickers, concurrency=concurrency):
+                yield {'content': f'quick_scan: {format_score(result)}', 'score': result}
+        yield {'trace': run_trace.summary()}
+    except Exception as e:
+        print(f"ERROR during quick scan: {e}")
+        yield {'error': 'Error during quick scan', 'details': str(e)}
     finally:
-        print("DEBUG: Exiting event_generator.")
+        if run_trace is not None:
+            print(f"INFO: Quick scan of {len(tickers)} tickers finished in {run_trace.summary()['wall_seconds']}s")
+
+
+# --- Background Analysis Jobs ---
+async def run_analysis_job(payload: dict, emit, job_id: str):
+    """
+    Job runner: executes a full analysis off the request path, recording every event so
+    clients can follow or re-attach via /jobs/{job_id}/events. The job id doubles as the
+    WebSocket run id for tool events.
+    """
+    contents, errors = [], []
+    # Jobs are batch work: they wait (without a deadline) behind interactive requests for a run slot
+    ticket = await admission.acquire(None, "batch", max_wait=None)
+    async for event in ticket.guard(analysis_events(payload["company"], payload.get("user_input"), manager, job_id)):
+        emit(event)
+        if "content" in event:
+            contents.append(event["content"])
+        if "error" in event:
+            errors.append(f"{event['error']}: {event['details']}" if event.get("details") else event["error"])
+    if errors:
+        # analysis_events reports failures as events; the job must still end up 'failed'
+        raise RuntimeError("; ".join(errors))
+    return {"content": contents[-1] if contents else None}
+
+job_queue = JobQueue(run_analysis_job)
+
+class JobRequest(BaseModel):
+    company: str
+    user_input: str | None = None
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request_data: JobRequest):
+    """Queue an analysis and return immediately; results are fetched or streamed by job id."""
+    job = await job_queue.submit("analysis", request_data.model_dump())
+    return {"job_id": job["id"], "status": job["status"], "run_id": job["id"]}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, after: int = 0, last_event_id: str | None = Header(None)):
+    """
+    SSE stream of a job's events, replaying those after `after` (or the Last-Event-ID
+    header) before following live ones.
+    """
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
 
+    async def generate():
+        async for seq, event in job_queue.events(job_id, after):
+            yield encode_event(event, str(seq))
+        yield encode_event({'status': (await job_queue.get(job_id))['status']})
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
 
 # --- HTTP Stream Endpoint ---
 @app.post("/stream_endpoint")
-async def stream_endpoint(request_data: StreamRequest):
+async def stream_endpoint(request_data: StreamRequest, request: Request, last_event_id: str | None = Header(None)):
     """
     API endpoint to stream LangGraph execution results via SSE.
     Uses the global WebSocket manager for the callback handler.
+    A Last-Event-ID header ('<run_id>:<seq>') resumes that run instead of starting a new one.
+    Starting a new run needs an admission slot; when none is available in time the
+    request gets 429 with Retry-After.
     """
+    resume = parse_event_id(last_event_id)
+    if resume is not None:
+        run = coalescer.get(resume[0])
+        if run is not None:
+            return run_stream_response(run, after=resume[1])
     company = request_data.company
     user_input = request_data.user_input
-    # Pass the global manager instance to the generator
-    return StreamingResponse(event_generator(company, user_input, manager), media_type="text/event-stream")
+    # Identical concurrent requests share one graph run; each gets its own replayed stream
+    if request_data.mode == "quick":
+        tickers = request_data.tickers or [company]
+        if normalize_tickers is not None:  # otherwise quick_scan_events reports the scan unavailable
+            tickers = normalize_tickers(tickers)
+        key = (tuple(sorted(tickers)), "quick")
+        source = lambda run_id: quick_scan_events(tickers, request_data.concurrency, run_id)
+    else:
+        key = request_key(company, user_input, "full")
+        source = lambda run_id: analysis_events(company, user_input, manager, run_id)
+
+    if coalescer.lookup(key) is None:
+        # Joining a run is free; only starting one takes a slot
+        client_id = request.headers.get("X-Client-Id") or (request.client.host if request.client else "unknown")
+        try:
+            ticket = await admission.acquire(client_id, request_data.priority)
+        except AdmissionRejected as e:
+            print(f"INFO: Rejected {request_data.mode} request for {company} from {client_id}: {e.reason}")
+            return JSONResponse(
+                {"error": "Server busy, retry later", "reason": e.reason, "retry_after": e.retry_after},
+                status_code=429, headers={"Retry-After": str(e.retry_after)})
+        if coalescer.lookup(key) is None:
+            source = admitted(ticket, source)
+        else:
+            ticket.release(observe=False)  # an identical request started the run while we queued
+    run = coalescer.attach(key, source)
+    return run_stream_response(run)
+
+@app.get("/stream_endpoint/{run_id}")
+async def resume_stream(run_id: str, after: int = 0, last_event_id: str | None = Header(None)):
+    """Reconnect to a running (or just finished) run, replaying events after the Last-Event-ID."""
+    run = coalescer.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found or expired")
+    resume = parse_event_id(last_event_id)
+    if resume is not None and resume[0] == run_id:
+        after = max(after, resume[1])
+    return run_stream_response(run, after=after)
+
+# --- Scheduler Endpoints ---
+@app.get("/scheduler")
+async def scheduler_status():
+    """Scheduled jobs with their next run and recent history, plus event-loop lag."""
+    return scheduler.status()
+
+@app.post("/scheduler/{name}/run")
+async def run_scheduled_job(name: str):
+    if name not in scheduler.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not scheduler.is_leader:
+        raise HTTPException(status_code=409, detail="Scheduled jobs run on another worker")
+    try:
+        return await scheduler.run_now(name)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+# --- Screener Endpoint ---
+class ScreenRequest(BaseModel):
+    filter: str = ""
+    sort_by: str = ""
+    ascending: bool = False
+    limit: int = Field(20, ge=0)  # 0: no limit
+    tickers: List[str] | None = None
+    columns: List[str] | None = None
+
+@app.post("/screener")
+async def screen_stocks(request_data: ScreenRequest):
+    """Filter and rank the tickers whose basic financials are stored, e.g. {"filter": "pe < 20 and roe > 15", "sort_by": "revenue_growth"}."""
+    if screener is None:
+        raise HTTPException(status_code=503, detail="Screener not available")
+    if request_data.tickers:
+        await asyncio.to_thread(screener.ensure, request_data.tickers)
+    try:
+        return await asyncio.to_thread(
+            screener.screen, request_data.filter, request_data.sort_by, request_data.ascending,
+            request_data.limit, request_data.tickers, request_data.columns)
+    except ScreenerError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# --- Cache Endpoint ---
+@app.get("/caches")
+async def tool_caches():
+    """Bytes, entries and hit counts per provider-response cache, against the shared memory budget."""
+    from stock_agent.utils.cache_util import cache_stats
+    return cache_stats()
+
+# --- Metrics Endpoint ---
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint with node, LLM and tool latency histograms."""
+    if render_prometheus is None:
+        return PlainTextResponse("", status_code=503)
+    return PlainTextResponse(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 # --- Root Endpoint ---
 @app.get("/")
@@ -230,4 +413,5 @@ async def read_root():
 
 # --- Server Execution ---
 # Example: uvicorn backend.main:app --reload --port 8080
+# Multiple workers: STOCK_AGENT_BROKER=unix uvicorn backend.main:app --workers 4 --port 8080
 # Ensure the port matches the frontend fetch and WebSocket URLs (default 8080 used here)
@@ -0,0 +1,254 @@
+import asyncio
+import fcntl
+import multiprocessing
+import os
+import random
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from stock_agent.utils.config_util import data_path
+from stock_agent.utils.storage_util import DocumentStore, SQLiteDocumentStore
+from stock_agent.utils.trace_util import registry
+
+SCHEDULER_WORKERS = int(os.environ.get("STOCK_AGENT_SCHEDULER_WORKERS", "2"))
+HISTORY_SIZE = 20
+# Long sleeps are cut into slices so wall-clock jumps (suspend, NTP) are noticed
+MAX_SLEEP = 60.0
+LAG_INTERVAL = 0.05
+STATE_COLLECTION = "scheduler/jobs"
+
+JOB_SECONDS = registry.histogram("stock_agent_scheduler_job_seconds", "Scheduled job run time.", ("job", "status"))
+JOB_RUNS = registry.counter("stock_agent_scheduler_runs_total", "Scheduled job runs by trigger and outcome.", ("job", "trigger", "status"))
+LOOP_LAG = registry.histogram("stock_agent_event_loop_lag_seconds", "How late the event loop woke a periodic timer.")
+
+
+@dataclass
+class ScheduledJob:
+    """
+    A recurring blocking job. Slots are every `every` seconds, anchored at the local time
+    `at` ("HH:MM") when given (every=86400, at="00:00" is daily at midnight), otherwise at the epoch.
+    """
+    name: str
+    func: Callable[[], Any]
+    every: float
+    at: Optional[str] = None
+    jitter: float = 0.0  # random delay added to each slot, so workers and hosts don't fire together
+    catch_up: bool = True  # run once on start if a slot was missed while the server was down
+    executor: str = "thread"  # "process" for CPU-bound jobs (func must be picklable)
+    running: bool = False
+    history: deque = field(default_factory=lambda: deque(maxlen=HISTORY_SIZE))
+    last_slot: Optional[float] = None
+    skipped: int = 0
+
+    def _anchor(self, now: float) -> float:
+        if self.at is None:
+            return 0.0
+        hour, minute = (int(part) for part in self.at.split(":"))
+        return datetime.fromtimestamp(now).replace(hour=hour, minute=minute, second=0, microsecond=0).timestamp()
+
+    def previous_slot(self, now: float) -> float:
+        anchor = self._anchor(now)
+        return anchor + ((now - anchor) // self.every) * self.every
+
+    def next_slot(self, now: float) -> float:
+        return self.previous_slot(now) + self.every
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop runs a periodic timer; lag means something is blocking it."""
+
+    def __init__(self, interval: float = LAG_INTERVAL, keep: int = 4096):
+        self.interval = interval
+        self.samples: deque = deque(maxlen=keep)  # (monotonic time, lag seconds)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+            lag = max(0.0, now - expected)
+            self.samples.append((now, lag))
+            LOOP_LAG.observe(lag)
+
+    def max_since(self, since: float) -> float:
+        return max((lag for at, lag in list(self.samples) if at >= since), default=0.0)
+
+    def summary(self) -> dict:
+        lags = sorted(lag for _, lag in list(self.samples))
+        if not lags:
+            return {}
+        pick = lambda q: round(lags[min(len(lags) - 1, int(q * len(lags)))] * 1000, 3)
+        return {"p50_ms": pick(0.5), "p99_ms": pick(0.99), "max_ms": round(lags[-1] * 1000, 3), "samples": len(lags)}
+
+
+class Scheduler:
+    """
+    Runs recurring blocking jobs in a thread or process pool, never on the event loop.
+    A job never overlaps itself (slots that pass while it runs are skipped and counted),
+    missed slots are caught up once after downtime, and each run's duration, outcome and
+    the worst event-loop lag seen while it ran are kept in its history.
+
+    With several uvicorn workers only the process holding the scheduler lock file runs jobs;
+    the others keep retrying, so one of them takes over if that process exits.
+    """
+
+    def __init__(self, state: Optional[DocumentStore] = None, lock_path: Optional[str] = None, workers: int = SCHEDULER_WORKERS):
+        self.jobs: dict[str, ScheduledJob] = {}
+        self.lag = LoopLagMonitor()
+        self._state = state
+        self._lock_path = lock_path or data_path("scheduler.lock")
+        self._lock_fd: Optional[int] = None
+        self._workers = workers
+        self._executors: dict[str, Executor] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def state(self) -> DocumentStore:
+        if self._state is None:
+            self._state = SQLiteDocumentStore(data_path("scheduler.sqlite3"))
+        return self._state
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_fd is not None
+
+    def add(self, job: ScheduledJob) -> ScheduledJob:
+        self.jobs[job.name] = job
+        return job
+
+    async def start(self):
+        self.lag.start()
+        self._tasks.append(asyncio.create_task(self._lead()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        await self.lag.stop()
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executors.clear()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _try_lock(self) -> bool:
+        fd = os.open(self._lock_path, os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    async def _lead(self):
+        while not self._try_lock():
+            await asyncio.sleep(MAX_SLEEP)
+        print(f"INFO: Scheduler running {sorted(self.jobs)} (pid={os.getpid()})")
+        for job in self.jobs.values():
+            saved = await asyncio.to_thread(self.state.get, STATE_COLLECTION, job.name) or {}
+            job.last_slot = saved.get("last_slot")
+            job.history.extend(saved.get("history", []))
+            self._tasks.append(asyncio.create_task(self._loop(job)))
+
+    async def _loop(self, job: ScheduledJob):
+        now = time.time()
+        if job.catch_up and (job.last_slot is None or job.last_slot < job.previous_slot(now)):
+            await self._run(job, "catch_up", job.previous_slot(now))
+        while True:
+            slot = job.next_slot(time.time())
+            due = slot + random.uniform(0, job.jitter)
+            while (remaining := due - time.time()) > 0:
+                await asyncio.sleep(min(remaining, MAX_SLEEP))
+            if job.running:  # a manual run is still going
+                job.skipped += 1
+                JOB_RUNS.inc(job=job.name, trigger="schedule", status="skipped")
+                continue
+            await self._run(job, "schedule", slot)
+            # Slots that came and went while this run was still going are not made up
+            missed = int((time.time() - slot) // job.every)
+            if missed:
+                job.skipped += missed
+                JOB_RUNS.inc(missed, job=job.name, trigger="schedule", status="skipped")
+
+    def _executor(self, kind: str) -> Executor:
+        executor = self._executors.get(kind)
+        if executor is None:
+            if kind == "process":
+                # spawn, not fork: a forked worker would inherit the server's sockets and event loop
+                executor = ProcessPoolExecutor(max_workers=self._workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="scheduler")
+            self._executors[kind] = executor
+        return executor
+
+    async def _run(self, job: ScheduledJob, trigger: str, slot: Optional[float] = None) -> dict:
+        job.running = True
+        loop = asyncio.get_running_loop()
+        started, mark = time.time(), loop.time()
+        record = {"trigger": trigger, "started_at": started, "status": "succeeded"}
+        try:
+            await loop.run_in_executor(self._executor(job.executor), job.func)
+        except asyncio.CancelledError:
+            record["status"] = "cancelled"
+            raise
+        except Exception as e:
+            record.update(status="failed", error=f"{type(e).__name__}: {e}")
+            print(f"ERROR: Scheduled job {job.name} failed: {e}\n{traceback.format_exc()}")
+        finally:
+            job.running = False
+            record["seconds"] = round(time.time() - started, 3)
+            record["max_loop_lag_ms"] = round(self.lag.max_since(mark) * 1000, 3)
+            job.history.append(record)
+            JOB_SECONDS.observe(record["seconds"], job=job.name, status=record["status"])
+            JOB_RUNS.inc(job=job.name, trigger=trigger, status=record["status"])
+            if slot is not None and record["status"] == "succeeded":
+                job.last_slot = slot
+            if record["status"] != "cancelled":
+                await asyncio.to_thread(self.state.upsert, STATE_COLLECTION, job.name,
+                                        {"last_slot": job.last_slot, "history": list(job.history)}, False)
+        print(f"INFO: Scheduled job {job.name} ({trigger}) {record['status']} in {record['seconds']}s")
+        return record
+
+    async def run_now(self, name: str) -> dict:
+        """Run a job immediately (manual trigger). Raises KeyError if unknown, RuntimeError if running."""
+        job = self.jobs[name]
+        if job.running:
+            raise RuntimeError(f"Job {name} is already running")
+        return await self._run(job, "manual")
+
+    def status(self) -> dict:
+        now = time.time()
+        return {
+            "leader": self.is_leader,
+            "loop_lag": self.lag.summary(),
+            "jobs": {
+                job.name: {
+                    "running": job.running,
+                    "every_seconds": job.every,
+                    "at": job.at,
+                    "executor": job.executor,
+                    "next_run": datetime.fromtimestamp(job.next_slot(now)).isoformat(timespec="seconds"),
+                    "skipped": job.skipped,
+                    "history": list(job.history),
+                }
+                for job in self.jobs.values()
+            },
+        }
@@ -0,0 +1,63 @@
+import json
+import os
+from typing import AsyncIterator, Optional
+
+try:
+    import orjson  # optional: several times faster than json.dumps for event payloads
+except ImportError:
+    orjson = None
+
+# A batch of buffered events is written as one chunk, split once it grows past this size.
+MAX_CHUNK_BYTES = int(os.environ.get("STOCK_AGENT_SSE_CHUNK_BYTES", str(64 * 1024)))
+# Reconnect delay suggested to EventSource clients, in milliseconds.
+RETRY_MS = 3000
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+
+
+def encode_event(data, event_id: Optional[str] = None) -> bytes:
+    if event_id is None:
+        return b"data: " + dumps(data) + b"\n\n"
+    return b"id: " + event_id.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+def event_id(run_id: str, seq: int) -> str:
+    return f"{run_id}:{seq}"
+
+
+def parse_event_id(value: Optional[str]) -> Optional[tuple[str, int]]:
+    """'<run_id>:<seq>' from a Last-Event-ID header, or None if absent or malformed."""
+    if not value:
+        return None
+    run_id, _, seq = value.strip().rpartition(":")
+    if not run_id or not seq.isdigit():
+        return None
+    return run_id, int(seq)
+
+
+async def sse_stream(batches: AsyncIterator[tuple[int, list]], run_id: str) -> AsyncIterator[bytes]:
+    """
+    Encode (missed, [(seq, event), ...]) batches from a shared run as SSE, one write per
+    batch. Event ids are '<run_id>:<seq>' so a client can resume with Last-Event-ID.
+    """
+    yield b"retry: %d\n\n" % RETRY_MS
+    async for missed, batch in batches:
+        parts = []
+        size = 0
+        if missed:
+            # The client resumed from further back than the replay buffer reaches
+            parts.append(encode_event({"warning": "replay_gap", "missed": missed}))
+        for seq, event in batch:
+            part = encode_event(event, event_id(run_id, seq))
+            parts.append(part)
+            size += len(part)
+            if size >= MAX_CHUNK_BYTES:
+                yield b"".join(parts)
+                parts = []
+                size = 0
+        if parts:
+            yield b"".join(parts)
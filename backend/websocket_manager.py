@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict, deque
+from typing import Dict, Iterable, Set
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from backend.broker import Broker, make_broker
+
+# Per-socket send queue length; when a slow consumer falls this far behind the oldest events are dropped.
+DEFAULT_SEND_QUEUE_SIZE = 256
+# Events kept per run so a client that subscribes a moment after /stream_endpoint returns still sees them.
+RUN_BACKLOG_SIZE = 64
+# The server pings after this much client silence and drops the socket once nothing
+# (pong or any other message) has arrived for HEARTBEAT_TIMEOUT seconds.
+HEARTBEAT_INTERVAL = float(os.environ.get("WS_HEARTBEAT_INTERVAL_SECONDS", "20"))
+HEARTBEAT_TIMEOUT = float(os.environ.get("WS_HEARTBEAT_TIMEOUT_SECONDS", "60"))
+# Broker topics that open/close a run's backlog in every worker process
+RUN_OPENED_TOPIC = "__run_opened__"
+RUN_CLOSED_TOPIC = "__run_closed__"
+
+
+class ClientConnection:
+    """One WebSocket plus its bounded (drop-oldest) send queue, drained by a dedicated writer task."""
+
+    def __init__(self, websocket: WebSocket, max_queue: int = DEFAULT_SEND_QUEUE_SIZE):
+        self.websocket = websocket
+        self.queue: deque = deque(maxlen=max_queue)
+        self.topics: Set[str] = set()
+        self.dropped = 0
+        self.last_seen = time.monotonic()
+        self.writer_task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+
+    def enqueue(self, message: str):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1  # deque(maxlen) evicts the oldest entry on append
+        self.queue.append(message)
+        self._wakeup.set()
+
+    async def drain(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self.queue:
+                await self.websocket.send_text(self.queue.popleft())
+
+
+class ConnectionManager:
+    """
+    Routes run events to the sockets subscribed to that run id instead of broadcasting
+    every event to every client. Publishing only appends to per-socket queues, so a
+    slow client never delays the graph run or the other subscribers.
+    Events go through the broker, so a socket held by one worker process still receives
+    the events of a run executing in another.
+    """
+
+    def __init__(self, max_queue: int = DEFAULT_SEND_QUEUE_SIZE, broker: Broker | None = None):
+        self.max_queue = max_queue
+        self.active_connections: Set[ClientConnection] = set()
+        self.subscriptions: Dict[str, Set[ClientConnection]] = defaultdict(set)
+        self.backlog: Dict[str, deque] = {}
+        self.broker = broker or make_broker()
+        self.broker.handler = self.deliver
+        print(f"DEBUG: ConnectionManager initialized with {type(self.broker).__name__}.")
+
+    async def start(self):
+        await self.broker.start()
+
+    async def stop(self):
+        await self.broker.stop()
+
+    async def connect(self, websocket: WebSocket, run_ids: Iterable[str] = ()) -> ClientConnection:
+        await websocket.accept()
+        connection = ClientConnection(websocket, self.max_queue)
+        connection.writer_task = asyncio.create_task(self._write(connection))
+        self.active_connections.add(connection)
+        for run_id in run_ids:
+            self.subscribe(connection, run_id)
+        print(f"DEBUG: WebSocket connected. Total connections: {len(self.active_connections)}")
+        return connection
+
+    def disconnect(self, connection: ClientConnection):
+        if connection not in self.active_connections:
+            return
+        self.active_connections.discard(connection)
+        for run_id in connection.topics:
+            subscribers = self.subscriptions.get(run_id)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self.subscriptions[run_id]
+        if connection.writer_task and connection.writer_task is not asyncio.current_task():
+            connection.writer_task.cancel()
+        print(f"DEBUG: WebSocket disconnected. Total connections: {len(self.active_connections)}")
+
+    def subscribe(self, connection: ClientConnection, run_id: str):
+        self.subscriptions[run_id].add(connection)
+        connection.topics.add(run_id)
+        for message in self.backlog.get(run_id, ()):
+            connection.enqueue(message)
+
+    def unsubscribe(self, connection: ClientConnection, run_id: str):
+        connection.topics.discard(run_id)
+        subscribers = self.subscriptions.get(run_id)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self.subscriptions[run_id]
+
+    def open_run(self, run_id: str):
+        self.broker.publish(RUN_OPENED_TOPIC, run_id)
+
+    def close_run(self, run_id: str):
+        self.broker.publish(RUN_CLOSED_TOPIC, run_id)
+
+    def publish(self, run_id: str, message: str):
+        """Send `message` to the subscribers of `run_id` in every worker. Must be called on the event loop thread."""
+        self.broker.publish(run_id, message)
+
+    def deliver(self, run_id: str, message: str):
+        """Broker handler: queue `message` for this process's subscribers of `run_id`."""
+        if run_id == RUN_OPENED_TOPIC:
+            self.backlog[message] = deque(maxlen=RUN_BACKLOG_SIZE)
+            return
+        if run_id == RUN_CLOSED_TOPIC:
+            self.backlog.pop(message, None)
+            return
+        backlog = self.backlog.get(run_id)
+        if backlog is not None:
+            backlog.append(message)
+        for connection in self.subscriptions.get(run_id, ()):
+            connection.enqueue(message)
+
+    async def broadcast(self, message: str):
+        # Server-wide notices only; run events go through publish()
+        for connection in self.active_connections:
+            connection.enqueue(message)
+
+    async def _write(self, connection: ClientConnection):
+        try:
+            await connection.drain()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error sending message to WebSocket, dropping connection: {e}")
+            self.disconnect(connection)
+
+    async def serve(self, websocket: WebSocket, run_ids: Iterable[str] = ()):
+        """
+        Receive-driven connection loop: handles subscribe/unsubscribe/pong messages, pings idle
+        clients and removes the connection as soon as the client goes away or stops answering.
+        """
+        connection = await self.connect(websocket, run_ids)
+        try:
+            while True:
+                try:
+                    raw = await asyncio.wait_for(websocket.receive_text(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    if time.monotonic() - connection.last_seen > HEARTBEAT_TIMEOUT:
+                        print("DEBUG: WebSocket heartbeat timed out, closing.")
+                        await websocket.close(code=1001)
+                        break
+                    connection.enqueue(json.dumps({"type": "ping", "timestamp": time.time()}))
+                    continue
+                connection.last_seen = time.monotonic()
+                self._handle_client_message(connection, raw)
+        except WebSocketDisconnect:
+            print("DEBUG: WebSocket client disconnected.")
+        except Exception as e:
+            print(f"Error in WebSocket connection: {e}")
+        finally:
+            self.disconnect(connection)
+
+    def _handle_client_message(self, connection: ClientConnection, raw: str):
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return
+        if not isinstance(message, dict):
+            return
+        action = message.get("action") or message.get("type")
+        if action == "subscribe" and message.get("run_id"):
+            self.subscribe(connection, str(message["run_id"]))
+        elif action == "unsubscribe" and message.get("run_id"):
+            self.unsubscribe(connection, str(message["run_id"]))
+        elif action == "ping":
+            connection.enqueue(json.dumps({"type": "pong", "timestamp": time.time()}))
+        # "pong" only refreshes last_seen
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Synthetic load test for admission control. Each "graph run" makes --steps provider calls
+through a shared provider limited to --capacity concurrent calls, so past saturation
+unbounded runs queue at the provider and every request slows down. Poisson arrivals at
+0.5x..3x of capacity, with and without AdmissionController in front.
+
+    python benchmarks/bench_admission.py --duration 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.admission import AdmissionController, AdmissionRejected
+from benchmarks.stubs import percentile
+
+async def graph_run(provider: asyncio.Semaphore, steps: int, service: float):
+    for _ in range(steps):
+        async with provider:
+            await asyncio.sleep(service / steps)
+
+async def request(admission, provider, steps, service, priority, client, stats):
+    start = time.perf_counter()
+    try:
+        ticket = await admission.acquire(client, priority) if admission else None
+    except AdmissionRejected as e:
+        stats["rejected"] += 1
+        stats["rejected_ms"].append((time.perf_counter() - start) * 1000)
+        return
+    try:
+        await graph_run(provider, steps, service)
+    finally:
+        if ticket:
+            ticket.release()
+    stats["latency"].setdefault(priority, []).append(time.perf_counter() - start)
+
+async def run(load: float, capacity: int, service: float, steps: int, duration: float, controlled: bool, max_wait: float):
+    rng = random.Random(11)
+    provider = asyncio.Semaphore(capacity)
+    admission = AdmissionController(max_concurrent=capacity, per_client=10**6, max_queue=4 * capacity,
+                                    max_wait=max_wait, service_estimate=service) if controlled else None
+    rate = load * capacity / service  # arrivals per second
+    stats = {"rejected": 0, "rejected_ms": [], "latency": {}}
+    tasks = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        priority = "batch" if rng.random() < 0.3 else "interactive"
+        tasks.append(asyncio.create_task(request(admission, provider, steps, service, priority, f"c{rng.randrange(50)}", stats)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    label = "admission" if controlled else "unbounded"
+    cells = []
+    for priority in ("interactive", "batch"):
+        lat = stats["latency"].get(priority, [])
+        if lat:
+            cells.append(f"{priority} n={len(lat)} p50={percentile(lat, 0.5):.2f}s p99={percentile(lat, 0.99):.2f}s")
+    print(f"load={load:.1f}x {label:<9} requests={len(tasks)} rejected={stats['rejected']} | " + " | ".join(cells))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--loads", default="0.5,1.0,1.5,2.0,3.0")
+    parser.add_argument("--capacity", type=int, default=8, help="concurrent provider calls before rate limiting")
+    parser.add_argument("--service", type=float, default=0.5, help="seconds per graph run at no contention")
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--max-wait", type=float, default=1.0)
+    args = parser.parse_args()
+    for load in [float(x) for x in args.loads.split(",")]:
+        for controlled in (False, True):
+            asyncio.run(run(load, args.capacity, args.service, args.steps, args.duration, controlled, args.max_wait))
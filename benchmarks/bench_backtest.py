@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Backtest sweep time on 10 years of synthetic daily closes: each strategy's full parameter
+grid in batches of CHUNK_ROWS combinations (time and peak traced memory), against backtesting the same combinations one at a time with
+pandas rolling windows (the SMA sweep only; a sample of it, extrapolated). No network.
+
+    python benchmarks/bench_backtest.py --years 10 --loop-sample 50
+"""
+import argparse
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stock_agent.utils.backtest_util import (
+    COST_BPS, STRATEGIES, TRADING_DAYS, evaluate, parameter_grid, sma_cross_positions, sweep)
+
+def one_at_a_time(close: pd.Series, fast: int, slow: int) -> tuple:
+    """The straightforward version: one combination, pandas rolling means, a Python loop over trades."""
+    position = (close.rolling(fast).mean() > close.rolling(slow).mean()).astype(float)
+    pnl = position.shift(1) * close.pct_change() - position.diff().abs().shift(1).fillna(0) * COST_BPS / 10_000
+    pnl = pnl.iloc[1:]
+    equity = (1 + pnl).cumprod()
+    drawdown = (equity / equity.cummax().clip(lower=1.0) - 1).min()
+    sharpe = pnl.mean() / pnl.std() * math.sqrt(TRADING_DAYS)
+    trades, wins, current = 0, 0, None
+    for held, r in zip(position.shift(1).iloc[1:], pnl):
+        if held > 0:
+            if current is None:
+                trades, current = trades + 1, 0.0
+            current += math.log1p(r)
+        elif current is not None:
+            wins, current = wins + (current > 0), None
+    if current is not None:
+        wins += current > 0
+    return equity.iloc[-1] - 1, sharpe, drawdown, trades, wins / trades if trades else float("nan")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--loop-sample", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    close = 100 * np.cumprod(1 + rng.normal(0.0004, 0.015, args.years * TRADING_DAYS))
+    print(f"{len(close)} daily closes")
+
+    for strategy in STRATEGIES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = sweep(close, strategy)
+            timings.append(time.perf_counter() - start)
+        tracemalloc.start()
+        sweep(close, strategy)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        best = result["best"][0]
+        print(f"  {strategy:<10} {result['combinations']:>5} combinations  batched={min(timings) * 1000:7.1f}ms  peak={peak / 2**20:5.1f}MiB  "
+              f"best sharpe={best['sharpe']} ({ {k: v for k, v in best.items() if k in ('fast', 'slow', 'signal', 'window', 'lower', 'upper')} })")
+
+    params = parameter_grid("sma_cross")
+    sample = params[:: max(1, len(params) // args.loop_sample)][:args.loop_sample]
+    series = pd.Series(close)
+    start = time.perf_counter()
+    looped = [one_at_a_time(series, p["fast"], p["slow"]) for p in sample]
+    per_combination = (time.perf_counter() - start) / len(sample)
+    print(f"  sma_cross one at a time: {per_combination * 1000:.2f}ms per combination, "
+          f"~{per_combination * len(params):.1f}s for all {len(params)}")
+
+    stats = evaluate(sma_cross_positions(close, sample), close)
+    for i, (total, sharpe, drawdown, trades, hit_rate) in enumerate(looped):
+        assert math.isclose(total, stats["total_return"][i], rel_tol=1e-6, abs_tol=1e-9)
+        assert math.isclose(sharpe, stats["sharpe"][i], rel_tol=1e-6)
+        assert math.isclose(drawdown, stats["max_drawdown"][i], rel_tol=1e-6, abs_tol=1e-9)
+        assert trades == stats["trades"][i]
+        assert (math.isnan(hit_rate) and math.isnan(stats["hit_rate"][i])) or math.isclose(hit_rate, stats["hit_rate"][i])
+    print(f"  batched results match the one-at-a-time loop on {len(sample)} combinations")
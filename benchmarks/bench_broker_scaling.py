@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cross-worker event delivery through the Unix-socket broker, scaling from 1 to N worker
+processes (what `STOCK_AGENT_BROKER=unix uvicorn backend.main:app --workers N` runs).
+Every worker publishes --events tool events for its own runs and must receive the
+events of all workers, as its WebSocket clients may subscribe to any run.
+
+    python benchmarks/bench_broker_scaling.py --workers 1,2,4,8 --events 5000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.broker import UnixSocketBroker
+from benchmarks.stubs import percentile
+
+def worker(index: int, n_workers: int, events: int, path: str, barrier, results):
+    asyncio.run(_worker(index, n_workers, events, path, barrier, results))
+
+async def _worker(index, n_workers, events, path, barrier, results):
+    loop = asyncio.get_running_loop()
+    expected = n_workers * events
+    received = 0
+    latencies = []
+    done = asyncio.Event()
+
+    def handler(topic, message):
+        nonlocal received
+        received += 1
+        if received % 10 == 0:
+            latencies.append(time.time() - json.loads(message)["sent"])
+        if received >= expected:
+            done.set()
+
+    broker = UnixSocketBroker(path)
+    broker.handler = handler
+    await broker.start()
+    await loop.run_in_executor(None, barrier.wait)
+
+    start = time.perf_counter()
+    for i in range(events):
+        message = json.dumps({"type": "end", "content": f"Tool End: Output: {'x' * 200}", "run_id": f"{index}-{i}",
+                              "analysis_run_id": f"run-{index}", "sent": time.time()})
+        broker.publish(f"run-{index}", message)
+        if i % 50 == 49:
+            await asyncio.sleep(0)
+    try:
+        await asyncio.wait_for(done.wait(), timeout=60)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - start
+    results.put({"received": received, "expected": expected, "elapsed": elapsed, "latencies": latencies,
+                 "dropped": broker.dropped, "hub": broker.is_hub})
+    await loop.run_in_executor(None, barrier.wait)  # keep the hub up until everyone is done
+    await broker.stop()
+
+def run(n_workers: int, events: int):
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "broker.sock")
+        barrier, results = ctx.Barrier(n_workers), ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(i, n_workers, events, path, barrier, results)) for i in range(n_workers)]
+        for proc in procs:
+            proc.start()
+        stats = [results.get(timeout=120) for _ in procs]
+        for proc in procs:
+            proc.join()
+    elapsed = max(s["elapsed"] for s in stats)
+    delivered = sum(s["received"] for s in stats)
+    latencies = [lat for s in stats for lat in s["latencies"]]
+    missing = sum(s["expected"] - s["received"] for s in stats)
+    print(f"workers={n_workers:>2} published={n_workers * events / elapsed:>9,.0f}/s delivered={delivered / elapsed:>10,.0f}/s "
+          f"p50={percentile(latencies, 0.5) * 1000:6.2f}ms p99={percentile(latencies, 0.99) * 1000:7.2f}ms "
+          f"missing={missing} dropped={sum(s['dropped'] for s in stats)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default=",".join(str(n) for n in (1, 2, 4, os.cpu_count() or 4)))
+    parser.add_argument("--events", type=int, default=5000, help="events published per worker")
+    args = parser.parse_args()
+    for n in sorted({int(w) for w in args.workers.split(",")}):
+        run(n, args.events)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Resident memory and hit rate of the tool caches under a synthetic 1000-ticker workload:
+TTLCache(maxsize=1024) per tool (entry counts, as custom_tools used to do), a byte-sized
+TTLCache per tool with an equal share of the budget (size-aware but blind to refetch cost),
+and BudgetedTTLCache under one shared budget (GDSF). Payloads have the shape of the real
+responses: financial statements and limit=5000 indicator series are large, news and quotes
+small. Fetches sleep for a per-tool latency; tickers are drawn with a Zipf popularity.
+Each variant runs in its own process so RSS is comparable (Linux, read from /proc).
+
+    python benchmarks/bench_cache_budget.py --tickers 1000 --calls 10000 --budget-mb 64
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+from cachetools import TTLCache, cached
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stock_agent.utils.cache_util import BudgetedTTLCache, CacheBudget, deep_sizeof
+
+VARIANTS = ("entries", "sized", "budgeted")
+
+def rss_mib() -> float:
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 1024
+
+def quote(ticker):
+    return {"ticker": ticker, **{f"field_{i}": float(i) for i in range(30)}}
+
+def news(ticker):
+    return [{"headline": f"{ticker} headline {i} " + "x" * 80, "summary": f"{ticker} " + "y" * 600,
+             "url": f"https://example.com/{ticker}/{i}", "datetime": 1700000000 + i} for i in range(30)]
+
+def basic_financials(ticker):
+    return {"symbol": ticker, "metric": {f"metric_{i}": float(i) for i in range(130)},
+            "series": {"annual": {f"series_{j}": [{"period": f"{2024 - k}-12-31", "v": float(k)} for k in range(20)]
+                                  for j in range(60)}}}
+
+def statements(ticker):
+    def items(section, n):
+        return [{"concept": f"{ticker}_{section}_{i}", "label": f"{section} line item {i}", "unit": "usd",
+                 "value": float(i)} for i in range(n)]
+    return [{"year": 2024 - y, "report": {"bs": items("bs", 80), "ic": items("ic", 50), "cf": items("cf", 60)}}
+            for y in range(10)]
+
+def indicator(ticker, limit):
+    return {"status": "OK", "ticker": ticker,
+            "results": {"values": [{"timestamp": 1700000000000 + i, "value": float(i)} for i in range(limit)]}}
+
+# tool -> (fetch latency in seconds, payload, ttl), mirroring the caches in custom_tools
+TOOLS = {
+    "fetch_financial_data": (0.001, quote, 3600),
+    "fetch_stock_news": (0.001, news, 900),
+    "_get_basic_financials": (0.002, basic_financials, 3600),
+    "_get_annual_financial_statements": (0.004, statements, 3600),
+    "fetch_technical_indicator": (0.002, indicator, 3600),
+}
+
+def make_cache(variant: str, name: str, ttl: float, budget_bytes: int, shared: CacheBudget):
+    if variant == "entries":
+        return TTLCache(maxsize=1024, ttl=ttl)
+    if variant == "sized":
+        return TTLCache(maxsize=budget_bytes // len(TOOLS), ttl=ttl, getsizeof=deep_sizeof)
+    return BudgetedTTLCache(name, ttl=ttl, budget=shared)
+
+def workload(tickers: int, calls: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    ranks = np.minimum(rng.zipf(1.2, calls), tickers) - 1
+    tools = rng.choice(list(TOOLS), calls, p=[0.3, 0.2, 0.2, 0.1, 0.2])
+    limits = rng.choice([50, 500, 5000], calls, p=[0.5, 0.3, 0.2])
+    return [(f"T{r:04d}", tool, int(limit)) for r, tool, limit in zip(ranks, tools, limits)]
+
+def run(variant: str, tickers: int, calls: int, budget_bytes: int) -> dict:
+    shared = CacheBudget(budget_bytes)
+    fetched = {"calls": 0, "seconds": 0.0}
+    caches, functions = {}, {}
+    for name, (latency, payload, ttl) in TOOLS.items():
+        def fetch(*args, latency=latency, payload=payload):
+            time.sleep(latency)
+            fetched["calls"] += 1
+            fetched["seconds"] += latency
+            return payload(*args)
+        caches[name] = make_cache(variant, name, ttl, budget_bytes, shared)
+        functions[name] = cached(cache=caches[name])(fetch)
+
+    baseline = rss_mib()
+    started = time.perf_counter()
+    for ticker, tool, limit in workload(tickers, calls):
+        functions[tool](ticker, limit) if tool == "fetch_technical_indicator" else functions[tool](ticker)
+    seconds = time.perf_counter() - started
+    return {
+        "variant": variant,
+        "rss_mib": rss_mib() - baseline,
+        "bytes": {name: sum(deep_sizeof(v) for v in cache.values()) for name, cache in caches.items()},
+        "entries": sum(len(cache) for cache in caches.values()),
+        "hit_rate": 1 - fetched["calls"] / calls,
+        "refetch_seconds": fetched["seconds"],
+        "evictions": shared.evictions if variant == "budgeted" else None,
+        "seconds": seconds,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=1000)
+    parser.add_argument("--calls", type=int, default=10000)
+    parser.add_argument("--budget-mb", type=int, default=64)
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)  # one run, in a child process
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run(args.variant, args.tickers, args.calls, args.budget_mb * 2**20)))
+        sys.exit(0)
+
+    print(f"{args.tickers} tickers, {args.calls} tool calls, budget {args.budget_mb}MiB")
+    for variant in VARIANTS:
+        out = subprocess.run([sys.executable, __file__, "--variant", variant, "--tickers", str(args.tickers),
+                              "--calls", str(args.calls), "--budget-mb", str(args.budget_mb)],
+                             check=True, capture_output=True, text=True).stdout
+        r = json.loads(out.splitlines()[-1])
+        label = {"entries": "TTLCache(maxsize=1024)", "sized": "byte-sized TTLCache/tool",
+                 "budgeted": "BudgetedTTLCache (GDSF)"}[variant]
+        print(f"  {label:<25} rss +{r['rss_mib']:7.1f}MiB  cached={sum(r['bytes'].values()) / 2**20:7.1f}MiB "
+              f"entries={r['entries']:>5}  hit rate={r['hit_rate']:6.1%}  refetch={r['refetch_seconds']:5.1f}s  "
+              f"evictions={r['evictions'] if r['evictions'] is not None else '-'}")
+        for name, nbytes in r["bytes"].items():
+            print(f"      {name:<34} {nbytes / 2**20:8.1f}MiB")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Per-event overhead of the WebSocket callback handler: the previous handler
+(str(output) on the full result, stdout prints, one loop callback per event) vs. the
+AsyncCallbackHandler with bounded previews and a ring buffer. Outputs reach the handler
+the way ToolNode delivers them: already rendered into a ToolMessage string by BaseTool
+(json.dumps, str() for DataFrames), so that rendering is not part of either handler's cost.
+
+    python benchmarks/bench_callbacks.py --events 2000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+from langchain_core.messages import ToolMessage
+from langchain_core.tools.base import _stringify
+
+from stock_agent.utils.callback_util import WebSocketCallbackHandler
+
+class CountingManager:
+    def __init__(self):
+        self.published = 0
+
+    def publish(self, run_id, message):
+        self.published += 1
+
+class LegacyHandler:
+    # The previous WebSocketCallbackHandler tool path
+    def __init__(self, manager, analysis_run_id):
+        self.websocket_manager = manager
+        self.analysis_run_id = analysis_run_id
+        self._loop = asyncio.get_running_loop()
+
+    def _publish_tool_event(self, event_type, content, run_id):
+        message = {"type": event_type, "content": content, "timestamp": datetime.now().isoformat(),
+                   "run_id": str(run_id), "analysis_run_id": self.analysis_run_id}
+        self._loop.call_soon_threadsafe(self.websocket_manager.publish, self.analysis_run_id, json.dumps(message))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        print("----------------------------------")
+        print("run_id:", run_id)
+        print("parent_run_id:", parent_run_id)
+        print("tags:", tags)
+        tool_name = serialized.get('name', 'Unknown Tool')
+        description = f"Tool Start: Running tool '{tool_name}' with input: {input_str[:100]}{'...' if len(input_str) > 100 else ''}"
+        print(f"[WebSocketCallback] {description}")
+        self._publish_tool_event("start", description, run_id)
+
+    def on_tool_end(self, output, *, run_id, parent_run_id=None, tags=None, **kwargs):
+        print("----------------------------------")
+        print("run_id:", run_id)
+        print("parent_run_id:", parent_run_id)
+        print("tags:", tags)
+        output_str = str(output)
+        description = f"Tool End: Output: {output_str[:200]}{'...' if len(output_str) > 200 else ''}"
+        print(f"[WebSocketCallback] {description}")
+        self._publish_tool_event("end", description, run_id)
+
+def make_outputs():
+    rng = np.random.default_rng(7)
+    index = pd.bdate_range(end="2025-01-01", periods=252)
+    prices = pd.DataFrame(rng.normal(100, 5, (len(index), 5)), index=index, columns=["Open", "High", "Low", "Close", "Volume"])
+    filings = {"results": [{"fiscal_period": f"Q{i % 4 + 1}", "financials": {f"line_{j}": {"value": float(j)} for j in range(80)}}
+                           for i in range(60)]}
+    raw = {"short_str": "AAPL closed at 187.2", "prices_1y": prices, "polygon_60_filings": filings}
+    # What BaseTool hands to on_tool_end when called with a tool_call_id (always, under ToolNode)
+    return {label: ToolMessage(output if isinstance(output, str) else _stringify(output), tool_call_id="call", name="stock_price_1y")
+            for label, output in raw.items()}
+
+async def measure(name, handler, output, events, manager, is_async):
+    serialized = {"name": "stock_price_1y"}
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()) as sink:
+        for _ in range(events):
+            run_id = uuid.uuid4()
+            if is_async:
+                await handler.on_tool_start(serialized, '{"ticker": "AAPL"}', run_id=run_id)
+                await handler.on_tool_end(output, run_id=run_id)
+            else:
+                handler.on_tool_start(serialized, '{"ticker": "AAPL"}', run_id=run_id)
+                handler.on_tool_end(output, run_id=run_id)
+            await asyncio.sleep(0)  # the loop runs between tool calls, letting scheduled publishes go out
+    cpu = time.process_time() - start_cpu
+    wall = time.perf_counter() - start_wall
+    n = events * 2
+    print(f"{name:<8} cpu={cpu / n * 1e6:8.1f}us/event wall={wall / n * 1e6:8.1f}us/event "
+          f"published={manager.published} stdout={len(sink.getvalue())} bytes")
+
+async def run(events: int):
+    for label, output in make_outputs().items():
+        print(f"output={label} ({len(output.content)} chars)")
+        manager = CountingManager()
+        await measure("before", LegacyHandler(manager, "run"), output, events, manager, is_async=False)
+        manager = CountingManager()
+        await measure("after", WebSocketCallbackHandler(manager, "run"), output, events, manager, is_async=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.events))
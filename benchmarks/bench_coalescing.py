@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LLM calls saved by request coalescing under concurrent load (stub graph, no API keys).
+Clients arrive over --arrival seconds asking about one of --companies companies; every
+graph run makes 7 stub LLM calls (the seven analyst/manager nodes).
+
+    python benchmarks/bench_coalescing.py --clients 200 --companies 10 --arrival 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.coalescing import RunCoalescer, request_key
+from benchmarks.stubs import percentile
+
+LLM_CALLS_PER_RUN = 7
+
+def make_stub_source(company: str, llm_latency: float, counter: dict):
+    async def source(run_id):
+        yield {'run_id': run_id}
+        for node in range(LLM_CALLS_PER_RUN):
+            await asyncio.sleep(llm_latency)
+            counter["llm_calls"] += 1
+            yield {"content": f"node_{node}: {company} analysis", "node": f"node_{node}"}
+    return source
+
+async def client(coalescer: RunCoalescer, company: str, delay: float, llm_latency: float, counter: dict):
+    await asyncio.sleep(delay)
+    start = time.perf_counter()
+    source = make_stub_source(company, llm_latency, counter)
+    if coalescer is None:
+        events = [event async for event in source("solo")]
+    else:
+        run = coalescer.attach(request_key(company, None, "full"), source)
+        events = [event async for _, batch in coalescer.stream(run) for _, event in batch]
+    assert len(events) == LLM_CALLS_PER_RUN + 1
+    return time.perf_counter() - start
+
+async def run(clients: int, companies: int, arrival: float, llm_latency: float, window: float, coalesce: bool):
+    rng = random.Random(7)
+    counter = {"llm_calls": 0}
+    coalescer = RunCoalescer(window=window) if coalesce else None
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(
+        client(coalescer, f"C{rng.randrange(companies):03d}", rng.uniform(0, arrival), llm_latency, counter)
+        for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    label = f"coalesced(window={window}s)" if coalesce else "independent"
+    print(f"{label:<24} clients={clients} companies={companies} llm_calls={counter['llm_calls']} "
+          f"(vs {clients * LLM_CALLS_PER_RUN} uncoalesced) p50={percentile(latencies, 0.5):.2f}s "
+          f"p95={percentile(latencies, 0.95):.2f}s elapsed={elapsed:.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--companies", type=int, default=10)
+    parser.add_argument("--arrival", type=float, default=5.0)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--window", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.companies, args.arrival, args.llm_latency, args.window, coalesce=False))
+    asyncio.run(run(args.clients, args.companies, args.arrival, args.llm_latency, args.window, coalesce=True))
+    asyncio.run(run(args.clients, args.companies, args.arrival, args.llm_latency, 30.0, coalesce=True))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Job queue throughput vs. worker count with a stub runner (no graph, no API keys).
+Each job emits a few events and awaits for --job-latency seconds, like an analysis
+that is dominated by LLM calls.
+
+    python benchmarks/bench_jobs.py --jobs 64 --workers 1,2,4,8,16
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.jobs import JobQueue, TERMINAL_STATUSES
+
+def make_stub_runner(latency: float, events: int):
+    async def run(payload, emit, job_id):
+        for i in range(events):
+            await asyncio.sleep(latency / events)
+            emit({"content": f"stub: {payload['company']} step {i}"})
+        return {"content": "done"}
+    return run
+
+async def run(n_jobs: int, workers: int, latency: float, events: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = JobQueue(make_stub_runner(latency, events), db_path=os.path.join(tmp, "jobs.sqlite3"), workers=workers)
+        await queue.start()
+        start = time.perf_counter()
+        jobs = [await queue.submit("analysis", {"company": f"T{i:03d}"}) for i in range(n_jobs)]
+        submit_ms = (time.perf_counter() - start) * 1000 / n_jobs
+        # Follow every job's event stream, as attached SSE clients would
+        streamed = await asyncio.gather(*(_drain(queue, job["id"]) for job in jobs))
+        elapsed = time.perf_counter() - start
+        await queue.stop()
+        finished = await asyncio.gather(*(queue.get(job["id"]) for job in jobs))
+        failed = sum(1 for job in finished if job["status"] != "succeeded")
+    print(f"workers={workers:>2} jobs={n_jobs} elapsed={elapsed:.2f}s throughput={n_jobs / elapsed * 60:.0f} jobs/min "
+          f"submit={submit_ms:.2f}ms/job events={sum(streamed)} failed={failed}")
+
+async def _drain(queue: JobQueue, job_id: str) -> int:
+    count = 0
+    async for _ in queue.events(job_id):
+        count += 1
+    assert (await queue.get(job_id))["status"] in TERMINAL_STATUSES
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=64)
+    parser.add_argument("--workers", default="1,2,4,8,16")
+    parser.add_argument("--job-latency", type=float, default=0.5)
+    parser.add_argument("--events", type=int, default=5)
+    args = parser.parse_args()
+    for n in [int(w) for w in args.workers.split(",")]:
+        asyncio.run(run(args.jobs, n, args.job_latency, args.events))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LLM client pool vs. a new client per call, against the local OpenAI-compatible stub,
+for the ChatOpenAI and ChatOpenRouter paths (sync threads like parallel graph branches,
+and asyncio). Reports throughput, latency, clients built, TCP connections opened and
+the peak concurrency the endpoint saw (capped by the per-model limiter).
+
+    python benchmarks/bench_llm_pool.py --calls 200 --parallel 32 --limit 8
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+from benchmarks.stubs import OpenAIStubHandler, percentile, start_server
+from stock_agent.utils import llm_util
+from stock_agent.utils.llm_pool_util import LLMClientPool
+from stock_agent.utils.llm_util import ModelSpec, build_chat_model
+
+class CountingOpenAIStub(OpenAIStubHandler):
+    """Counts TCP connections and the peak number of concurrent requests."""
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        with self.server.lock:
+            self.server.active += 1
+            self.server.peak = max(self.server.peak, self.server.active)
+        try:
+            super().do_POST()
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+def reset(server):
+    server.connections = server.active = server.peak = 0
+
+def spec_for(provider: str, base_url: str, limit: int) -> ModelSpec:
+    return ModelSpec(tier="bench", provider=provider, model="stub-model", max_retries=0,
+                     kwargs=(("base_url", base_url),), max_concurrency=limit)
+
+def report(label, server, latencies, elapsed, created):
+    print(f"{label:<34} calls={len(latencies)} throughput={len(latencies) / elapsed:7.1f}/s p50={percentile(latencies, 0.5) * 1000:6.0f}ms "
+          f"p99={percentile(latencies, 0.99) * 1000:6.0f}ms clients_built={created} tcp_connections={server.connections} peak_concurrency={server.peak}")
+
+def run_sync(label, server, spec, calls, parallel, pooled):
+    reset(server)
+    llm_util.llm_pool = LLMClientPool(build_chat_model)
+    created = [0]
+    lock = threading.Lock()
+
+    def call(_):
+        start = time.perf_counter()
+        if pooled:
+            with llm_util.get_limiter(spec).slot():
+                llm_util.get_chat_model(spec, 30).invoke("hi")
+        else:
+            with lock:
+                created[0] += 1
+            # The old pattern: a fresh client (and HTTP connection pool) per lazy initialisation
+            llm_util.build_chat_model(ModelSpec(**{**spec.__dict__, "kwargs": spec.kwargs + (("http_client", None),)}), 30).invoke("hi")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(parallel) as pool:
+        latencies = list(pool.map(call, range(calls)))
+    report(label, server, latencies, time.perf_counter() - start, llm_util.llm_pool.created if pooled else created[0])
+
+async def run_async(label, server, spec, calls, parallel, pooled):
+    reset(server)
+    llm_util.llm_pool = LLMClientPool(build_chat_model)
+    semaphore = asyncio.Semaphore(parallel)
+    created = [0]
+
+    async def call():
+        async with semaphore:
+            start = time.perf_counter()
+            if pooled:
+                async with llm_util.get_limiter(spec).aslot():
+                    await llm_util.get_chat_model(spec, 30).ainvoke("hi")
+            else:
+                created[0] += 1
+                await llm_util.build_chat_model(ModelSpec(**{**spec.__dict__, "kwargs": spec.kwargs + (("http_client", None),)}), 30).ainvoke("hi")
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(call() for _ in range(calls)))
+    report(label, server, latencies, time.perf_counter() - start, llm_util.llm_pool.created if pooled else created[0])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--parallel", type=int, default=32, help="concurrent callers")
+    parser.add_argument("--limit", type=int, default=8, help="per-model concurrency cap")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub completion latency")
+    args = parser.parse_args()
+
+    server, base_url = start_server(CountingOpenAIStub, latency=args.latency, lock=threading.Lock())
+    reset(server)
+
+    async def main():
+        # One event loop for every async run: the SDKs' async HTTP clients are bound to the loop that first used them
+        for provider in ("openai", "openrouter"):
+            spec = spec_for(provider, base_url, args.limit)
+            for pooled in (False, True):
+                mode = "pooled" if pooled else "per-call"
+                await asyncio.to_thread(run_sync, f"{provider} sync {mode}", server, spec, args.calls, args.parallel, pooled)
+                await run_async(f"{provider} async {mode}", server, spec, args.calls, args.parallel, pooled)
+
+    asyncio.run(main())
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Macro regime features served from the local time-series store: cold computation,
+warm (cached) lookups, and recomputation after new observations arrive. No network.
+
+    python benchmarks/bench_macro_features.py --years 5 --lookups 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stubs import percentile
+from stock_agent.utils.macro_util import GROWTH_SERIES, LEVEL_SERIES, MacroFeatures
+from stock_agent.utils.timeseries_util import TimeSeriesStore
+
+def fill(store: TimeSeriesStore, years: int, end: str = "2024-06-30"):
+    rng = np.random.default_rng(0)
+    for series_id in list(LEVEL_SERIES) + list(GROWTH_SERIES):
+        # Rates/levels: daily random walk; indexes/counts: monthly drift
+        step = 1 if series_id in LEVEL_SERIES else 30
+        dates = np.arange(np.datetime64(end) - np.timedelta64(365 * years, "D"), np.datetime64(end), step)
+        base = 3.0 if series_id in LEVEL_SERIES else 100.0
+        values = base + np.cumsum(rng.normal(0, 0.05 if step == 1 else 0.3, len(dates)))
+        store.upsert(series_id, dates, values)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TimeSeriesStore(tmp)
+        fill(store, args.years)
+        features = MacroFeatures(TimeSeriesStore(tmp))  # a separate handle, like the API process
+
+        start = time.perf_counter()
+        result = features.get()
+        print(f"cold compute        {(time.perf_counter() - start) * 1000:8.2f}ms  series={len(result['series'])} regime={result['regime']['label']}")
+
+        latencies = []
+        for _ in range(args.lookups):
+            t = time.perf_counter()
+            features.get()
+            latencies.append(time.perf_counter() - t)
+        print(f"warm lookup         p50={percentile(latencies, 0.5) * 1000:.3f}ms p99={percentile(latencies, 0.99) * 1000:.3f}ms")
+
+        time.sleep(0.01)  # distinct meta mtime
+        store.upsert("VIXCLS", ["2024-06-30"], [35.0])
+        start = time.perf_counter()
+        result = features.get()
+        print(f"after new data      {(time.perf_counter() - start) * 1000:8.2f}ms  VIX={result['series']['VIXCLS']['value']} regime={result['regime']['label']}")
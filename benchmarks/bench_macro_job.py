@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Macro job wall-clock time against the local FRED stub: the old one-series-at-a-time loop
+vs. the concurrent fetcher, plus a degraded run where one series hangs and one fails
+transiently (per-series timeouts, retries and partial success).
+
+    python benchmarks/bench_macro_job.py --latency 0.3 --workers 6
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stubs import FredStubHandler, start_server
+from stock_agent.utils.timeseries_util import TimeSeriesStore
+
+class FaultyFredStub(FredStubHandler):
+    """`hang` series sleep past the read timeout; `flaky` series return 503 on their first request."""
+
+    def do_GET(self):
+        path = self.path
+        if any(f"series_id={s}&" in path for s in self.server.hang):
+            time.sleep(self.server.hang_seconds)
+        for series in self.server.flaky:
+            if f"series_id={series}&" in path:
+                with self.server.lock:
+                    first = series not in self.server.seen
+                    self.server.seen.add(series)
+                if first:
+                    return self._send_json({"error": "unavailable"}, status=503)
+        super().do_GET()
+
+def legacy_job(base_url, series_ids, start_date, end_date):
+    """The pre-change loop: one bare requests.get per series, float() per row."""
+    import requests
+    all_data = {}
+    for series_id in series_ids:
+        url = f"{base_url}/fred/series/observations?series_id={series_id}&api_key=stub&file_type=json&observation_start={start_date}&observation_end={end_date}"
+        observations = requests.get(url).json().get("observations")
+        all_data[series_id] = [{"date": obs["date"], "value": float(obs["value"]) if obs["value"] != "." and obs["value"] is not None else None} for obs in observations]
+    return all_data
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3, help="stub FRED latency per request")
+    parser.add_argument("--workers", type=int, default=6)
+    parser.add_argument("--years", type=int, default=1, help="history requested per series (daily observations)")
+    args = parser.parse_args()
+
+    server, base_url = start_server(FaultyFredStub, latency=args.latency, hang=(), flaky=(), hang_seconds=0,
+                                    lock=threading.Lock(), seen=set())
+    os.environ["STOCK_AGENT_FRED_BASE_URL"] = base_url
+    os.environ["STOCK_AGENT_FRED_TIMEOUT_SECONDS"] = "2"
+    os.environ.setdefault("FRED_API_KEY", "stub")
+    from backend import macro_job
+
+    end_date = time.strftime("%Y-%m-%d")
+    start_date = f"{int(end_date[:4]) - args.years}{end_date[4:]}"
+    series = macro_job.SERIES_IDS
+
+    start = time.perf_counter()
+    legacy = legacy_job(base_url, series, start_date, end_date)
+    print(f"sequential (legacy)           {time.perf_counter() - start:6.2f}s  series={len(legacy)}")
+
+    start = time.perf_counter()
+    data, failed = macro_job.fetch_macro_series(series, "stub", start_date, end_date, workers=args.workers)
+    print(f"concurrent workers={args.workers:<10} {time.perf_counter() - start:6.2f}s  series={len(data)} failed={len(failed)}")
+    assert {k: macro_job.to_records(*v) for k, v in data.items()} == legacy, "vectorized parser disagrees with the legacy parser"
+
+    import requests
+    raw = requests.get(f"{base_url}/fred/series/observations?series_id=SP500&observation_start={start_date}&observation_end={end_date}").json()["observations"]
+    for label, parse in (("float() per row", lambda obs: [{"date": o["date"], "value": float(o["value"]) if o["value"] != "." and o["value"] is not None else None} for o in obs]),
+                         ("vectorized", macro_job.parse_observations)):
+        start = time.perf_counter()
+        for _ in range(200):
+            parse(raw)
+        print(f"parse {label:<23} {(time.perf_counter() - start) * 1000 / 200:6.3f}ms per series ({len(raw)} rows)")
+
+    server.hang, server.hang_seconds, server.flaky = ("VIXCLS",), 30, ("DGS10", "UNRATE")
+    with tempfile.TemporaryDirectory() as tmp:
+        report = macro_job.update_macro_store(TimeSeriesStore(tmp), end_date=end_date)
+    print(f"degraded (1 hang, 2 flaky)    {report['seconds']:6.2f}s  saved={len(report['updated'])} failed={list(report['failed'])}")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Daily macro job over simulated days against the local FRED stub: the old approach
+(re-download six months of every series, store the whole blob per day) vs. incremental
+updates into the local columnar TimeSeriesStore. Reports bytes fetched, bytes stored,
+that revisions are picked up, and range-query latency.
+
+    python benchmarks/bench_macro_store.py --days 30
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stubs import FredStubHandler, percentile, start_server
+from stock_agent.utils.timeseries_util import TimeSeriesStore
+
+class DeterministicFredStub(FredStubHandler):
+    """Values depend only on (series, date), so overlapping requests agree unless `revisions` says otherwise."""
+
+    def do_GET(self):
+        from urllib.parse import parse_qs, urlparse
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        series = query["series_id"]
+        current, last = date.fromisoformat(query["observation_start"]), date.fromisoformat(query["observation_end"])
+        observations = []
+        while current <= last:
+            day = current.isoformat()
+            value = (zlib.crc32(f"{series}{day}".encode()) % 10000) / 100 + self.server.revisions.get((series, day), 0)
+            observations.append({"realtime_start": query["observation_end"], "realtime_end": query["observation_end"],
+                                 "date": day, "value": f"{value:.2f}"})
+            current += timedelta(days=1)
+        self._send_json({"observations": observations})
+
+    def _send_json(self, payload, status=200):
+        with self.server.lock:
+            self.server.bytes_sent += len(json.dumps(payload))
+        super()._send_json(payload, status)
+
+def fetched_bytes(server, run):
+    before = server.bytes_sent
+    result = run()
+    return server.bytes_sent - before, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=30, help="simulated daily runs")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    server, base_url = start_server(DeterministicFredStub, latency=0.0, lock=threading.Lock(), bytes_sent=0, revisions={})
+    os.environ["STOCK_AGENT_FRED_BASE_URL"] = base_url
+    os.environ.setdefault("FRED_API_KEY", "stub")
+    from backend import macro_job
+
+    first_day = date(2024, 6, 1)
+    days = [(first_day + timedelta(days=i)).isoformat() for i in range(args.days)]
+    series = macro_job.SERIES_IDS
+
+    # Old approach: six months of everything, one full document per day
+    legacy_fetched = legacy_stored = 0
+    documents = []
+    for day in days:
+        start = (date.fromisoformat(day) - timedelta(days=183)).isoformat()
+        n, (data, _) = fetched_bytes(server, lambda: macro_job.fetch_macro_series(series, "stub", start, day))
+        document = json.dumps({s: macro_job.to_records(*columns) for s, columns in data.items()})
+        legacy_fetched += n
+        legacy_stored += len(document)
+        documents.append(document)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TimeSeriesStore(tmp)
+        incremental_fetched = 0
+        revised = 0
+        for i, day in enumerate(days):
+            if i == len(days) // 2:
+                # FRED revises a recent print of every series
+                recent = (date.fromisoformat(day) - timedelta(days=2)).isoformat()
+                server.revisions.update({(s, recent): 0.5 for s in series})
+            n, report = fetched_bytes(server, lambda: macro_job.update_macro_store(store, series, end_date=day))
+            incremental_fetched += n
+            revised += sum(u["revised"] for u in report["updated"].values())
+        check_dates, check_values = store.query("DGS10", recent, recent)
+        assert abs(check_values[0] - (zlib.crc32(f"DGS10{recent}".encode()) % 10000) / 100 - 0.5) < 1e-9, "revision not applied"
+
+        print(f"{'':<22}{'fetched':>14}{'stored':>14}")
+        print(f"{'full daily blob':<22}{legacy_fetched:>14,}{legacy_stored:>14,}")
+        print(f"{'incremental store':<22}{incremental_fetched:>14,}{store.nbytes():>14,}   revisions applied={revised}")
+
+        # Range query: last 30 days of one series
+        q_start, q_end = (date.fromisoformat(days[-1]) - timedelta(days=30)).isoformat(), days[-1]
+        latencies = []
+        for _ in range(args.queries):
+            t = time.perf_counter()
+            rows = [r for r in json.loads(documents[-1])["DGS10"] if q_start <= r["date"] <= q_end]
+            latencies.append(time.perf_counter() - t)
+        print(f"range query, blob     p50={percentile(latencies, 0.5) * 1e6:8.1f}us p99={percentile(latencies, 0.99) * 1e6:8.1f}us rows={len(rows)}")
+        latencies = []
+        for _ in range(args.queries):
+            t = time.perf_counter()
+            dates, values = store.query("DGS10", q_start, q_end)
+            latencies.append(time.perf_counter() - t)
+        print(f"range query, store    p50={percentile(latencies, 0.5) * 1e6:8.1f}us p99={percentile(latencies, 0.99) * 1e6:8.1f}us rows={len(dates)}")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Price history served from the local OHLCV store vs one provider download per (ticker, period)
+held in a TTLCache, as fetch_price_history used to do. A simulated provider (fixed latency,
+call counter) stands in for yfinance. Each ticker is read the way one analysis reads it:
+1mo and 1y (price tools, risk engine, quick scan) and 10y (backtest). The whole workload
+runs twice, the second time as a restarted process after the refresh interval.
+
+    python benchmarks/bench_ohlcv_store.py --tickers 200 --latency 0.05
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from cachetools import TTLCache
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stubs import percentile
+from stock_agent.utils.ohlcv_util import OHLCV_REFRESH_SECONDS, OHLCVStore, period_start
+
+PERIODS = ("1mo", "1y", "1y", "10y")
+
+class SimulatedProvider:
+    """yfinance history() for synthetic tickers: 10 years of business days plus any new ones."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = {"full": 0, "incremental": 0}
+        self.bars = 0
+        self._index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=2600, tz="America/New_York")
+
+    def history(self, ticker: str, period: str = None, start: str = None) -> pd.DataFrame:
+        time.sleep(self.latency)
+        dates = self._index.tz_localize(None)
+        lo = pd.Timestamp(start) if start else pd.Timestamp(period_start(period) or dates[0])
+        index = self._index[dates >= lo]
+        rng = np.random.default_rng(abs(hash(ticker)) % 2**32)
+        close = 100 * np.cumprod(1 + rng.normal(0.0003, 0.015, len(self._index)))[-len(index):]
+        self.calls["incremental" if start else "full"] += 1
+        self.bars += len(index)
+        return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                             "Volume": np.full(len(index), 1e6), "Dividends": 0.0, "Stock Splits": 0.0}, index=index)
+
+def run_ttl_cache(tickers, provider):
+    cache = TTLCache(maxsize=1024, ttl=3600)
+    for ticker in tickers:
+        for period in PERIODS:
+            key = (ticker, period)
+            if key not in cache:
+                cache[key] = provider.history(ticker, period=period)
+            cache[key]["Close"]
+    return cache
+
+def run_store(tickers, root, provider):
+    store = OHLCVStore(root, provider.history)
+    for ticker in tickers:
+        for period in PERIODS:
+            store.bars(ticker, period).close
+    return store
+
+def age(root: str, seconds: float):
+    """Pretend every stored ticker was last checked `seconds` ago (as after a restart the next day)."""
+    for ticker in os.listdir(root):
+        path = os.path.join(root, ticker, "meta.json")
+        with open(path) as f:
+            meta = json.load(f)
+        meta["checked_at"] -= seconds
+        with open(path, "w") as f:
+            json.dump(meta, f)
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = fn()
+    seconds = time.perf_counter() - start
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return kept, seconds, heap
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated provider latency per call (s)")
+    parser.add_argument("--slices", type=int, default=2000)
+    args = parser.parse_args()
+    tickers = [f"T{i:04d}" for i in range(args.tickers)]
+
+    with tempfile.TemporaryDirectory() as root:
+        for run in ("first run", "restarted"):
+            if run == "restarted":
+                age(root, OHLCV_REFRESH_SECONDS + 1)  # past the refresh interval: new bars are asked for
+            old = SimulatedProvider(args.latency)
+            cache, old_seconds, old_heap = measure(lambda: run_ttl_cache(tickers, old))
+            new = SimulatedProvider(args.latency)
+            store, new_seconds, new_heap = measure(lambda: run_store(tickers, root, new))
+            print(f"{run}:")
+            print(f"  TTLCache per period  fetches={sum(old.calls.values()):>5} bars downloaded={old.bars:>8}  "
+                  f"time={old_seconds:6.2f}s  heap kept={old_heap / 2**20:7.1f}MiB")
+            print(f"  OHLCV store          fetches={sum(new.calls.values()):>5} ({new.calls['full']} full, "
+                  f"{new.calls['incremental']} incremental) bars downloaded={new.bars:>8}  time={new_seconds:6.2f}s  "
+                  f"heap kept={new_heap / 2**20:7.1f}MiB  on disk={store.nbytes() / 2**20:.1f}MiB")
+
+        rng = np.random.default_rng(0)
+        picks = [(tickers[i], PERIODS[j]) for i, j in zip(rng.integers(0, len(tickers), args.slices), rng.integers(0, len(PERIODS), args.slices))]
+        timings = {"store.bars": [], "store.frame": [], "TTLCache hit": []}
+        for ticker, period in picks:
+            for name, fn in (("store.bars", lambda: store.bars(ticker, period)),
+                             ("store.frame", lambda: store.frame(ticker, period)),
+                             ("TTLCache hit", lambda: cache[(ticker, period)])):
+                t = time.perf_counter()
+                fn()
+                timings[name].append(time.perf_counter() - t)
+        for name, samples in timings.items():
+            print(f"  {name:<13} p50={percentile(samples, 0.5) * 1e6:8.1f}us  p99={percentile(samples, 0.99) * 1e6:8.1f}us")
+        print(f"  a TTLCache miss costs a provider call ({args.latency * 1000:.0f}ms simulated)")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Quick scan throughput with replayed fixtures (no network, no API keys).
+
+    python benchmarks/bench_quick_scan.py --tickers 500 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from stock_agent import quick_scan
+
+def make_fixtures(tickers: list[str], seed: int = 7) -> dict:
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=252)
+    fixtures = {}
+    for ticker in tickers:
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(index))))
+        fixtures[ticker] = {
+            "history": pd.DataFrame({"Close": close}, index=index),
+            "metric": {"metric": {k: float(rng.uniform(0.1, 40)) for k in quick_scan.RATIO_KEYS}},
+            "news": [{"content": {"title": f"{ticker} headline {i}"}} for i in range(8)],
+        }
+    return fixtures
+
+def install_fixtures(fixtures: dict, fetch_latency: float):
+    # Replay recorded provider responses with a fixed latency instead of hitting the network
+    def _replay(kind):
+        def fetch(ticker, *args):
+            time.sleep(fetch_latency)
+            return fixtures[ticker][kind]
+        return fetch
+    quick_scan._get_basic_financials = _replay("metric")
+    quick_scan._get_finnhub_client = lambda: None
+    quick_scan.fetch_price_history = _replay("history")
+    quick_scan.fetch_stock_news = _replay("news")
+
+def make_stub_llm(latency: float):
+    async def _respond(prompt):
+        await asyncio.sleep(latency)
+        return AIMessage(content=json.dumps({"ticker": "?", "score": 50, "rating": "HOLD", "summary": "stub"}))
+    return RunnableLambda(_respond)
+
+async def run(n_tickers: int, concurrency: int, llm_latency: float, fetch_latency: float):
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    install_fixtures(make_fixtures(tickers), fetch_latency)
+    graph = quick_scan.build_quick_scan_graph(make_stub_llm(llm_latency))
+
+    start = time.perf_counter()
+    results = await quick_scan.scan_universe(tickers, concurrency=concurrency, graph=graph)
+    elapsed = time.perf_counter() - start
+
+    errors = sum(1 for r in results if "error" in r)
+    print(f"tickers={n_tickers} concurrency={concurrency} llm_latency={llm_latency}s fetch_latency={fetch_latency}s")
+    print(f"elapsed={elapsed:.2f}s throughput={n_tickers / elapsed * 60:.0f} tickers/min errors={errors}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--fetch-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(run(args.tickers, args.concurrency, args.llm_latency, args.fetch_latency))
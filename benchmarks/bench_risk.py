@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Risk engine scaling on synthetic daily closes: date alignment of N price series, then the
+N x N covariance / correlation, betas, rolling volatility and VaR, against pandas and a
+per-pair loop. No network.
+
+    python benchmarks/bench_risk.py --tickers 50 500 --days 252 1260
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stock_agent.utils.risk_util import (
+    align_returns, betas, correlation, covariance, historical_var, parametric_var, rolling_volatility)
+
+def synthetic_closes(tickers: int, days: int) -> dict:
+    """One-factor market model; every ticker misses a few random days, as real histories do."""
+    rng = np.random.default_rng(tickers * days)
+    index = pd.bdate_range(end="2024-06-28", periods=days + 1, tz="America/New_York")
+    market = rng.normal(0.0003, 0.01, days + 1)
+    closes = {"SPY": pd.Series(100 * np.cumprod(1 + market), index=index)}
+    loadings = rng.uniform(0.3, 1.8, tickers)
+    noise = rng.normal(0, 0.015, (days + 1, tickers))
+    prices = 50 * np.cumprod(1 + market[:, None] * loadings + noise, axis=0)
+    for j in range(tickers):
+        keep = rng.random(days + 1) > 0.002
+        closes[f"T{j:04d}"] = pd.Series(prices[keep, j], index=index[keep])
+    return closes
+
+def best_of(fn, repeat: int = 5) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def pairwise_covariance(returns: np.ndarray) -> np.ndarray:
+    n = returns.shape[1]
+    out = np.empty((n, n))
+    for i in range(n):
+        for j in range(i, n):
+            out[i, j] = out[j, i] = np.cov(returns[:, i], returns[:, j])[0, 1]
+    return out
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--days", type=int, nargs="+", default=[252, 1260])
+    parser.add_argument("--pairwise-max", type=int, default=200, help="skip the per-pair loop above this many tickers")
+    args = parser.parse_args()
+
+    for n in args.tickers:
+        for days in args.days:
+            closes = synthetic_closes(n, days)
+            align = best_of(lambda: align_returns(closes), 3)
+            tickers, _, returns = align_returns(closes)
+            market, stocks = returns[:, tickers.index("SPY")], np.delete(returns, tickers.index("SPY"), axis=1)
+            frame = pd.DataFrame(stocks)
+            assert np.allclose(covariance(stocks), frame.cov().to_numpy())
+
+            print(f"{n:>4} tickers x {len(returns):>4} days  align={align:8.2f}ms")
+            print(f"    covariance   numpy={best_of(lambda: covariance(stocks)):8.2f}ms  pandas={best_of(lambda: frame.cov()):8.2f}ms"
+                  + (f"  pairwise={best_of(lambda: pairwise_covariance(stocks), 1):9.1f}ms" if n <= args.pairwise_max else ""))
+            print(f"    correlation  numpy={best_of(lambda: correlation(stocks)):8.2f}ms  pandas={best_of(lambda: frame.corr()):8.2f}ms")
+            print(f"    betas        numpy={best_of(lambda: betas(stocks, market)):8.2f}ms  "
+                  f"per-ticker={best_of(lambda: [np.cov(stocks[:, j], market)[0, 1] / market.var(ddof=1) for j in range(n)], 1):8.2f}ms")
+            print(f"    rolling vol  numpy={best_of(lambda: rolling_volatility(stocks)):8.2f}ms  "
+                  f"pandas={best_of(lambda: frame.rolling(21).std()):8.2f}ms")
+            print(f"    VaR 95%      historical={best_of(lambda: historical_var(stocks)):8.2f}ms  "
+                  f"parametric={best_of(lambda: parametric_var(stocks)):8.2f}ms")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Event-loop lag and request latency while a scheduled job runs: the job called directly on
+the loop (what schedule_macro_job would have done) vs. the Scheduler's thread and process
+pools, for an I/O-bound job (blocking sleeps, like FRED requests) and a CPU-bound one.
+"Requests" are round trips to a local asyncio echo server on the same loop.
+
+    python benchmarks/bench_scheduler.py --seconds 2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.scheduler import ScheduledJob, Scheduler
+from benchmarks.stubs import percentile
+from stock_agent.utils.storage_util import SQLiteDocumentStore
+
+def io_job(seconds: float):
+    for _ in range(int(seconds / 0.1)):
+        time.sleep(0.1)
+
+def cpu_job(seconds: float):
+    deadline = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < deadline:
+        n += sum(i * i for i in range(1000))
+
+async def echo(reader, writer):
+    while data := await reader.read(64):
+        writer.write(data)
+        await writer.drain()
+    writer.close()
+
+async def measure(scheduler, reader, writer, run_job) -> tuple[list, list, float]:
+    rtts = []
+    done = asyncio.Event()
+
+    async def client():
+        while not done.is_set():
+            t = time.perf_counter()
+            writer.write(b"ping")
+            await reader.readexactly(4)
+            rtts.append(time.perf_counter() - t)
+            await asyncio.sleep(0.01)
+
+    mark = asyncio.get_running_loop().time()
+    task = asyncio.create_task(client())
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await run_job(scheduler)
+    elapsed = time.perf_counter() - start
+    done.set()
+    await task
+    lags = [lag for at, lag in scheduler.lag.samples if at >= mark]
+    return rtts, lags, elapsed
+
+async def main(seconds: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = Scheduler(state=SQLiteDocumentStore(os.path.join(tmp, "state.sqlite3")), lock_path=os.path.join(tmp, "lock"))
+        io, cpu = partial(io_job, seconds), partial(cpu_job, seconds)
+        scheduler.add(ScheduledJob("io_thread", io, every=3600))
+        scheduler.add(ScheduledJob("cpu_thread", cpu, every=3600))
+        scheduler.add(ScheduledJob("cpu_process", cpu, every=3600, executor="process"))
+        scheduler.lag.start()
+        server = await asyncio.start_server(echo, "127.0.0.1", 0)
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+
+        def inline(job):
+            async def run(_):
+                job()  # blocking call on the event loop
+            return run
+
+        cases = [
+            ("io job inline on loop", inline(io)),
+            ("io job, thread pool", lambda s: s.run_now("io_thread")),
+            ("cpu job inline on loop", inline(cpu)),
+            ("cpu job, thread pool", lambda s: s.run_now("cpu_thread")),
+            ("cpu job, process pool", lambda s: s.run_now("cpu_process")),
+        ]
+        for label, run_job in cases:
+            rtts, lags, elapsed = await measure(scheduler, reader, writer, run_job)
+            print(f"{label:<24} job={elapsed:5.2f}s requests={len(rtts):4d} rtt p50={percentile(rtts, 0.5) * 1000:8.2f}ms "
+                  f"p99={percentile(rtts, 0.99) * 1000:8.2f}ms loop lag max={max(lags, default=0) * 1000:8.1f}ms")
+        for name, job in scheduler.jobs.items():
+            print(f"history {name:<12} {[(r['trigger'], r['status'], r['seconds'], r['max_loop_lag_ms']) for r in job.history]}")
+        writer.close()
+        await writer.wait_closed()
+        await asyncio.sleep(0.05)  # let the echo handler see EOF
+        server.close()
+        await scheduler.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2.0, help="job duration")
+    args = parser.parse_args()
+    asyncio.run(main(args.seconds))
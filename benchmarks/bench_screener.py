@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Screener query latency vs universe size: a compound filter plus a ranked top-k over
+synthetic basic financials, compared with a per-ticker loop over the metric dicts.
+Also reports the cold load from the local document store, the one-off matrix build, and
+the first screen after a newly fetched ticker is recorded (the matrix is patched, not rebuilt).
+
+    python benchmarks/bench_screener.py --sizes 100 1000 5000 20000 --queries 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stubs import percentile
+from stock_agent.utils.screener_util import ALIASES, METRICS_COLLECTION, Screener
+from stock_agent.utils.storage_util import SQLiteDocumentStore
+
+FILTER = "pe > 0 and pe < 25 and revenue_growth > 5 and (roe > 15 or net_margin > 20) and debt_to_equity < 1.5"
+SORT_BY = "roe"
+LIMIT = 20
+
+def universe(size: int, extra_metrics: int = 100) -> dict:
+    """Ticker -> Finnhub-like `metric` dict (~120 keys, ~5% missing)."""
+    rng = np.random.default_rng(size)
+    keys = list(ALIASES.values()) + [f"metric{j}TTM" for j in range(extra_metrics)]
+    values = rng.normal(15, 12, (size, len(keys)))
+    missing = rng.random((size, len(keys))) < 0.05
+    return {
+        f"T{i:05d}": {k: float(v) for k, v, m in zip(keys, values[i], missing[i]) if not m}
+        for i in range(size)
+    }
+
+def naive_screen(metrics_by_ticker: dict) -> list:
+    get = lambda metrics, name: metrics.get(ALIASES[name])
+    matched = []
+    for ticker, m in metrics_by_ticker.items():
+        pe, growth, roe, margin, de = (get(m, n) for n in ("pe", "revenue_growth", "roe", "net_margin", "debt_to_equity"))
+        if pe is None or growth is None or de is None:
+            continue
+        if 0 < pe < 25 and growth > 5 and ((roe is not None and roe > 15) or (margin is not None and margin > 20)) and de < 1.5:
+            matched.append((ticker, roe))
+    matched.sort(key=lambda item: -item[1] if item[1] is not None else float("inf"))
+    return matched[:LIMIT]
+
+def timed(fn, n: int) -> list:
+    samples = []
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return samples
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            data = universe(size)
+            store = SQLiteDocumentStore(os.path.join(tmp, f"screener-{size}.sqlite3"))
+            store.upsert_many(METRICS_COLLECTION, {t: {"metric": m} for t, m in data.items()}, merge=False)
+
+            screener = Screener(store)
+            start = time.perf_counter()
+            screener._loaded()
+            load = time.perf_counter() - start
+            start = time.perf_counter()
+            screener.matrix()
+            build = time.perf_counter() - start
+
+            result = screener.screen(FILTER, SORT_BY, limit=LIMIT)
+            expected = [t for t, _ in naive_screen(data)]
+            assert [r["ticker"] for r in result["results"]] == expected, "screener and naive loop disagree"
+
+            start = time.perf_counter()
+            screener.record("NEW", data["T00000"])
+            screener.screen(FILTER, SORT_BY, limit=LIMIT)
+            patched = time.perf_counter() - start
+
+            fast = timed(lambda: screener.screen(FILTER, SORT_BY, limit=LIMIT), args.queries)
+            naive = timed(lambda: naive_screen(data), max(3, args.queries // 10))
+            print(f"{size:>6} tickers  load={load * 1000:8.1f}ms build={build * 1000:7.1f}ms "
+                  f"record+screen={patched * 1000:6.1f}ms  "
+                  f"screen p50={percentile(fast, 0.5) * 1000:6.2f}ms p99={percentile(fast, 0.99) * 1000:6.2f}ms  "
+                  f"naive p50={percentile(naive, 0.5) * 1000:8.2f}ms  matched={result['matched']}")
+            store.close()
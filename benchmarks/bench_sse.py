@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SSE encoding throughput and CPU per event: the previous per-event generator
+(json.dumps + asyncio.sleep(0.01), one write per event) vs. backend/sse.py
+(orjson when installed, no sleep, batched writes with event ids).
+
+    python benchmarks/bench_sse.py --events 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend import sse
+from backend.coalescing import SharedRun
+
+def make_events(n: int) -> list[dict]:
+    # Mostly small deltas with an occasional full agent report, like a quick scan + analysis mix
+    events = []
+    for i in range(n):
+        if i % 50 == 49:
+            events.append({"content": f"financial_analyst: {'report text ' * 400}", "node": "financial_analyst"})
+        else:
+            events.append({"content": f"quick_scan: T{i:04d} 71/100 BUY", "score": {"ticker": f"T{i:04d}", "score": 71, "rating": "BUY", "summary": "stub"}})
+    return events
+
+async def legacy_generator(events):
+    # The previous event_generator body
+    async for event in events:
+        yield f"data: {json.dumps(event)}\n\n"
+        await asyncio.sleep(0.01)
+
+async def produce(run: SharedRun, events: list[dict], burst: int):
+    for i, event in enumerate(events):
+        run.append(event)
+        if i % burst == burst - 1:
+            await asyncio.sleep(0)
+    run.finish()
+
+async def consume(name: str, stream, n: int):
+    wall, cpu = time.perf_counter(), time.process_time()
+    writes = size = 0
+    async for chunk in stream:
+        writes += 1
+        size += len(chunk)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    print(f"{name:<22} events={n} writes={writes} bytes={size} elapsed={wall:.2f}s "
+          f"throughput={n / wall:,.0f} events/s cpu={cpu / n * 1e6:.1f}us/event")
+
+async def run(n: int, burst: int, legacy: bool):
+    events = make_events(n)
+
+    if legacy:
+        async def flat(run):
+            async for _, batch in run.batches():
+                for _, event in batch:
+                    yield event
+        shared = SharedRun("bench", "legacy")
+        producer = asyncio.create_task(produce(shared, events, burst))
+        await consume("before (json+sleep)", legacy_generator(flat(shared)), n)
+        await producer
+
+    for label, module in (("after (json)", None), (f"after ({'orjson' if sse.orjson else 'json'})", sse.orjson)):
+        sse.orjson = module
+        shared = SharedRun("bench", "run")
+        producer = asyncio.create_task(produce(shared, events, burst))
+        await consume(label, sse.sse_stream(shared.batches(), shared.run_id), n)
+        await producer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--burst", type=int, default=20, help="events appended between producer yields")
+    parser.add_argument("--skip-legacy", action="store_true", help="the old generator sleeps 10ms per event")
+    args = parser.parse_args()
+    asyncio.run(run(args.events, args.burst, not args.skip_legacy))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Local document store write latency and throughput: one upsert per document vs.
+batched upsert_many, replace vs. merge, plus point-read latency. No credentials needed.
+
+    python benchmarks/bench_storage.py --docs 5000 --batch 1,50,500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.stubs import percentile
+from stock_agent.utils.storage_util import SQLiteDocumentStore
+
+def document(i: int, fields: int) -> dict:
+    # Shaped like a macro document: a few series of {date, value} records
+    return {f"S{f}": [{"date": f"2024-06-{d:02d}", "value": i + f + d / 10} for d in range(1, 6)] for f in range(fields)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--fields", type=int, default=4)
+    parser.add_argument("--batch", default="1,50,500", help="documents per upsert_many call")
+    args = parser.parse_args()
+
+    docs = {f"doc-{i:06d}": document(i, args.fields) for i in range(args.docs)}
+    keys = list(docs)
+    with tempfile.TemporaryDirectory() as tmp:
+        for merge in (False, True):
+            for batch in (int(b) for b in args.batch.split(",")):
+                store = SQLiteDocumentStore(os.path.join(tmp, f"bench-{merge}-{batch}.sqlite3"))
+                for round_ in ("insert", "update"):
+                    latencies = []
+                    start = time.perf_counter()
+                    for i in range(0, len(keys), batch):
+                        t = time.perf_counter()
+                        store.upsert_many("bench", {k: docs[k] for k in keys[i:i + batch]}, merge=merge)
+                        latencies.append(time.perf_counter() - t)
+                    elapsed = time.perf_counter() - start
+                    print(f"{'merge' if merge else 'replace':<8} {round_:<7} batch={batch:<4} {args.docs / elapsed:>9,.0f} docs/s  "
+                          f"call p50={percentile(latencies, 0.5) * 1000:7.3f}ms p99={percentile(latencies, 0.99) * 1000:7.3f}ms")
+                store.close()
+
+        store = SQLiteDocumentStore(os.path.join(tmp, "bench-False-500.sqlite3"))
+        latencies = []
+        for k in keys[::max(1, len(keys) // 2000)]:
+            t = time.perf_counter()
+            store.get("bench", k)
+            latencies.append(time.perf_counter() - t)
+        print(f"get      p50={percentile(latencies, 0.5) * 1000:.3f}ms p99={percentile(latencies, 0.99) * 1000:.3f}ms")
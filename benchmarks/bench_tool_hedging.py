@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tail latency of provider calls with and without hedging, against a stub server that
+makes a small fraction of requests very slow. Duplicate hedges start once the tool has
+enough samples for a p95 estimate.
+
+    python benchmarks/bench_tool_hedging.py --calls 400 --tail-probability 0.05
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import requests
+
+from benchmarks.stubs import LatencyInjectingHandler, percentile, start_server
+from stock_agent.utils.tool_util import call_with_deadline, latency_tracker
+
+def _report(label: str, samples: list[float]):
+    print(f"{label:<10} p50={percentile(samples, 0.5) * 1000:7.1f}ms p95={percentile(samples, 0.95) * 1000:7.1f}ms "
+          f"p99={percentile(samples, 0.99) * 1000:7.1f}ms max={max(samples) * 1000:7.1f}ms")
+
+def run(calls: int, base_latency: float, tail_latency: float, tail_probability: float, deadline: float):
+    server, url = start_server(LatencyInjectingHandler, base_latency=base_latency,
+                               tail_latency=tail_latency, tail_probability=tail_probability)
+    session = requests.Session()
+    fetch = lambda: session.get(url + "/fundamentals").json()
+
+    plain = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fetch()
+        plain.append(time.perf_counter() - start)
+
+    hedged, timed_out = [], 0
+    for _ in range(calls):
+        start = time.perf_counter()
+        result = call_with_deadline("stub_fundamentals", [("stub_fundamentals", fetch)], deadline=deadline, hedge=True)
+        hedged.append(time.perf_counter() - start)
+        timed_out += isinstance(result, dict) and result.get("status") == "timed_out"
+
+    print(f"calls={calls} base={base_latency}s tail={tail_latency}s@{tail_probability:.0%} deadline={deadline}s")
+    print(f"learned hedge delay (p95): {latency_tracker.hedge_delay('stub_fundamentals', deadline) * 1000:.1f}ms")
+    _report("plain", plain)
+    _report("hedged", hedged)
+    print(f"timed out: {timed_out}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--base-latency", type=float, default=0.02)
+    parser.add_argument("--tail-latency", type=float, default=2.0)
+    parser.add_argument("--tail-probability", type=float, default=0.05)
+    parser.add_argument("--deadline", type=float, default=5.0)
+    args = parser.parse_args()
+    run(args.calls, args.base_latency, args.tail_latency, args.tail_probability, args.deadline)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tool-event delivery latency with per-run subscriptions vs. broadcasting to every socket.
+Sockets are in-process fakes (send_text yields to the loop, a few are slow consumers), so the
+numbers isolate the manager's fan-out and queueing cost.
+
+    python benchmarks/bench_ws_fanout.py --sockets 500 --runs 50 --events 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.websocket_manager import ConnectionManager
+from benchmarks.stubs import percentile
+
+class FakeWebSocket:
+    def __init__(self, latencies: list, send_delay: float = 0.0):
+        self.latencies = latencies
+        self.send_delay = send_delay
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        await asyncio.sleep(self.send_delay)
+        self.latencies.append(time.perf_counter() - float(message.split("|", 1)[0]))
+        self.received += 1
+
+async def run(n_sockets: int, n_runs: int, events_per_run: int, slow_fraction: float, broadcast: bool):
+    manager = ConnectionManager()
+    latencies: list[float] = []
+    sockets = []
+    for i in range(n_sockets):
+        slow = i < int(n_sockets * slow_fraction)
+        ws = FakeWebSocket(latencies, send_delay=0.05 if slow else 0.0)
+        await manager.connect(ws, [] if broadcast else [f"run-{i % n_runs}"])
+        sockets.append(ws)
+
+    start = time.perf_counter()
+    for event in range(events_per_run):
+        for run in range(n_runs):
+            message = f"{time.perf_counter()}|run-{run} event {event}"
+            if broadcast:
+                await manager.broadcast(message)
+            else:
+                manager.publish(f"run-{run}", message)
+        await asyncio.sleep(0)  # tool events arrive spread out, not in one burst
+    while any(c.queue for c in manager.active_connections):
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    dropped = sum(c.dropped for c in manager.active_connections)
+    label = "broadcast" if broadcast else "per-run"
+    print(f"{label:<10} deliveries={len(latencies):>8} dropped={dropped:>7} elapsed={elapsed:6.2f}s "
+          f"p50={percentile(latencies, 0.5) * 1000:7.2f}ms p99={percentile(latencies, 0.99) * 1000:8.2f}ms")
+    for connection in list(manager.active_connections):
+        manager.disconnect(connection)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sockets", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--slow-fraction", type=float, default=0.02)
+    args = parser.parse_args()
+    print(f"sockets={args.sockets} runs={args.runs} events/run={args.events} slow={args.slow_fraction:.0%}")
+    asyncio.run(run(args.sockets, args.runs, args.events, args.slow_fraction, broadcast=True))
+    asyncio.run(run(args.sockets, args.runs, args.events, args.slow_fraction, broadcast=False))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Server memory and CPU with thousands of idle WebSocket connections.
+Starts the API under uvicorn in a subprocess, opens N idle sockets that answer pings,
+and samples the server's RSS and CPU time from /proc (Linux).
+
+    python benchmarks/bench_ws_idle.py --connections 2000 --idle-seconds 60
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+import websockets
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _proc_stats(pid: int) -> tuple[float, float]:
+    """(rss MiB, cpu seconds) of a process."""
+    with open(f"/proc/{pid}/status") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    return rss_kb / 1024, (int(fields[11]) + int(fields[12])) / ticks
+
+async def _idle_client(url: str, ready: asyncio.Event, stop: asyncio.Event):
+    async with websockets.connect(url, max_queue=16) as ws:
+        ready.set()
+        while not stop.is_set():
+            try:
+                message = json.loads(await asyncio.wait_for(ws.recv(), timeout=1))
+            except asyncio.TimeoutError:
+                continue
+            if message.get("type") == "ping":
+                await ws.send(json.dumps({"type": "pong"}))
+
+async def run(connections: int, idle_seconds: float, heartbeat: float):
+    port = _free_port()
+    env = {**os.environ, "WS_HEARTBEAT_INTERVAL_SECONDS": str(heartbeat)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    try:
+        time.sleep(3)
+        base_rss, base_cpu = _proc_stats(server.pid)
+        stop = asyncio.Event()
+        readies, tasks = [], []
+        for i in range(connections):
+            ready = asyncio.Event()
+            readies.append(ready)
+            tasks.append(asyncio.create_task(_idle_client(f"ws://127.0.0.1:{port}/ws/tool_usage?run_id=idle-{i}", ready, stop)))
+        await asyncio.gather(*(r.wait() for r in readies))
+        connected_rss, connected_cpu = _proc_stats(server.pid)
+
+        await asyncio.sleep(idle_seconds)
+        idle_rss, idle_cpu = _proc_stats(server.pid)
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        print(f"connections={connections} idle={idle_seconds}s heartbeat={heartbeat}s")
+        print(f"rss: baseline={base_rss:.1f}MiB connected={connected_rss:.1f}MiB "
+              f"per-connection={(connected_rss - base_rss) * 1024 / connections:.1f}KiB")
+        print(f"cpu while idle: {idle_cpu - connected_cpu:.2f}s over {idle_seconds}s "
+              f"({(idle_cpu - connected_cpu) / idle_seconds * 100:.1f}% of one core)")
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--idle-seconds", type=float, default=60)
+    parser.add_argument("--heartbeat", type=float, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.connections, args.idle_seconds, args.heartbeat))
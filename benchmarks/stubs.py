@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Local stub servers shared by the benchmarks (no external services, no API keys).
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_server(handler_cls, **attrs) -> tuple[ThreadingHTTPServer, str]:
+    """Start `handler_cls` on a free localhost port in a daemon thread; returns (server, base_url)."""
+    server = _StubServer(("127.0.0.1", 0), handler_cls)
+    for key, value in attrs.items():
+        setattr(server, key, value)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LatencyInjectingHandler(_QuietHandler):
+    """
+    GET anything -> small JSON payload after `base_latency`, except that a
+    `tail_probability` fraction of requests sleep `tail_latency` instead (a slow provider).
+    """
+
+    def do_GET(self):
+        server = self.server
+        slow = random.random() < server.tail_probability
+        time.sleep(server.tail_latency if slow else server.base_latency)
+        self._send_json({"path": self.path, "slow": slow})
+
+
+class FredStubHandler(_QuietHandler):
+    """Minimal /fred/series/observations: daily random-walk observations between the requested dates."""
+
+    def do_GET(self):
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        time.sleep(self.server.latency)
+        start = query.get("observation_start", "2024-01-01")
+        end = query.get("observation_end", time.strftime("%Y-%m-%d"))
+        days = _date_range(start, end)
+        rng = random.Random(query.get("series_id", ""))
+        value = 100.0
+        observations = []
+        for day in days:
+            value += rng.gauss(0, 1)
+            observations.append({"date": day, "value": "." if rng.random() < 0.01 else f"{value:.4f}"})
+        self._send_json({"observations": observations})
+
+
+class OpenAIStubHandler(_QuietHandler):
+    """OpenAI-compatible /chat/completions returning a fixed answer after `latency` seconds."""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.server.latency)
+        self._send_json({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "stub answer"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+        })
+
+
+def _date_range(start: str, end: str) -> list[str]:
+    from datetime import date, timedelta
+    current, last = date.fromisoformat(start), date.fromisoformat(end)
+    days = []
+    while current <= last:
+        days.append(current.isoformat())
+        current += timedelta(days=1)
+    return days
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
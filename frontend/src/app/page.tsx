@@ -30,6 +30,7 @@ export default function Home() {
   const [messages, setMessages] = useState<Message[]>([]);
   const [isFetching, setIsFetching] = useState<boolean>(false); // Use isFetching to track background process
   const [requestNonce, setRequestNonce] = useState<number>(0);
+  const [runId, setRunId] = useState<string | null>(null); // Run id from /stream_endpoint, used to subscribe to its tool events
   const messagesEndRef = useRef<HTMLDivElement | null>(null);
   const abortControllerRef = useRef<AbortController | null>(null);
 
@@ -89,6 +90,7 @@ export default function Home() {
             if (!response.body) {
                 throw new Error('Response body is null');
             }
+            setRunId(response.headers.get('X-Run-Id'));
 
             const reader = response.body.getReader();
             const decoder = new TextDecoder();
@@ -271,7 +273,7 @@ export default function Home() {
         {/* Tool Usage Column (to the right) */}
         {/* Added fixed width, height matching chat, margin for background visibility */}
         <div className="w-80 h-[calc(100vh-2rem)] flex-shrink-0">
-            <ToolUsageDisplay />
+            <ToolUsageDisplay runId={runId} />
         </div>
     </div>
   );
@@ -121,18 +121,22 @@ const ToolUsageItem: React.FC<ToolUsageItemProps> = ({ usage }) => {
 };
 
 
-const ToolUsageDisplay: React.FC = () => {
+interface ToolUsageDisplayProps {
+  runId: string | null; // Only tool events of this analysis run are delivered
+}
+
+const ToolUsageDisplay: React.FC<ToolUsageDisplayProps> = ({ runId }) => {
   const [toolUsages, setToolUsages] = useState<ToolUsage[]>([]);
   const usageIdCounter = useRef(0);
   // Use useRef for synchronous access to the map within the WebSocket handler
   const startTitlesMapRef = useRef<Map<string, string>>(new Map());
 
   useEffect(() => {
-    if (typeof window === 'undefined') {
+    if (typeof window === 'undefined' || !runId) {
       return;
     }
 
-    const wsUrl = 'ws://localhost:8080/ws/tool_usage'; // Ensure port matches backend
+    const wsUrl = `ws://localhost:8080/ws/tool_usage?run_id=${encodeURIComponent(runId)}`; // Ensure port matches backend
     let ws: WebSocket | null = null;
     let reconnectTimeout: NodeJS.Timeout | null = null;
 
@@ -152,6 +156,11 @@ const ToolUsageDisplay: React.FC = () => {
       ws.onmessage = (event) => {
         try {
           const messageData = JSON.parse(event.data);
+          // Answer server heartbeats so the connection is not reaped as dead
+          if (messageData && messageData.type === 'ping') {
+            ws?.send(JSON.stringify({ type: 'pong' }));
+            return;
+          }
           // Validate the received data structure, now including run_id
           if (messageData && typeof messageData === 'object' && messageData.type && messageData.content && messageData.timestamp && messageData.run_id) {
             const type = messageData.type === 'start' ? 'start' : 'end';
@@ -234,7 +243,7 @@ const ToolUsageDisplay: React.FC = () => {
         ws.close(1000, "Component unmounting"); // Clean close
       }
     };
-  }, []); // Empty dependency array ensures this runs only once on mount
+  }, [runId]); // Reconnect (and resubscribe) whenever a new analysis run starts
 
   return (
     <Card className="h-full shadow-md rounded-lg overflow-hidden flex flex-col">
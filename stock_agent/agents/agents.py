@@ -1,22 +1,14 @@
-from typing import Any, Sequence
-from uuid import UUID
+from functools import lru_cache
 
-from langchain_core.agents import AgentAction, AgentFinish
-from langchain_core.documents import Document
-from langgraph.prebuilt import create_react_agent
-from langchain_core.outputs import LLMResult
 from ..tools.custom_tools import ( # Use relative import
     stock_news, financial_statements_from_polygon, financial_statements_finnhub,
     stock_price_1m, stock_price_1y, simple_moving_average, relative_strength_index,
-    get_basic_financials, get_annual_financial_statements, get_quarterly_financial_statements
+    get_basic_financials, get_annual_financial_statements, get_quarterly_financial_statements,
+    macro_regime_features, screen_stocks, risk_profile, portfolio_risk,
+    backtest_signals
 )
-from langchain_core.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_deepseek import ChatDeepSeek
-from langchain_openai import ChatOpenAI
-from langchain_tavily import TavilySearch
 from ..utils.agent_util import create_agent_with_tool # Use relative import
-from ..utils.openrouter import ChatOpenRouter # Use relative import
+from ..utils.llm_util import get_chat_model, get_route
 # Remove local handler imports
 # from langchain.callbacks.base import BaseCallbackHandler
 # from langchain.callbacks import StdOutCallbackHandler
@@ -31,10 +23,16 @@ from ..prompt.system_prompts import ( # Use relative import
     translator_prompt,
 )
 
-tavily_search_tool = TavilySearch(
-    max_results=5,
-    topic="finance"
-)
+# Provider SDKs (langchain_google_genai, langchain_deepseek, langchain_openai, langchain_tavily)
+# are imported on first use so importing the graph stays cheap.
+@lru_cache(maxsize=1)
+def get_tavily_search_tool():
+    """Builds the Tavily search tool on first use."""
+    from langchain_tavily import TavilySearch
+    return TavilySearch(
+        max_results=5,
+        topic="finance"
+    )
 
 # --- Remove local CallbackHandler definition and old getters ---
 # class CallbackHandler(BaseCallbackHandler):
@@ -46,67 +44,54 @@ tavily_search_tool = TavilySearch(
 # def get_callback_handler():
 #     ... (removed) ...
 
-_llm_instance = None # Keep LLM instance holder
-
 def get_llm():
-    """Gets or creates the LLM instance. Callbacks are added during graph execution."""
-    global _llm_instance
-    if _llm_instance is None:
-        # Initialize LLM WITHOUT callbacks here.
-        # Callbacks will be provided via config in graph.stream/astream.
-        _llm_instance = ChatGoogleGenerativeAI(model="gemini-2.5-pro", timeout=None, max_retries=2)
-        # _llm_instance = ChatDeepSeek(model="deepseek-chat", max_tokens=8192)
-        # _llm_instance = ChatOpenAI(model="gpt-4o-mini", max_completion_tokens=16384)
-        print("DEBUG: Initialized LLM (in agents.py - no callbacks here)")
-    return _llm_instance
+    """
+    Default (heavy tier) chat model for callers outside the per-node routing.
+    The graph nodes below pick their model per turn via llm_util's routing config
+    (fast tier for tool selection and translation, heavy tier for synthesis).
+    """
+    return get_chat_model(get_route("default").candidates["synthesis"][0])
 # --- End Refactored Initialization ---
 
 
 researcher = lambda state: create_agent_with_tool( # Keep original indentation
-    llm=get_llm(), # Use getter
-    tools=[stock_news, tavily_search_tool],
+    tools=[stock_news, get_tavily_search_tool()],
     system_prompt=stock_researcher_prompt.format(company=state["company"]),
     last_message_count_to_transmission=1,
     name="Researcher")
 
 financial_analyst = lambda state: create_agent_with_tool(
-    llm = get_llm(), # Use getter
     tools=[financial_statements_from_polygon],
     system_prompt=stock_fianacial_analyst_1_prompt.format(company=state["company"]),
     last_message_count_to_transmission=1,
     name="Financial Analyst")
 
 financial_analyst_2 = lambda state: create_agent_with_tool(
-    llm=get_llm(), # Use getter
-    tools=[get_basic_financials, get_quarterly_financial_statements, get_annual_financial_statements],
+    tools=[get_basic_financials, get_quarterly_financial_statements, get_annual_financial_statements, screen_stocks],
     system_prompt=stock_financial_analyst_2_prompt.format(company=state["company"]),
     last_message_count_to_transmission=1,
     name="Financial Analyst 2")
 
 financial_advisor = lambda state: create_agent_with_tool(
-    llm=get_llm(), # Use getter
-    tools=[],
+    tools=[macro_regime_features, screen_stocks, risk_profile, portfolio_risk],
     system_prompt=stock_financial_advisor_prompt.format(company=state["company"]),
     last_message_count_to_transmission=1,
     name="Financial Advisor")
 
 technical_analyst = lambda state: create_agent_with_tool(
-    llm=get_llm(), # Use getter
-    tools=[stock_price_1m, stock_price_1y, simple_moving_average, relative_strength_index],
+    tools=[stock_price_1m, stock_price_1y, simple_moving_average, relative_strength_index, backtest_signals],
     system_prompt=technical_analyst_prompt.format(company=state["company"]),
     last_message_count_to_transmission=1,
     name="Technical Analyst")
 
 
 hedge_fund_manager = lambda state: create_agent_with_tool(
-    llm=get_llm(), # Use getter
-    tools=[],
+    tools=[macro_regime_features, risk_profile, portfolio_risk],
     system_prompt=hedge_fund_manager_prompt.format(company=state["company"]),
     last_message_count_to_transmission=1,
     name="Hedge Fund Manager")
 
 translator = lambda state: create_agent_with_tool(
-    llm=get_llm(), # Use getter
     tools=[],
     system_prompt=translator_prompt.format(company=state["company"]),
     last_message_count_to_transmission=1,
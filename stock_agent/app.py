@@ -1,7 +1,5 @@
-from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import MessagesState
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from .graph.display_graph import save_mermaid_as_png # Use relative import
 from .agents import (researcher, # Use relative import
@@ -12,13 +10,14 @@ from .agents import (researcher, # Use relative import
                     hedge_fund_manager,
                     translator # Add translator import
 )
-from langchain_google_genai import ChatGoogleGenerativeAI
-import os # Import os
+from .utils.config_util import load_config
+from .utils.trace_util import traced_node, trace_run
+import argparse
+import asyncio
+import uuid
 
-# Explicitly load .env from project root
-dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
-print(f"DEBUG [app.py]: Loading .env from: {dotenv_path}")
-load_dotenv(dotenv_path=dotenv_path)
+# Load .env once for the whole package (provider clients read their keys lazily)
+load_config()
 
 class State(MessagesState):
     company: str
@@ -30,13 +29,13 @@ class State(MessagesState):
 
 builder = StateGraph(State)
 
-builder.add_node("researcher", researcher)
-builder.add_node("financial_analyst", financial_analyst)
-builder.add_node("financial_analyst_2", financial_analyst_2)
-builder.add_node("financial_advisor", financial_advisor)
-builder.add_node("technical_analyst", technical_analyst)
-builder.add_node("hedge_fund_manager", hedge_fund_manager)
-builder.add_node("translator", translator)
+builder.add_node("researcher", traced_node("researcher", researcher))
+builder.add_node("financial_analyst", traced_node("financial_analyst", financial_analyst))
+builder.add_node("financial_analyst_2", traced_node("financial_analyst_2", financial_analyst_2))
+builder.add_node("financial_advisor", traced_node("financial_advisor", financial_advisor))
+builder.add_node("technical_analyst", traced_node("technical_analyst", technical_analyst))
+builder.add_node("hedge_fund_manager", traced_node("hedge_fund_manager", hedge_fund_manager))
+builder.add_node("translator", traced_node("translator", translator))
 
 builder.add_edge(START, "researcher")
 builder.add_edge(START, "financial_analyst")
@@ -52,9 +51,8 @@ graph = builder.compile()
 
 # save_mermaid_as_png(graph) # Temporarily commented out to prevent potential silent crash during import
 
-def main_loop():
+def main_loop(company: str = "Advanced Micro Devices"):
     print(f"Starting...")
-    company = "Advanced Micro Devices"
     user_input = f"Do a research and Analyze {company} stock."
     initial_message = {
             "messages": [HumanMessage(content=user_input)],
@@ -63,9 +61,34 @@ def main_loop():
     # Remove config with callbacks for now
     # config = {"callbacks": [callback_handler]}
     # Stream without the explicit config for callbacks
-    for event in graph.stream(initial_message, stream_mode="values"):
-            if "messages" in event and event["messages"]: # Check if messages exist and are not empty
-                event['messages'][-1].pretty_print()
+    with trace_run(uuid.uuid4().hex) as run_trace:
+        for event in graph.stream(initial_message, stream_mode="values"):
+                if "messages" in event and event["messages"]: # Check if messages exist and are not empty
+                    event['messages'][-1].pretty_print()
+    print(f"INFO: Critical path summary: {run_trace.summary()}")
+
+def quick_scan_loop(tickers: list[str], concurrency: int):
+    # Imported here so the full-analysis path never builds the scan graph
+    from .quick_scan import scan_universe, format_score
+    print(f"Starting quick scan of {len(tickers)} tickers...")
+    for result in asyncio.run(scan_universe(tickers, concurrency=concurrency)):
+        print(format_score(result))
 
 if __name__ == "__main__":
-    main_loop()
+    parser = argparse.ArgumentParser(description="LangGraph stock analysis")
+    parser.add_argument("--mode", choices=["full", "quick"], default="full",
+                        help="full: seven-agent deep dive, quick: one LLM call per ticker")
+    parser.add_argument("--company", default="Advanced Micro Devices", help="Company for the full analysis")
+    parser.add_argument("--tickers", nargs="+", default=[], help="Tickers for the quick scan")
+    parser.add_argument("--tickers-file", help="File with one ticker per line for the quick scan")
+    parser.add_argument("--concurrency", type=int, default=32, help="Tickers scanned concurrently in quick mode")
+    args = parser.parse_args()
+
+    if args.mode == "quick":
+        tickers = list(args.tickers)
+        if args.tickers_file:
+            with open(args.tickers_file) as f:
+                tickers += [line.strip() for line in f if line.strip()]
+        quick_scan_loop(tickers, args.concurrency)
+    else:
+        main_loop(args.company)
@@ -45,6 +45,7 @@ Using Financial Statements from Finnhub tool:
     - Analyze the income statement, balance sheet, cash flow, comprehensive income.
     - Evaluating {company}'s value through financial statements.
     - Supporting investment and financing decisions.
+    - Compare {company} with its main competitors using the Stock Screener tool (valuation, growth, profitability, leverage).
     - Do not use the same tool with the same parameter more than once after you get the correct output.
     
 [Expected Output]
@@ -55,6 +56,7 @@ Your final answer MUST be a detailed report of:
 Seperate your report with the FACT and OPINION.
 - FACT: The financial metrics and ratios you calculated.
 - OPINION: Your analysis and interpretation of the financial health of the company.
+Use the Macro Regime Features tool to put the company's financial health in the context of the current macroeconomic regime (rates, inflation, credit spreads).
 
 [OUTPUT FORMAT]
 The final report MUST use Markdown format for optimal readability.
@@ -68,6 +70,8 @@ Using financial reports, make a final report.
 Your final answer MUST be a detailed report with a {company}'s revenue, earnings,
 cash flow, net income, and other key financial metrics.
 And your final report MUST contains the financial health of the company.
+Where it helps, rank {company} against its peers with the Stock Screener tool.
+Use the Risk Profile tool for {company}'s beta, volatility and VaR instead of estimating them.
 Your report are crucial for making investment decisions.
 Seperate your report with the FACT and OPINION.
 - FACT: The financial metrics and ratios you calculated.
@@ -89,6 +93,7 @@ When using the Stock Price tool
 - Stock Price - 1 Month tool to analyze the {company}'s stock price movements over the last month.
 - Stock Price - 1 Year tool to analyze the {company}'s stock price movements over the last year.
 Use SMA and RSI tools to analyze the {company}'s stock price movements over the last month and year.
+Use the Backtest Signals tool to check whether SMA crossover, RSI and MACD signals have actually worked for {company} before relying on them, and say how they compared with buy and hold.
 [EXPECTED OUTPUT]
 Your final answer MUST be a report with potential entry points, 
 price targets and any other relevant information.
@@ -105,6 +110,7 @@ You always impress your clients.
 
 [TASK DESCRIPTION]
 Based on the research, technical analysis, financial analysis reports, provide a detailed investment recommendation for {company} stock.
+Use the Macro Regime Features tool for the macroeconomic factors (regime, yield curve, inflation, credit spreads, volatility) instead of guessing them.
 
 [Must Contains]
 BASIC INFOMATION
@@ -124,6 +130,7 @@ RATIONALE
 
 INVESTMENT RISK
 - Provide a clear explanation of the potential risks associated with investing in the analyzed stock if exists.
+- Quantify the risk with the Risk Profile tool (beta, volatility, VaR); use Portfolio Risk to check how {company} correlates with the other holdings you discuss.
 
 [OUTPUT FORMAT]
 The final report MUST use Markdown format for optimal readability. Do NOT enclose the entire report within a single Markdown block (e.g., do not wrap the entire output within ```). Use Markdown formatting within the individual sections (Rating, Growth Investing Rank, Rationale) as appropriate.
@@ -170,3 +177,20 @@ A complete Korean translation of the hedge fund manager's investment report that
 [OUTPUT FORMAT]
 The translated report MUST maintain the original Markdown format. Do NOT enclose the entire report within a single Markdown block. Preserve all original formatting while translating the content.
 """
+
+quick_scan_prompt="""
+[You are]
+A fast equity screener triaging a large universe of stocks every morning.
+
+[TASK DESCRIPTION]
+Score {ticker} from 0 (avoid) to 100 (strong buy) using ONLY the precomputed data below.
+Weigh valuation, profitability, growth, price trend/momentum and news tone. Do not ask for more data.
+
+[DATA]
+Ratios: {ratios}
+Indicators: {indicators}
+Headlines: {headlines}
+
+[OUTPUT FORMAT]
+{format_instructions}
+"""
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import math
+import operator
+import os
+import uuid
+from typing import Annotated, Any, AsyncIterator, Literal, Optional, TypedDict
+
+from langchain_core.output_parsers import PydanticOutputParser
+from langgraph.graph import StateGraph, START, END
+from pydantic import BaseModel, Field
+
+from .prompt.system_prompts import quick_scan_prompt
+from .tools.custom_tools import _get_basic_financials, _get_finnhub_client, fetch_price_history, fetch_stock_news
+from .utils.config_util import load_config
+from .utils.trace_util import traced_node, trace_run
+
+load_config()
+
+# Subset of Finnhub's `metric` dict that is worth putting in a one-shot prompt.
+RATIO_KEYS = (
+    "peTTM", "pbAnnual", "psTTM", "roeTTM", "roaTTM", "netProfitMarginTTM",
+    "revenueGrowthTTMYoy", "epsGrowthTTMYoy", "currentRatioAnnual",
+    "totalDebt/totalEquityAnnual", "beta", "dividendYieldIndicatedAnnual",
+    "52WeekHigh", "52WeekLow", "marketCapitalization",
+)
+MAX_HEADLINES = 5
+DEFAULT_CONCURRENCY = 32
+# Upper bound on tickers in flight per scan, whatever the caller asks for (it sizes provider fan-out)
+MAX_CONCURRENCY = int(os.environ.get("STOCK_AGENT_QUICK_SCAN_MAX_CONCURRENCY", "64"))
+
+class QuickScore(BaseModel):
+    ticker: str = Field(description="The ticker that was scored")
+    score: int = Field(description="0 (avoid) to 100 (strong buy)", ge=0, le=100)
+    rating: Literal["BUY", "HOLD", "SELL"] = Field(description="Rating implied by the score")
+    summary: str = Field(description="One or two sentences explaining the score")
+
+class QuickScanState(TypedDict, total=False):
+    ticker: str
+    ratios: dict
+    indicators: dict
+    headlines: list
+    result: dict
+    errors: Annotated[list, operator.add]  # the three data nodes write concurrently
+
+_parser = PydanticOutputParser(pydantic_object=QuickScore)
+
+def _round(value: Any) -> Any:
+    if isinstance(value, float):
+        return None if math.isnan(value) else round(value, 4)
+    return value
+
+def compute_price_indicators(close) -> dict:
+    """Trend and momentum features from a pandas Series of daily closes."""
+    if close is None or len(close) == 0:
+        return {}
+    last = float(close.iloc[-1])
+    delta = close.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean().iloc[-1]
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / 14, adjust=False).mean().iloc[-1]
+    rsi_14 = 100.0 if loss == 0 else 100 - 100 / (1 + gain / loss)
+    indicators = {"last_close": last, "rsi_14": float(rsi_14)}
+    for window in (20, 50, 200):
+        if len(close) >= window:
+            sma = float(close.iloc[-window:].mean())
+            indicators[f"sma_{window}"] = sma
+            indicators[f"pct_vs_sma_{window}"] = last / sma - 1
+    for label, days in (("return_1m", 21), ("return_3m", 63), ("return_1y", 252)):
+        if len(close) > days:
+            indicators[label] = last / float(close.iloc[-days - 1]) - 1
+    indicators["volatility_1m"] = float(close.pct_change().iloc[-21:].std() * math.sqrt(252))
+    return {k: _round(v) for k, v in indicators.items()}
+
+def _headline(item: dict) -> Optional[str]:
+    # yfinance moved titles under "content" in newer releases
+    content = item.get("content") if isinstance(item.get("content"), dict) else item
+    return content.get("title")
+
+# --- Graph nodes (data nodes run in parallel, then a single LLM call) ---
+def ratios_node(state: QuickScanState):
+    try:
+        metrics = _get_basic_financials(state["ticker"], _get_finnhub_client()).get("metric", {})
+        return {"ratios": {k: _round(metrics.get(k)) for k in RATIO_KEYS if metrics.get(k) is not None}}
+    except Exception as e:
+        return {"ratios": {}, "errors": [f"ratios: {e}"]}
+
+def indicators_node(state: QuickScanState):
+    try:
+        history = fetch_price_history(state["ticker"], "1y")
+        return {"indicators": compute_price_indicators(history["Close"])}
+    except Exception as e:
+        return {"indicators": {}, "errors": [f"indicators: {e}"]}
+
+def headlines_node(state: QuickScanState):
+    try:
+        news = fetch_stock_news(state["ticker"]) or []
+        headlines = [h for h in (_headline(item) for item in news) if h]
+        return {"headlines": headlines[:MAX_HEADLINES]}
+    except Exception as e:
+        return {"headlines": [], "errors": [f"headlines: {e}"]}
+
+def build_quick_scan_graph(llm):
+    """One LLM call per ticker over precomputed ratios, indicators and headlines."""
+    chain = llm | _parser
+
+    async def score_node(state: QuickScanState):
+        prompt = quick_scan_prompt.format(
+            ticker=state["ticker"],
+            ratios=json.dumps(state.get("ratios", {})),
+            indicators=json.dumps(state.get("indicators", {})),
+            headlines=json.dumps(state.get("headlines", []), ensure_ascii=False),
+            format_instructions=_parser.get_format_instructions(),
+        )
+        score = await chain.ainvoke(prompt)
+        return {"result": {**score.model_dump(), "ticker": state["ticker"]}}
+
+    builder = StateGraph(QuickScanState)
+    builder.add_node("ratios", traced_node("ratios", ratios_node))
+    builder.add_node("indicators", traced_node("indicators", indicators_node))
+    builder.add_node("headlines", traced_node("headlines", headlines_node))
+    builder.add_node("score", traced_node("score", score_node))
+    for node in ("ratios", "indicators", "headlines"):
+        builder.add_edge(START, node)
+    builder.add_edge(["ratios", "indicators", "headlines"], "score")
+    builder.add_edge("score", END)
+    return builder.compile()
+
+_quick_scan_graph = None
+
+def get_quick_scan_graph():
+    """Builds the quick scan graph on first use with the "quick_scan" model route."""
+    global _quick_scan_graph
+    if _quick_scan_graph is None:
+        from .utils.llm_util import get_routed_llm
+        _quick_scan_graph = build_quick_scan_graph(get_routed_llm("quick_scan"))
+    return _quick_scan_graph
+
+async def scan_ticker(ticker: str, graph=None, config: Optional[dict] = None) -> dict:
+    graph = graph or get_quick_scan_graph()
+    ticker = ticker.strip().upper()
+    try:
+        state = await graph.ainvoke({"ticker": ticker, "errors": []}, config=config)
+        result = dict(state.get("result") or {"ticker": ticker})
+        if state.get("errors"):
+            result["errors"] = state["errors"]
+        return result
+    except Exception as e:
+        return {"ticker": ticker, "error": str(e)}
+
+def normalize_tickers(tickers: list[str]) -> list[str]:
+    """Stripped, upper-cased tickers without blanks or duplicates, in first-seen order."""
+    return list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+
+async def scan_universe_stream(
+    tickers: list[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    graph=None,
+    config: Optional[dict] = None,
+) -> AsyncIterator[dict]:
+    """Scans tickers with at most `concurrency` in flight, yielding each score as soon as it is ready."""
+    semaphore = asyncio.Semaphore(max(1, min(concurrency, MAX_CONCURRENCY)))
+
+    async def _bounded(ticker: str) -> dict:
+        async with semaphore:
+            return await scan_ticker(ticker, graph=graph, config=config)
+
+    tasks = [asyncio.create_task(_bounded(t)) for t in normalize_tickers(tickers)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def scan_universe(tickers: list[str], concurrency: int = DEFAULT_CONCURRENCY, graph=None) -> list[dict]:
+    """Scans the whole universe and returns results sorted by score (best first)."""
+    with trace_run(uuid.uuid4().hex) as run_trace:
+        results = [r async for r in scan_universe_stream(tickers, concurrency, graph=graph)]
+    print(f"INFO: Quick scan of {len(results)} tickers took {run_trace.summary()['wall_seconds']}s")
+    return sorted(results, key=lambda r: r.get("score", -1), reverse=True)
+
+def format_score(result: dict) -> str:
+    if "error" in result:
+        return f"{result['ticker']}: error - {result['error']}"
+    return f"{result['ticker']}: {result['score']} ({result['rating']}) - {result['summary']}"
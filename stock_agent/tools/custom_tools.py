@@ -1,12 +1,30 @@
-import yfinance as yf
 from langchain_core.tools import tool
 from datetime import datetime, timedelta
+from functools import lru_cache
 import requests
 import os
-import finnhub
 from cachetools import cached, LRUCache, TTLCache
+from ..utils.cache_util import BudgetedTTLCache
+from ..utils.trace_util import traced_fetch
+from ..utils.tool_util import PROVIDER_TIMEOUT_SECONDS, provider_timeout, register_tool_policy
+
+# yfinance and finnhub are imported on first use; both are slow to import
+# and most processes (e.g. the API server at startup) never touch them.
+def _yf():
+    import yfinance as yf
+    return yf
+
+@lru_cache(maxsize=1)
+def _get_finnhub_client():
+    """One shared Finnhub client, so it also stays a stable part of the cache keys below."""
+    import finnhub
+    client = finnhub.Client(api_key=os.environ["FINNHUB_API_KEY"])
+    # The client is shared across tool threads, so its per-request timeout is fixed at the cap
+    client.DEFAULT_TIMEOUT = PROVIDER_TIMEOUT_SECONDS
+    return client
 
 @tool(description="Get Financial Statement")
+@traced_fetch("yfinance")
 def get_financial_statement(ticker: str):
     """
     Tool for getting financial statements from Yahoo Finance.
@@ -17,7 +35,7 @@ def get_financial_statement(ticker: str):
     """
     
     print(f"Getting financial statement for {ticker}...")
-    _ticker = yf.Ticker(ticker)
+    _ticker = _yf().Ticker(ticker)
     income_stmt = _ticker.income_stmt
     balance_sheet = _ticker.balance_sheet
     cash_flow = _ticker.cash_flow
@@ -30,7 +48,8 @@ def get_financial_statement(ticker: str):
     
     return financial_statement
 
-@cached(cache=TTLCache(maxsize=1024, ttl=3600))
+@traced_fetch("polygon")
+@cached(cache=BudgetedTTLCache("fetch_financial_data", ttl=3600))
 def fetch_financial_data(ticker: str, days: int, timeframe: str, limit: int):
     today = datetime.now().strftime("%Y-%m-%d")
     start_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
@@ -38,7 +57,7 @@ def fetch_financial_data(ticker: str, days: int, timeframe: str, limit: int):
     
     url = f"https://api.polygon.io/vX/reference/financials?ticker={ticker}&filing_date.gte={start_date}&filing_date.lt={today}&limit={limit}&timeframe={timeframe}&apiKey={api_key}"
     
-    response = requests.get(url)
+    response = requests.get(url, timeout=provider_timeout())
     if response.status_code == 200:
         return response.json()
     else:
@@ -65,6 +84,11 @@ def financial_statements_from_polygon(ticker: str):
         "financial_statements_quaterly": quaterly_3_years
     }
 
+@traced_fetch("yfinance")
+@cached(cache=BudgetedTTLCache("fetch_stock_news", ttl=900))
+def fetch_stock_news(ticker: str):
+    return _yf().Ticker(ticker).news
+
 @tool(description="Stock News")
 def stock_news(ticker: str):
     """Useful to get news about a stock.
@@ -73,8 +97,7 @@ def stock_news(ticker: str):
         ticker: The ticker of a company str
     
     """
-    ticker = yf.Ticker(ticker)
-    return ticker.news
+    return fetch_stock_news(ticker)
 
 @tool(description="Financial Statements from Finnhub")
 def financial_statements_finnhub(ticker: str):
@@ -90,7 +113,7 @@ def financial_statements_finnhub(ticker: str):
     - financial_statements: Financial statements for last 3 years.
     - financial_statements_quaterly: Quaterly financial statements for last 3 years.
     """
-    finnhub_client = finnhub.Client(api_key=os.environ["FINNHUB_API_KEY"])
+    finnhub_client = _get_finnhub_client()
     start_date = (datetime.now() - timedelta(days=1095)).strftime("%Y-%m-%d")
     end_date = datetime.now().strftime("%Y-%m-%d")
     
@@ -101,13 +124,13 @@ def financial_statements_finnhub(ticker: str):
 @tool
 def get_basic_financials(ticker: str):
     """Get basic financial data for a company."""
-    finnhub_client = finnhub.Client(api_key=os.environ["FINNHUB_API_KEY"])
+    finnhub_client = _get_finnhub_client()
     return _get_basic_financials(ticker, finnhub_client)
 
 @tool
 def get_annual_financial_statements(ticker: str):
     """Get annual financial statements for a company."""
-    finnhub_client = finnhub.Client(api_key=os.environ["FINNHUB_API_KEY"])
+    finnhub_client = _get_finnhub_client()
     start_date = (datetime.now() - timedelta(days=1095)).strftime("%Y-%m-%d")
     end_date = datetime.now().strftime("%Y-%m-%d")
     return _get_annual_financial_statements(ticker, finnhub_client, start_date, end_date)
@@ -115,12 +138,13 @@ def get_annual_financial_statements(ticker: str):
 @tool
 def get_quarterly_financial_statements(ticker: str):
     """Get quarterly financial statements for a company."""
-    finnhub_client = finnhub.Client(api_key=os.environ["FINNHUB_API_KEY"])
+    finnhub_client = _get_finnhub_client()
     start_date = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
     end_date = datetime.now().strftime("%Y-%m-%d")
     return _get_quarterly_financial_statements(ticker, finnhub_client, start_date, end_date)
 
-@cached(cache=TTLCache(maxsize=1024, ttl=3600))
+@traced_fetch("finnhub")
+@cached(cache=BudgetedTTLCache("_retrieve_financial_statements_finnhub", ttl=3600))
 def _retrieve_financial_statements_finnhub(ticker, finnhub_client, start_date, end_date):
     basic_financials = finnhub_client.company_basic_financials(ticker, 'all')
     
@@ -148,12 +172,21 @@ def _retrieve_financial_statements_finnhub(ticker, finnhub_client, start_date, e
     
     return financial_data
 
-@cached(cache=TTLCache(maxsize=1024, ttl=3600))
+@traced_fetch("finnhub")
+@cached(cache=BudgetedTTLCache("_get_basic_financials", ttl=3600))
 def _get_basic_financials(ticker, finnhub_client):
     """Get basic financial data for a company."""
-    return finnhub_client.company_basic_financials(ticker, 'all')
-
-@cached(cache=TTLCache(maxsize=1024, ttl=3600))
+    result = finnhub_client.company_basic_financials(ticker, 'all')
+    # Every fetched ticker joins the screener universe (see screen_stocks)
+    from ..utils.screener_util import screener
+    try:
+        screener.record(ticker, (result or {}).get("metric"))
+    except Exception as e:
+        print(f"ERROR: Could not record {ticker} metrics for the screener: {e}")
+    return result
+
+@traced_fetch("finnhub")
+@cached(cache=BudgetedTTLCache("_get_annual_financial_statements", ttl=3600))
 def _get_annual_financial_statements(ticker, finnhub_client, start_date, end_date):
     """Get annual financial statements for a company."""
     params = {
@@ -164,7 +197,8 @@ def _get_annual_financial_statements(ticker, finnhub_client, start_date, end_dat
     }
     return finnhub_client.financials_reported(**params)
 
-@cached(cache=TTLCache(maxsize=1024, ttl=3600))
+@traced_fetch("finnhub")
+@cached(cache=BudgetedTTLCache("_get_quarterly_financial_statements", ttl=3600))
 def _get_quarterly_financial_statements(ticker, finnhub_client, start_date, end_date):
     """Get quarterly financial statements for a company."""
     params = {
@@ -175,6 +209,11 @@ def _get_quarterly_financial_statements(ticker, finnhub_client, start_date, end_
     }
     return finnhub_client.financials_reported(**params)
 
+def fetch_price_history(ticker: str, period: str):
+    # Served from the local OHLCV store: one download per ticker, then only new bars
+    from ..utils.ohlcv_util import get_ohlcv_store
+    return get_ohlcv_store().frame(ticker, period)
+
 @tool(description="Stock Price - last 1 Month")
 def stock_price_1m(ticker: str):
     """Useful to get stock price data for the last month.
@@ -182,8 +221,7 @@ def stock_price_1m(ticker: str):
     Input paramter:
     - ticker: The ticker of a company.
     """
-    ticker = yf.Ticker(ticker)
-    return ticker.history(period="1mo")
+    return fetch_price_history(ticker, "1mo")
 
 @tool(description="Stock Price - last 1 Year")
 def stock_price_1y(ticker: str):
@@ -193,14 +231,14 @@ def stock_price_1y(ticker: str):
     Input paramters:
     - ticker: The ticker of a company.
     """
-    ticker = yf.Ticker(ticker)
-    return ticker.history(period="1y")
+    return fetch_price_history(ticker, "1y")
 
-@cached(cache=TTLCache(maxsize=1024, ttl=3600))
+@traced_fetch("polygon")
+@cached(cache=BudgetedTTLCache("fetch_technical_indicator", ttl=3600))
 def fetch_technical_indicator(ticker: str, timespan: str, window_size: int, limit: int, type: str):
     api_key = os.environ["POLYGON_API_KEY"]
     url = f"https://api.polygon.io/v1/indicators/{type}/{ticker}?timespan={timespan}&adjusted=true&window={window_size}&series_type=close&order=desc&limit={limit}&apiKey={api_key}"
-    response = requests.get(url)
+    response = requests.get(url, timeout=provider_timeout())
     
     if response.status_code == 200:
         return response.json()
@@ -241,6 +279,109 @@ def relative_strength_index(ticker: str, timespan: str, window_size: int, limit:
     _timespan = validate_timespan(timespan)
     return fetch_technical_indicator(ticker, _timespan, window_size, limit, "rsi")
 
+@tool(description="Backtest Signals")
+def backtest_signals(ticker: str, strategies: list[str] | None = None, years: int = 10):
+    """
+    Check how SMA crossover, RSI and MACD signals would have traded a stock on its daily prices.
+
+    Every strategy is swept over a grid of window sizes (e.g. ~1000 fast/slow SMA pairs) and each
+    combination is traded long/flat with a 5bp cost per trade. Returns, per strategy, the best
+    combinations by Sharpe ratio and the textbook settings (SMA 50/200, RSI 14 30/70, MACD 12/26/9)
+    with total return, CAGR, Sharpe, max drawdown, number of trades, hit rate and time in the market,
+    plus buy and hold over the same period for comparison.
+
+    The input parameters of this tool are as follows:
+    - ticker(type:str): The ticker of a company.
+    - strategies(type:list[str]): Any of ["sma_cross", "rsi", "macd"] (default: all three).
+    - years(type:int): Years of daily history to test on (default: 10).
+    Usage Example: backtest_signals("AAPL", ["sma_cross", "rsi"])
+    """
+    from ..utils.backtest_util import BacktestError, backtest_ticker
+    try:
+        return backtest_ticker(ticker, strategies, years)
+    except BacktestError as e:
+        return {"error": str(e)}
+
+@tool(description="Macro Regime Features")
+def macro_regime_features():
+    """
+    Useful to get the current US macroeconomic backdrop from locally stored FRED data.
+
+    Returns the regime label (risk_off, late_cycle, inflationary, slowdown, expansion or neutral)
+    with the signals behind it, the yield-curve slope, the credit-spread percentile, and for each
+    series (Fed funds, 10y yield, 10y-2y, VIX, corporate spreads, CPI, claims, ...) its latest value,
+    MoM (QoQ for GDP) / YoY change, 1-year z-score and percentile.
+    """
+    from ..utils.macro_util import macro_features
+    return macro_features.get()
+
+@tool(description="Stock Screener")
+def screen_stocks(filter: str = "", sort_by: str = "", ascending: bool = False, limit: int = 10, tickers: list[str] | None = None):
+    """
+    Screen and rank stocks on Finnhub basic-financial metrics, e.g. to compare a company with its peers.
+
+    The input parameters of this tool are as follows:
+    - filter(type:str): Conditions combined with and/or/not, e.g. "pe < 20 and revenue_growth > 10". Empty for no filter.
+    - sort_by(type:str): Metric or arithmetic expression to rank by, e.g. "roe" or "net_margin - pe / 10".
+    - ascending(type:bool): Rank smallest first (default: largest first).
+    - limit(type:int): Number of results.
+    - tickers(type:list[str]): Restrict the screen to these tickers (fetched if not known yet), e.g. the company and its peers.
+    Metric names: pe, pb, ps, roe, roa, net_margin, gross_margin, revenue_growth, eps_growth, current_ratio,
+    debt_to_equity, beta, dividend_yield, market_cap, high_52w, low_52w (percent values are in %), or any raw
+    Finnhub metric key in backticks, e.g. `totalDebt/totalEquityAnnual`.
+    Usage Example: screen_stocks(sort_by="roe", tickers=["AAPL", "MSFT", "GOOGL"])
+    Without tickers, the universe is every ticker whose basic financials have been fetched before.
+    """
+    from ..utils.screener_util import ScreenerError, screener
+    failed = screener.ensure(tickers) if tickers else []
+    try:
+        result = screener.screen(filter, sort_by, ascending, limit, tickers)
+    except ScreenerError as e:
+        return {"error": str(e)}
+    if failed:
+        result["unavailable"] = failed
+    return result
+
+@tool(description="Risk Profile")
+def risk_profile(ticker: str, benchmark: str = "SPY"):
+    """
+    Risk numbers for one stock from its last year of daily prices: beta and correlation against the
+    benchmark, annualized alpha and volatility, 21-day rolling volatility, and one-day VaR / expected
+    shortfall (historical and parametric, 95% and 99%, as fractions of position value).
+    Use this beta for CAPM / cost of equity instead of estimating one.
+
+    The input parameters of this tool are as follows:
+    - ticker(type:str): The ticker of a company.
+    - benchmark(type:str): Market index ETF to measure beta against (default: SPY).
+    """
+    from ..utils.risk_util import RiskError, risk_engine
+    try:
+        return risk_engine.profile(ticker, benchmark)
+    except RiskError as e:
+        return {"error": str(e)}
+
+@tool(description="Portfolio Risk")
+def portfolio_risk(tickers: list[str], weights: list[float] | None = None, benchmark: str = "SPY"):
+    """
+    Risk of a watchlist or portfolio from the last year of daily prices: correlation and annualized
+    covariance matrices, each ticker's beta and volatility, and the portfolio's beta, volatility and
+    one-day VaR / expected shortfall (historical and parametric, 95% and 99%).
+
+    The input parameters of this tool are as follows:
+    - tickers(type:list[str]): Tickers in the portfolio, e.g. ["AAPL", "MSFT", "NVDA"].
+    - weights(type:list[float]): Portfolio weights in the same order (default: equal weights).
+    - benchmark(type:str): Market index ETF to measure beta against (default: SPY).
+    """
+    from ..utils.risk_util import RiskError, risk_engine
+    try:
+        return risk_engine.portfolio(tickers, weights, benchmark)
+    except RiskError as e:
+        return {"error": str(e)}
+
+# Fundamentals fall back Polygon -> Finnhub -> yfinance when Polygon is slower than its p95 or fails.
+# Only same-schema providers are registered: a fallback must answer the question the agent asked.
+register_tool_policy(financial_statements_from_polygon, fallbacks=(financial_statements_finnhub, get_financial_statement))
+
 def validate_timespan(timespan: str) -> str:
     new_timespan = timespan
     # 입력 timespan 값 검증 및 수정
@@ -543,4 +684,22 @@ except ValueError as e:
 except Exception as e:
     print(f"\n예상치 못한 오류 발생: {e}")
     
-"""
\ No newline at end of file
+"""
+
+
+def expire_tool_caches() -> dict:
+    """
+    Drop expired entries from the provider-response caches above. TTLCache only evicts on
+    access, so a cache nobody reads keeps its stale responses alive until this runs.
+    """
+    expired = {}
+    for name, obj in list(globals().items()):
+        cache = getattr(obj, "cache", None)
+        if isinstance(cache, TTLCache):
+            before = len(cache)
+            try:
+                cache.expire()
+            except (KeyError, RuntimeError):
+                continue  # raced with a tool call mutating the cache; next pass gets it
+            expired[name] = before - len(cache)
+    return expired
@@ -1,46 +1,75 @@
-from dotenv import load_dotenv
 from typing import TypedDict, Literal, Union
 from langgraph.graph import StateGraph, START, END # Ensure END is imported
 from langgraph.graph.message import add_messages
 from typing import Annotated, Any
-from langchain_core.messages import AnyMessage, RemoveMessage, HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import AnyMessage, RemoveMessage, HumanMessage, SystemMessage, AIMessage, ToolMessage
 from langgraph.prebuilt import ToolNode
+from langchain_core.runnables import RunnableLambda
 from pydantic import BaseModel
-import os # Import os
-
-# Explicitly load .env from project root
-dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
-print(f"DEBUG [agent_util.py]: Loading .env from: {dotenv_path}")
-load_dotenv(dotenv_path=dotenv_path)
+from .trace_util import span
+from .llm_util import ainvoke_routed, invoke_routed
+from .tool_util import bounded_tool
+from .cancel_util import check_cancelled
 
 class SubState(TypedDict):
     messages: Annotated[list[AnyMessage], add_messages]
 
 def create_agent_with_tool(
-    llm,
-    tools,
-    system_prompt,
+    llm=None, # None: pick the model per turn from the routing config in llm_util
+    tools=(),
+    system_prompt="",
     last_message_count_to_transmission = 1,
     name=None # Remove callbacks parameter
 ):
+    # Every tool gets a deadline (and alternate providers / a hedge where registered) so one slow provider
+    # cannot stall this branch and, through the join edges, the hedge fund manager
+    tools = [bounded_tool(t) for t in tools]
     has_tool = len(tools) > 0
     tool_node = ToolNode(tools)
 
-    if has_tool:
+    if llm is not None and has_tool:
         _llm = llm.bind_tools(tools)
     else:
         _llm = llm
 
-    # Agent node function
-    def agent_node_func(state: SubState):
+    def _prepare(state: SubState):
         messages = state['messages']
         # Inject system prompt before invoking - ensure it doesn't duplicate if already present
         # A simple approach: filter out previous system messages and add the current one
         filtered_messages = [msg for msg in messages if not isinstance(msg, SystemMessage)]
         current_system_message = SystemMessage(content=system_prompt)
         final_messages = [current_system_message] + filtered_messages
+        # Turns that only pick tools go to the fast tier; once tool results are in, synthesize
+        seen_tool_result = any(isinstance(msg, ToolMessage) for msg in filtered_messages)
+        phase = "tool_selection" if has_tool and not seen_tool_result else "synthesis"
+        return final_messages, phase
+
+    def _record_usage(llm_span, response):
+        usage = getattr(response, "usage_metadata", None) or {}
+        llm_span.set(prompt_tokens=usage.get("input_tokens", 0), completion_tokens=usage.get("output_tokens", 0))
+
+    # Agent node function
+    def agent_node_func(state: SubState):
+        check_cancelled()  # don't start an LLM call for a run nobody is waiting on
+        final_messages, phase = _prepare(state)
+        with span(f"{name}.llm", "llm", node=name) as llm_span:
+            if _llm is not None:
+                response = _llm.invoke(final_messages)
+            else:
+                response = invoke_routed(name, phase, final_messages, tools if has_tool else None)
+            _record_usage(llm_span, response)
+        return {"messages": [response]}
 
-        response = _llm.invoke(final_messages)
+    # Async variant used by graph.astream: the in-flight LLM request is cancelled with the run's task
+    async def aagent_node_func(state: SubState):
+        check_cancelled()
+        final_messages, phase = _prepare(state)
+        with span(f"{name}.llm", "llm", node=name) as llm_span:
+            if _llm is not None:
+                response = await _llm.ainvoke(final_messages)
+            else:
+                response = await ainvoke_routed(name, phase, final_messages, tools if has_tool else None)
+            _record_usage(llm_span, response)
         return {"messages": [response]}
 
     # Message pruning node function
@@ -88,7 +117,7 @@ def create_agent_with_tool(
 
     # Build the subgraph
     subgraph_builder = StateGraph(SubState)
-    subgraph_builder.add_node("agent", agent_node_func)
+    subgraph_builder.add_node("agent", RunnableLambda(agent_node_func, afunc=aagent_node_func, name="agent"))
     subgraph_builder.add_node("delete_messages", delete_messages_func) # Add the node back
 
     if has_tool:
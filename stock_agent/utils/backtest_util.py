@@ -0,0 +1,246 @@
+import itertools
+import math
+import os
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from .trace_util import registry
+
+TRADING_DAYS = 252
+# Charged on every change of position, as a fraction of the position (5bp = 0.0005)
+COST_BPS = float(os.environ.get("STOCK_AGENT_BACKTEST_COST_BPS", "5"))
+BACKTEST_YEARS = 10
+# Combinations evaluated per batch: bounds peak memory (~10 combinations x days float arrays
+# per batch) so concurrent sweeps don't each hold the whole grid at once
+CHUNK_ROWS = 128
+
+# Default sweeps; each runs as one batch of (combinations x days) arrays
+SMA_GRID = {"fast": range(5, 105, 5), "slow": range(20, 305, 5)}
+RSI_GRID = {"window": (7, 10, 14, 21, 28), "lower": (20, 25, 30, 35, 40), "upper": (60, 65, 70, 75, 80)}
+MACD_GRID = {"fast": range(6, 20, 2), "slow": range(20, 42, 2), "signal": (5, 7, 9, 11, 13)}
+# The textbook settings, always reported next to the best of the sweep
+STANDARD = {"sma_cross": {"fast": 50, "slow": 200}, "rsi": {"window": 14, "lower": 30, "upper": 70},
+            "macd": {"fast": 12, "slow": 26, "signal": 9}}
+
+BACKTEST_SECONDS = registry.histogram("stock_agent_backtest_seconds", "Backtest sweep time.", ("strategy",))
+
+
+class BacktestError(ValueError):
+    """Unknown strategy, bad parameters, or not enough price history."""
+
+
+# --- Indicators, batched over parameter values (rows) ----------------------------------------
+
+def sma_matrix(close: np.ndarray, windows: np.ndarray) -> np.ndarray:
+    """Simple moving averages, one row per window (NaN until the window fills)."""
+    csum = np.concatenate([[0.0], np.cumsum(close)])
+    end = np.arange(1, len(close) + 1)
+    start = end[None, :] - windows[:, None]
+    with np.errstate(invalid="ignore"):
+        out = (csum[end][None, :] - csum[np.maximum(start, 0)]) / windows[:, None]
+    out[start < 0] = np.nan
+    return out
+
+
+def ewm_matrix(x: np.ndarray, alphas: np.ndarray) -> np.ndarray:
+    """
+    Exponentially weighted means, one row per alpha; x is one series or one row per alpha.
+    The recursion runs over time, vectorized across all rows at each step.
+    """
+    x = np.broadcast_to(x, (len(alphas), x.shape[-1]))
+    out = np.empty(x.shape)
+    out[:, 0] = x[:, 0]
+    a = alphas
+    for t in range(1, x.shape[1]):
+        out[:, t] = a * x[:, t] + (1 - a) * out[:, t - 1]
+    return out
+
+
+def rsi_matrix(close: np.ndarray, windows: np.ndarray) -> np.ndarray:
+    """Wilder RSI (0-100), one row per window (NaN for the first `window` days)."""
+    change = np.diff(close, prepend=close[0])
+    alphas = 1.0 / windows
+    gain = ewm_matrix(np.maximum(change, 0.0), alphas)
+    loss = ewm_matrix(np.maximum(-change, 0.0), alphas)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rsi = 100.0 - 100.0 / (1.0 + gain / loss)
+    rsi[loss == 0] = 100.0
+    rsi[np.arange(len(close))[None, :] < windows[:, None]] = np.nan
+    return rsi
+
+
+# --- Positions (combinations x days, 1 = long, 0 = flat) --------------------------------------
+
+def _hold(enter: np.ndarray, exit: np.ndarray) -> np.ndarray:
+    """Long from an enter signal until the next exit signal (state carried forward in one pass)."""
+    state = np.where(enter, 1.0, np.where(exit, 0.0, np.nan))
+    t = np.arange(state.shape[1])
+    last = np.maximum.accumulate(np.where(np.isnan(state), 0, t), axis=1)
+    held = state[np.arange(len(state))[:, None], last]
+    return np.nan_to_num(held, nan=0.0)
+
+
+def sma_cross_positions(close: np.ndarray, params: list[dict]) -> np.ndarray:
+    """Long while the fast SMA is above the slow SMA."""
+    windows = np.unique([p[k] for p in params for k in ("fast", "slow")])
+    sma = sma_matrix(close, windows)
+    row = {w: i for i, w in enumerate(windows)}
+    fast = sma[[row[p["fast"]] for p in params]]
+    slow = sma[[row[p["slow"]] for p in params]]
+    return (fast > slow).astype(float)
+
+
+def rsi_positions(close: np.ndarray, params: list[dict]) -> np.ndarray:
+    """Mean reversion: buy when RSI falls below `lower`, sell when it rises above `upper`."""
+    windows = np.unique([p["window"] for p in params])
+    rsi = rsi_matrix(close, windows)
+    row = {w: i for i, w in enumerate(windows)}
+    rsi = rsi[[row[p["window"]] for p in params]]
+    lower = np.array([p["lower"] for p in params], dtype=float)[:, None]
+    upper = np.array([p["upper"] for p in params], dtype=float)[:, None]
+    return _hold(rsi < lower, rsi > upper)
+
+
+def macd_positions(close: np.ndarray, params: list[dict]) -> np.ndarray:
+    """Long while the MACD line (fast EMA - slow EMA) is above its signal line."""
+    spans = np.unique([p[k] for p in params for k in ("fast", "slow")])
+    ema = ewm_matrix(close, 2.0 / (spans + 1))
+    row = {s: i for i, s in enumerate(spans)}
+    macd = ema[[row[p["fast"]] for p in params]] - ema[[row[p["slow"]] for p in params]]
+    signal = ewm_matrix(macd, 2.0 / (np.array([p["signal"] for p in params], dtype=float) + 1))
+    positions = (macd > signal).astype(float)
+    slow = np.array([p["slow"] for p in params])
+    positions[np.arange(len(close))[None, :] < slow[:, None]] = 0.0  # warm-up
+    return positions
+
+
+STRATEGIES: dict[str, tuple[Callable[[np.ndarray, list[dict]], np.ndarray], dict, Callable[[dict], bool]]] = {
+    "sma_cross": (sma_cross_positions, SMA_GRID, lambda p: p["fast"] < p["slow"]),
+    "rsi": (rsi_positions, RSI_GRID, lambda p: p["lower"] < p["upper"]),
+    "macd": (macd_positions, MACD_GRID, lambda p: p["fast"] < p["slow"]),
+}
+
+
+def check_strategies(strategies: list[str]):
+    unknown = [s for s in strategies if s not in STRATEGIES]
+    if unknown:
+        raise BacktestError(f"Unknown strategy {', '.join(map(repr, unknown))} (expected one of {sorted(STRATEGIES)})")
+
+
+def parameter_grid(strategy: str, grid: Optional[dict] = None) -> list[dict]:
+    check_strategies([strategy])
+    _, default, valid = STRATEGIES[strategy]
+    grid = grid or default
+    keys = list(grid)
+    params = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    return [p for p in params if valid(p)]
+
+
+# --- Evaluation ---------------------------------------------------------------------------
+
+def evaluate(positions: np.ndarray, close: np.ndarray, cost_bps: float = COST_BPS) -> dict[str, np.ndarray]:
+    """
+    PnL statistics for every row of positions (decided at each close, held over the next day).
+    Returns arrays with one value per row.
+    """
+    returns = np.diff(close) / close[:-1]
+    held = positions[:, :-1]
+    turnover = np.abs(np.diff(positions, axis=1, prepend=0.0))[:, :-1]
+    pnl = held * returns - turnover * cost_bps / 10_000
+    log_pnl = np.log1p(pnl)
+    equity = np.exp(np.cumsum(log_pnl, axis=1))
+    drawdown = equity / np.maximum.accumulate(np.maximum(equity, 1.0), axis=1) - 1.0
+    std = pnl.std(axis=1, ddof=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sharpe = np.where(std > 0, pnl.mean(axis=1) / std * math.sqrt(TRADING_DAYS), np.nan)
+
+    # Per-trade PnL: number each holding stretch, then sum log returns per (row, trade) in one bincount
+    entries = (np.diff(held, axis=1, prepend=0.0) > 0)
+    trade = np.cumsum(entries, axis=1)
+    inside = held > 0
+    n_rows, n_days = held.shape
+    ids = (np.arange(n_rows)[:, None] * (n_days + 1) + trade)[inside]
+    per_trade = np.bincount(ids, weights=log_pnl[inside], minlength=n_rows * (n_days + 1)).reshape(n_rows, n_days + 1)
+    trades = entries.sum(axis=1)
+    wins = (per_trade[:, 1:] > 0).sum(axis=1)
+    years = n_days / TRADING_DAYS
+    total = equity[:, -1]
+    return {
+        "total_return": total - 1.0,
+        "cagr": total ** (1 / years) - 1.0,
+        "sharpe": sharpe,
+        "max_drawdown": drawdown.min(axis=1),
+        "trades": trades,
+        "hit_rate": np.where(trades > 0, wins / np.maximum(trades, 1), np.nan),
+        "exposure": held.mean(axis=1),
+    }
+
+
+def _row(stats: dict, i: int, params: Optional[dict] = None) -> dict:
+    row = dict(params or {})
+    for key, values in stats.items():
+        value = float(values[i])
+        row[key] = int(value) if key == "trades" else (round(value, 4) if math.isfinite(value) else None)
+    return row
+
+
+def sweep(close: np.ndarray, strategy: str, grid: Optional[dict] = None, top: int = 5,
+          cost_bps: float = COST_BPS) -> dict:
+    """Backtest every parameter combination of a strategy in batches of CHUNK_ROWS; results ranked by Sharpe."""
+    check_strategies([strategy])
+    close = np.asarray(close, dtype=float)
+    standard = STANDARD[strategy]
+    # Windows longer than half the history would leave too few days to trade
+    longest = lambda p: max(v for k, v in p.items() if k not in ("lower", "upper"))
+    params = [p for p in parameter_grid(strategy, grid) + [standard] if 2 * longest(p) <= len(close)]
+    params = list({tuple(p.items()): p for p in params}.values())
+    if not params:
+        raise BacktestError(f"{len(close)} days of prices are too few for a {strategy} backtest")
+    started = time.perf_counter()
+    positions = STRATEGIES[strategy][0]
+    chunks = [evaluate(positions(close, params[i:i + CHUNK_ROWS]), close, cost_bps)
+              for i in range(0, len(params), CHUNK_ROWS)]
+    stats = {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+    order = np.argsort(np.nan_to_num(-stats["sharpe"], nan=np.inf), kind="stable")
+    seconds = time.perf_counter() - started
+    BACKTEST_SECONDS.observe(seconds, strategy=strategy)
+    return {
+        "strategy": strategy,
+        "combinations": len(params),
+        "best": [_row(stats, i, params[i]) for i in order[:top]],
+        "standard": _row(stats, params.index(standard), standard) if standard in params else None,
+        "seconds": round(seconds, 4),
+    }
+
+
+def buy_and_hold(close: np.ndarray) -> dict:
+    close = np.asarray(close, dtype=float)
+    return _row(evaluate(np.ones((1, len(close))), close, cost_bps=0.0), 0)
+
+
+def backtest(close: np.ndarray, strategies: Optional[list[str]] = None, top: int = 3) -> dict:
+    """Sweep each strategy over one price history and compare with buy and hold."""
+    strategies = strategies or list(STRATEGIES)
+    check_strategies(strategies)
+    return {
+        "days": len(close),
+        "cost_bps": COST_BPS,
+        "buy_and_hold": buy_and_hold(close),
+        "strategies": [sweep(close, s, top=top) for s in strategies],
+    }
+
+
+def _fetch_closes(ticker: str, years: int) -> np.ndarray:
+    from .ohlcv_util import get_ohlcv_store
+    close = get_ohlcv_store().bars(ticker, f"{years}y").close
+    if len(close) == 0:
+        raise BacktestError(f"No price history for {ticker}")
+    return close
+
+
+def backtest_ticker(ticker: str, strategies: Optional[list[str]] = None, years: int = BACKTEST_YEARS, top: int = 3) -> dict:
+    check_strategies(strategies or [])  # before downloading anything
+    close = _fetch_closes(ticker.upper(), years)
+    return {"ticker": ticker.upper(), "years": years, **backtest(close, strategies, top)}
@@ -0,0 +1,167 @@
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from typing import Any, Optional
+
+from cachetools import Cache, TTLCache
+
+from .trace_util import payload_size, registry
+
+# Bytes all budgeted caches may hold together (default 256 MiB)
+CACHE_BUDGET_BYTES = int(os.environ.get("STOCK_AGENT_CACHE_BUDGET_MB", "256")) * 2**20
+# Refetch cost assumed for an entry whose fetch was not timed (seconds)
+DEFAULT_COST = 0.5
+
+CACHE_BYTES = registry.gauge("stock_agent_cache_bytes", "Bytes held per tool cache.", ("cache",))
+CACHE_EVICTIONS = registry.counter("stock_agent_cache_evictions_total", "Entries evicted to stay within the cache budget.", ("cache",))
+
+
+def deep_sizeof(obj: Any) -> int:
+    """In-memory size of obj and everything it references (dicts, sequences, DataFrames, arrays)."""
+    return payload_size(obj, overhead=True)
+
+
+class CacheBudget:
+    """
+    One memory budget shared by several caches, enforced with GreedyDual-Size-Frequency:
+    each entry's priority is clock + hits * refetch cost / bytes, and while the caches hold
+    more than the budget the lowest-priority entry goes, wherever it lives. Evicting raises
+    the clock to the evicted priority, so entries that stop being used age out.
+    """
+
+    def __init__(self, limit: int = CACHE_BUDGET_BYTES):
+        self.limit = limit
+        self.clock = 0.0
+        self.caches: dict[str, "BudgetedTTLCache"] = {}
+        self.evictions = 0
+        self._heap: list = []  # (priority, seq, cache name, key); stale rows are skipped on pop
+        self._seq = itertools.count()
+        self.lock = threading.RLock()
+
+    def register(self, cache: "BudgetedTTLCache"):
+        with self.lock:
+            self.caches[cache.name] = cache
+
+    @property
+    def currsize(self) -> int:
+        return sum(cache.currsize for cache in self.caches.values())
+
+    def touch(self, cache: "BudgetedTTLCache", key, entry: list):
+        """(Re)prioritize an entry; entry is the cache's [priority, seq, hits, cost, size] record."""
+        entry[0] = self.clock + entry[2] * entry[3] / max(entry[4], 1)
+        entry[1] = next(self._seq)
+        heapq.heappush(self._heap, (entry[0], entry[1], cache.name, key))
+        if len(self._heap) > 4 * sum(len(c.entries) for c in self.caches.values()) + 64:
+            self._compact()
+
+    def enforce(self):
+        while self.currsize > self.limit and self._heap:
+            priority, seq, name, key = heapq.heappop(self._heap)
+            cache = self.caches[name]
+            entry = cache.entries.get(key)
+            if entry is None or entry[1] != seq:
+                continue  # re-prioritized or already gone
+            self.clock = priority
+            cache.evict(key)
+            self.evictions += 1
+            CACHE_EVICTIONS.inc(cache=name)
+
+    def _compact(self):
+        self._heap = [(e[0], e[1], c.name, k) for c in self.caches.values() for k, e in c.entries.items()]
+        heapq.heapify(self._heap)
+
+    def stats(self) -> dict:
+        with self.lock:
+            caches = {name: cache.stats() for name, cache in sorted(self.caches.items())}
+            return {"limit_bytes": self.limit, "bytes": sum(c["bytes"] for c in caches.values()),
+                    "evictions": self.evictions, "caches": caches}
+
+
+budget = CacheBudget()
+
+
+class BudgetedTTLCache(TTLCache):
+    """
+    TTLCache whose size is in bytes (deep size of each value) and whose entries count against
+    a shared CacheBudget. The refetch cost of an entry is the time its fetch took, measured
+    between the miss and the store that follows it in cachetools' `cached`.
+    """
+
+    def __init__(self, name: str, ttl: float, budget: CacheBudget = budget):
+        # No per-cache limit: the shared budget decides what goes, not this cache's LRU order
+        super().__init__(maxsize=math.inf, ttl=ttl, getsizeof=deep_sizeof)
+        self.name = name
+        self.budget = budget
+        self.entries: dict = {}  # key -> [priority, seq, hits, cost, size]
+        self.hits = self.misses = 0
+        self._missed = threading.local()
+        budget.register(self)
+
+    def __getitem__(self, key):
+        with self.budget.lock:
+            value = super().__getitem__(key)
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry[2] += 1
+                self.budget.touch(self, key, entry)
+            self.hits += 1
+            return value
+
+    def __missing__(self, key):
+        self.misses += 1
+        self._missed.key, self._missed.at = key, time.perf_counter()
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        size = self.getsizeof(value)
+        if size > self.budget.limit:
+            raise ValueError("value too large")  # `cached` then returns it without caching
+        cost = DEFAULT_COST
+        if getattr(self._missed, "key", None) == key:
+            cost = time.perf_counter() - self._missed.at
+            self._missed.key = None
+        with self.budget.lock:
+            super().__setitem__(key, value)  # also drops expired items, through expire()
+            entry = self.entries[key] = [0.0, 0, 1, cost, size]
+            self.budget.touch(self, key, entry)
+            self.budget.enforce()
+            CACHE_BYTES.set(self.nbytes, cache=self.name)
+
+    def __delitem__(self, key):
+        with self.budget.lock:
+            self.entries.pop(key, None)
+            super().__delitem__(key)
+
+    def evict(self, key):
+        self.entries.pop(key, None)
+        try:
+            super().__delitem__(key)
+        except KeyError:
+            pass  # it had expired anyway
+        CACHE_BYTES.set(self.nbytes, cache=self.name)
+
+    def expire(self, time=None):
+        with self.budget.lock:
+            expired = super().expire(time)
+            for key, _ in expired:
+                self.entries.pop(key, None)
+            if expired:
+                CACHE_BYTES.set(self.nbytes, cache=self.name)
+            return expired
+
+    @property
+    def nbytes(self) -> int:
+        # Cache.currsize: TTLCache.currsize would expire() first, which calls back in here
+        return Cache.currsize.__get__(self)
+
+    def stats(self) -> dict:
+        return {"entries": len(self), "bytes": self.currsize, "hits": self.hits, "misses": self.misses,
+                "ttl_seconds": self.ttl}
+
+
+def cache_stats() -> dict:
+    """Bytes, entries and hit counts of every budgeted cache, plus the shared budget."""
+    return budget.stats()
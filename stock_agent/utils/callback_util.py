@@ -1,60 +1,147 @@
 import asyncio
 import json
+import os
+import reprlib
+import threading
+from collections import deque
 from datetime import datetime
-from langchain.callbacks.base import BaseCallbackHandler
-from typing import Any, Sequence, List, Optional
+from langchain_core.callbacks import AsyncCallbackHandler
+from typing import Any, Optional
 from uuid import UUID
-from langchain_core.agents import AgentAction, AgentFinish
-from langchain_core.documents import Document
-from langchain_core.outputs import LLMResult
-# Assuming ConnectionManager will be defined in main.py or a shared utility
-# from main import ConnectionManager # Placeholder import
 
-class WebSocketCallbackHandler(BaseCallbackHandler):
-    """Callback handler that sends tool usage events over WebSocket."""
+# Tool starts/ends are printed as DEBUG lines only when STOCK_AGENT_CALLBACK_DEBUG=1; errors always are
+DEBUG = os.environ.get("STOCK_AGENT_CALLBACK_DEBUG", "").lower() in ("1", "true", "yes")
 
-    def __init__(self, websocket_manager: Any): # Use Any for now to avoid circular import
+PREVIEW_CHARS = 200
+INPUT_PREVIEW_CHARS = 100
+# Events waiting for the event loop to publish them; beyond this the oldest are dropped.
+EVENT_RING_SIZE = 1024
+
+# Bounded repr: renders at most a few items / characters of each container level
+_repr = reprlib.Repr()
+_repr.maxstring = PREVIEW_CHARS
+_repr.maxother = PREVIEW_CHARS
+_repr.maxdict = 6
+_repr.maxlist = 6
+_repr.maxlevel = 2
+
+
+def preview(obj: Any, limit: int = PREVIEW_CHARS) -> str:
+    """
+    Short description of a tool input/output without rendering the whole object:
+    strings are sliced, DataFrames report their shape and size plus a few head rows,
+    containers report their length and the first few items.
+    """
+    content = getattr(obj, "content", None)  # ToolMessage / AIMessage
+    if isinstance(content, str):
+        obj = content
+    if isinstance(obj, str):
+        return obj[:limit] + (f"... ({len(obj)} chars)" if len(obj) > limit else "")
+    if hasattr(obj, "shape") and hasattr(obj, "iloc"):  # pandas DataFrame / Series
+        # Shallow size from dtypes (memory_usage() alone costs more than the whole preview)
+        try:
+            dtypes = obj.dtypes if hasattr(obj, "columns") else [obj.dtype]
+            size = obj.shape[0] * sum(getattr(dtype, "itemsize", 8) for dtype in dtypes)
+        except Exception:
+            size = 0
+        shape = "x".join(str(n) for n in obj.shape)
+        columns = list(obj.columns) if hasattr(obj, "columns") else [getattr(obj, "name", None)]
+        head = _repr.repr(obj.iloc[:3].to_numpy().tolist())
+        return f"{type(obj).__name__} {shape}, {size} bytes, columns={_repr.repr(columns)}: {head}"[:limit]
+    if isinstance(obj, (bytes, bytearray)):
+        return f"{type(obj).__name__} ({len(obj)} bytes)"
+    text = _repr.repr(obj)[:limit]
+    if isinstance(obj, (dict, list, tuple, set)):
+        return f"{type(obj).__name__}[{len(obj)}] {text}"
+    return text
+
+
+class EventRing:
+    """
+    Fixed-size drop-oldest buffer shared between callback threads and the event loop.
+    deque append/popleft are atomic, so producers never take a lock.
+    """
+
+    def __init__(self, size: int = EVENT_RING_SIZE):
+        self._events: deque = deque(maxlen=size)
+        self.dropped = 0
+
+    def push(self, item: Any):
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1  # approximate under contention; only used for reporting
+        self._events.append(item)
+
+    def drain(self) -> list:
+        items = []
+        try:
+            while True:
+                items.append(self._events.popleft())
+        except IndexError:
+            return items
+
+    def __len__(self):
+        return len(self._events)
+
+
+class WebSocketCallbackHandler(AsyncCallbackHandler):
+    """
+    Callback handler that sends tool usage events to the WebSocket subscribers of one analysis run.
+    Callbacks only build a bounded preview and push it into a ring buffer; one flush per burst,
+    scheduled on the event loop, publishes everything buffered.
+    """
+
+    # Only tool events are published; skip dispatch for everything else
+    ignore_llm = True
+    ignore_chat_model = True
+    ignore_chain = True
+    ignore_agent = True
+    ignore_retriever = True
+    ignore_retry = True
+    ignore_custom_event = True
+
+    def __init__(self, websocket_manager: Any, analysis_run_id: Optional[str] = None, ring_size: int = EVENT_RING_SIZE): # Use Any for now to avoid circular import
         self.websocket_manager = websocket_manager
-        # Get the running event loop when the handler is instantiated
-        # This assumes instantiation happens within the FastAPI/Uvicorn context
+        self.analysis_run_id = analysis_run_id # Topic the events are published to (returned by /stream_endpoint)
+        self.ring = EventRing(ring_size)
+        self._tool_names: dict[UUID, str] = {}
+        self._flush_scheduled = False
+        # Instantiated within the FastAPI/Uvicorn context, so this is the loop that owns the manager
         try:
             self._loop = asyncio.get_running_loop()
         except RuntimeError:
-            # Fallback if no loop is running during instantiation (less likely in FastAPI context)
-            self._loop = asyncio.get_event_loop()
-        print(f"DEBUG: Initialized WebSocketCallbackHandler with loop: {self._loop}")
-
-    async def _broadcast_tool_event(self, event_type: str, content: str, run_id: UUID):
-        """Helper method to format and broadcast tool events, including run_id."""
-        timestamp = datetime.now().isoformat()
-        message = {
+            self._loop = None
+        self._loop_thread = threading.get_ident()
+
+    def _push(self, event_type: str, content: str, run_id: UUID):
+        self.ring.push({
             "type": event_type,
             "content": content,
-            "timestamp": timestamp,
-            "run_id": str(run_id) # Add run_id as a string
-        }
-        if self.websocket_manager:
-            # Run the broadcast in the event loop managed by FastAPI/Uvicorn
-            await self.websocket_manager.broadcast(json.dumps(message))
+            "timestamp": datetime.now().isoformat(),
+            "run_id": str(run_id),
+            "analysis_run_id": self.analysis_run_id,
+        })
+        if self._flush_scheduled:
+            return
+        if self._loop is None or self.websocket_manager is None:
+            self._flush()
+            return
+        self._flush_scheduled = True
+        # Callbacks normally run on the loop; sync tools in worker threads need the thread-safe wakeup
+        if threading.get_ident() == self._loop_thread:
+            self._loop.call_soon(self._flush)
         else:
-            print(f"DEBUG: WebSocket Manager not available. Event: {message}")
-
-    # --- LLM/Chat Model Callbacks (Optional: Keep or remove based on needs) ---
-    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], **kwargs: Any) -> Any:
-        print("----------------------------------")
-        print("[WebSocketCallback] on_llm_start:", str(serialized.get('name', 'Unknown LLM'))[:100])
+            self._loop.call_soon_threadsafe(self._flush)
 
-    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> Any:
-        print("----------------------------------")
-        # Avoid sending potentially large LLM outputs via WebSocket unless needed
-        # print("[WebSocketCallback] on_llm_end:", str(response.llm_output)[:100])
+    def _flush(self):
+        self._flush_scheduled = False
+        for message in self.ring.drain():
+            if self.websocket_manager is not None:
+                self.websocket_manager.publish(self.analysis_run_id, json.dumps(message))
+            elif DEBUG:
+                print(f"DEBUG: WebSocket Manager not available. Event: {message}")
 
-    def on_chat_model_start(self, serialized: dict[str, Any], messages: list[list[Any]], **kwargs: Any) -> Any:
-        print("----------------------------------")
-        print("[WebSocketCallback] Chat model start:", str(serialized.get('name', 'Unknown Chat Model'))[:100])
-
-    # --- Tool Callbacks (Main focus for this task) ---
-    def on_tool_start(
+    # --- Tool Callbacks ---
+    async def on_tool_start(
         self,
         serialized: dict[str, Any],
         input_str: str,
@@ -65,62 +152,40 @@ class WebSocketCallbackHandler(BaseCallbackHandler):
         metadata: dict[str, Any] | None = None,
         inputs: dict[str, Any] | None = None,
         **kwargs: Any
-    ) -> Any:
-        """Send tool start event via WebSocket."""
-        print("----------------------------------")
-        print("run_id:", run_id)
-        print("parent_run_id:", parent_run_id)
-        print("tags:", tags)
-    
-        tool_name = serialized.get('name', 'Unknown Tool')
-        description = f"Tool Start: Running tool '{tool_name}' with input: {input_str[:100]}{'...' if len(input_str) > 100 else ''}"
-        print(f"[WebSocketCallback] {description}")
-        # Schedule the async broadcast method onto the stored event loop
-        # using a thread-safe approach, passing the run_id.
-        asyncio.run_coroutine_threadsafe(
-            self._broadcast_tool_event("start", description, run_id),
-            self._loop
-        )
-
-    def on_tool_end(
+    ) -> None:
+        """Queue a tool start event for the WebSocket subscribers."""
+        tool_name = (serialized or {}).get('name', 'Unknown Tool')
+        self._tool_names[run_id] = tool_name
+        description = f"Tool Start: Running tool '{tool_name}' with input: {preview(input_str, INPUT_PREVIEW_CHARS)}"
+        if DEBUG:
+            print(f"DEBUG: tool_start run_id={run_id} parent_run_id={parent_run_id} tool={tool_name} tags={tags}")
+        self._push("start", description, run_id)
+
+    async def on_tool_end(
+        self,
+        output: Any, # Output is usually a ToolMessage or string, but can be a DataFrame, dict, ...
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        tags: list[str] | None = None,
+        **kwargs: Any
+    ) -> None:
+        """Queue a tool end event with a bounded preview of the output."""
+        tool_name = self._tool_names.pop(run_id, None)
+        description = f"Tool End: Output: {preview(output)}"
+        if DEBUG:
+            print(f"DEBUG: tool_end run_id={run_id} parent_run_id={parent_run_id} tool={tool_name}")
+        self._push("end", description, run_id)
+
+    async def on_tool_error(
         self,
-        output: Any, # Output is usually a string, but can be other types
+        error: BaseException,
         *,
         run_id: UUID,
         parent_run_id: UUID | None = None,
         tags: list[str] | None = None,
         **kwargs: Any
-    ) -> Any:
-        """Send tool end event via WebSocket."""
-        print("----------------------------------")
-        print("run_id:", run_id)
-        print("parent_run_id:", parent_run_id)
-        print("tags:", tags)
-        output_str = str(output)
-        description = f"Tool End: Output: {output_str[:200]}{'...' if len(output_str) > 200 else ''}"
-        print(f"[WebSocketCallback] {description}")
-        asyncio.run_coroutine_threadsafe(
-            self._broadcast_tool_event("end", description, run_id),
-            self._loop
-        )
-
-    # --- Agent Callbacks (Optional) ---
-    def on_agent_action(self, action: AgentAction, **kwargs: Any) -> Any:
-        print("----------------------------------")
-        print(f"[WebSocketCallback] on_agent_action: tool={action.tool}, input={str(action.tool_input)[:50]}")
-
-    def on_agent_finish(self, finish: AgentFinish, **kwargs: Any) -> Any:
-        print("----------------------------------")
-        print(f"[WebSocketCallback] on_agent_finish: output={str(finish.return_values)[:100]}")
-
-    # --- Retriever Callbacks (Optional) ---
-    def on_retriever_start(self, serialized: dict[str, Any], query: str, **kwargs: Any) -> Any:
-        print("----------------------------------")
-        print(f"[WebSocketCallback] on_retriever_start: query={query[:100]}")
-
-    def on_retriever_end(self, documents: Sequence[Document], **kwargs: Any) -> Any:
-        print("----------------------------------")
-        print(f"[WebSocketCallback] on_retriever_end: retrieved {len(documents)} documents")
-
-# Removed the singleton logic (get_callback_handler function)
-# The handler will be instantiated directly in main.py
+    ) -> None:
+        tool_name = self._tool_names.pop(run_id, None)
+        print(f"ERROR: tool_error run_id={run_id} tool={tool_name} error={preview(str(error))}")
+        self._push("error", f"Tool Error: {preview(str(error))}", run_id)
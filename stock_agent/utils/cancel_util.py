@@ -0,0 +1,72 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from .trace_util import current_span, registry
+
+RUN_CANCELLED = registry.counter("stock_agent_run_cancelled_total", "Graph runs cancelled before completion.", ("reason",))
+
+
+class RunCancelled(Exception):
+    """Raised at a cancellation checkpoint once the run's token has been cancelled."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Run cancelled: {reason}")
+        self.reason = reason
+
+
+class CancelToken:
+    """
+    Cooperative cancellation flag for one graph run. Async nodes are cancelled through their
+    task; work running in executor threads (sync nodes, tool providers) checks the token at
+    its next checkpoint.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+            RUN_CANCELLED.inc(reason=reason)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise RunCancelled(self.reason)
+
+
+# Like the trace run, LangGraph copies this into every task and executor thread of the run
+_current_token: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar("cancel_token", default=None)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current_token.get()
+
+
+@contextmanager
+def cancel_scope(token: CancelToken):
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        try:
+            _current_token.reset(reset)
+        except ValueError:
+            pass  # async generator finalized in another context
+
+
+def check_cancelled():
+    """Checkpoint: raise RunCancelled if the current run has been cancelled."""
+    token = _current_token.get()
+    if token is not None and token.cancelled:
+        span = current_span()
+        if span is not None:
+            span.set(cancelled=token.reason)
+        raise RunCancelled(token.reason)
@@ -0,0 +1,143 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+DATE = np.dtype("datetime64[D]")
+VALUE = np.dtype("float64")
+
+
+class MappedTable:
+    """
+    One date-indexed table on disk, shared by the local time-series stores: a datetime64[D]
+    `dates` file and one float64 file per column, memory-mapped by readers, plus meta.json.
+
+    The meta is the commit record. `rows` only grows once the data it covers is on disk, and
+    a whole-table replacement is written as a new generation of files that the meta switches
+    to, so a reader sees either the old table or the new one, never new dates over old values.
+    patch() is the exception: it overwrites committed values in the shared files, so readers
+    (including arrays already handed out) see each value change as it is written; a patch of
+    several values can be seen half applied. Writers are serialized by the owning store;
+    readers may run in any thread or process.
+    """
+
+    def __init__(self, directory: str, columns: tuple, defaults: dict):
+        self.directory = directory
+        self.columns = tuple(columns)
+        self.meta_path = os.path.join(directory, "meta.json")
+        self._defaults = defaults
+        self._mapped: Optional[tuple] = None  # ((generation, rows), dates, {column: array})
+        self._meta_mtime: Optional[int] = None
+        self.meta = self._read_meta()
+
+    def path(self, column: str, generation: Optional[int] = None) -> str:
+        generation = self.generation if generation is None else generation
+        # Generation 0 keeps the plain names, so stores written before generations still open
+        return os.path.join(self.directory, f"{column}.bin" if generation == 0 else f"{column}.{generation}.bin")
+
+    def _paths(self, generation: Optional[int] = None) -> list[tuple[str, str, np.dtype]]:
+        return [("dates", self.path("dates", generation), DATE)] + [
+            (c, self.path(c, generation), VALUE) for c in self.columns]
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self.meta_path) as f:
+                self._meta_mtime = os.fstat(f.fileno()).st_mtime_ns
+                return json.load(f)
+        except FileNotFoundError:
+            return {"rows": 0, **self._defaults}
+
+    def refresh(self):
+        """Pick up writes made by another process since the meta was last read."""
+        try:
+            mtime = os.stat(self.meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._meta_mtime:
+            self.meta = self._read_meta()
+            self._mapped = None
+
+    def write_meta(self):
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self.meta_path)
+        self._meta_mtime = os.stat(self.meta_path).st_mtime_ns
+
+    @property
+    def rows(self) -> int:
+        return self.meta["rows"]
+
+    @property
+    def generation(self) -> int:
+        return self.meta.get("generation", 0)
+
+    def arrays(self) -> tuple[np.ndarray, dict]:
+        """Read-only memory maps over the committed rows (re-mapped after the table grows or is replaced)."""
+        for _ in range(2):
+            rows = self.rows
+            if rows == 0:
+                return np.empty(0, DATE), {c: np.empty(0, VALUE) for c in self.columns}
+            key = (self.generation, rows)
+            if self._mapped is not None and self._mapped[0] == key:
+                return self._mapped[1], self._mapped[2]
+            try:
+                # Plain ndarray views of the maps: slicing a np.memmap costs more than the slice itself
+                mapped = {name: np.memmap(path, dtype=dtype, mode="r", shape=(rows,)).view(np.ndarray)
+                          for name, path, dtype in self._paths()}
+            except FileNotFoundError:
+                # Another process replaced the table (and removed this generation) after our meta read
+                self.meta = self._read_meta()
+                continue
+            dates = mapped.pop("dates")
+            self._mapped = (key, dates, mapped)
+            return dates, mapped
+        raise FileNotFoundError(f"Table files listed in {self.meta_path} are missing")
+
+    def append(self, dates: np.ndarray, columns: dict):
+        """Write rows after the committed ones; they are committed by the caller's next write_meta()."""
+        self._truncate_uncommitted()
+        for name, path, _ in self._paths():
+            with open(path, "ab") as f:
+                f.write((dates if name == "dates" else columns[name]).tobytes())
+        self.meta["rows"] += len(dates)
+
+    def patch(self, column: str, index, values):
+        """
+        Overwrite committed values of one column in place (revisions, a re-taken latest bar).
+        The maps are shared, so every reader of the column sees the new values, not only later ones.
+        """
+        self._mapped = None
+        patch = np.memmap(self.path(column), dtype=VALUE, mode="r+", shape=(self.rows,))
+        patch[index] = values
+        patch.flush()
+        del patch
+
+    def replace(self, dates: np.ndarray, columns: dict, **meta):
+        """Swap in a whole new table as the next generation, committed (with `meta`) in one meta write."""
+        old, new = self.generation, self.generation + 1
+        for name, path, _ in self._paths(new):
+            with open(path, "wb") as f:
+                f.write((dates if name == "dates" else columns[name]).tobytes())
+        self.meta.update(meta, rows=len(dates), generation=new)
+        self.write_meta()
+        self._mapped = None
+        for _, path, _ in self._paths(old):
+            try:
+                os.remove(path)  # mapped pages stay readable for whoever still holds them
+            except FileNotFoundError:
+                pass
+
+    def _truncate_uncommitted(self):
+        # Bytes past `rows` are from an append that crashed before its meta was written
+        for _, path, dtype in self._paths():
+            if os.path.exists(path) and os.path.getsize(path) != self.rows * dtype.itemsize:
+                with open(path, "r+b") as f:
+                    f.truncate(self.rows * dtype.itemsize)
+
+
+def directory_nbytes(root: str) -> int:
+    """Bytes on disk under `root`."""
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, files in os.walk(root) for name in files)
@@ -0,0 +1,34 @@
+import os
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+def data_dir() -> str:
+    """
+    Where local state (job queue, stores, caches) lives: STOCK_AGENT_DATA_DIR, else data/.
+    Read on use, after .env is loaded, so the setting may also come from .env.
+    """
+    load_config()
+    return os.environ.get("STOCK_AGENT_DATA_DIR", os.path.join(PROJECT_ROOT, "data"))
+
+def data_path(*parts: str) -> str:
+    """Path under data_dir(); parent directories are created on demand."""
+    path = os.path.join(data_dir(), *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+@lru_cache(maxsize=None)
+def load_config() -> bool:
+    """
+    Load environment configuration exactly once per process.
+    The project-root .env (the one langgraph.json points at) wins; a stock_agent/.env
+    is still honoured for keys the root file does not define.
+    """
+    loaded = False
+    for dotenv_path in (os.path.join(PROJECT_ROOT, '.env'), os.path.join(PROJECT_ROOT, 'stock_agent', '.env')):
+        if os.path.exists(dotenv_path):
+            print(f"DEBUG [config_util.py]: Loading .env from: {dotenv_path}")
+            loaded = load_dotenv(dotenv_path=dotenv_path, override=False) or loaded
+    return loaded
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Hashable, Optional
+
+from .trace_util import registry
+
+# Concurrent requests per (provider, model) unless the routing config sets "max_concurrency"
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("STOCK_AGENT_LLM_MAX_CONCURRENCY", "8"))
+# Keep-alive connections kept per provider endpoint
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("STOCK_AGENT_LLM_KEEPALIVE", "20"))
+
+LLM_IN_FLIGHT = registry.gauge("stock_agent_llm_in_flight", "LLM requests currently running.", ("provider", "model"))
+LLM_QUEUED = registry.gauge("stock_agent_llm_queued", "LLM requests waiting for a concurrency slot.", ("provider", "model"))
+
+
+class ModelLimiter:
+    """
+    FIFO concurrency cap shared by threads and coroutines. A released slot is handed
+    directly to the oldest waiter, whether it is a blocked thread or an awaiting task.
+    """
+
+    def __init__(self, limit: int, labels: Optional[dict] = None):
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters: deque = deque()  # threading.Event | (loop, future)
+        self._lock = threading.Lock()
+        self._labels = labels or {}
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _publish(self):
+        LLM_IN_FLIGHT.set(self.in_flight, **self._labels)
+        LLM_QUEUED.set(len(self._waiters), **self._labels)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Take a slot, waiting at most `timeout` seconds (forever if None); False if none came."""
+        with self._lock:
+            if self.in_flight < self.limit and not self._waiters:
+                self.in_flight += 1
+                self._publish()
+                return True
+            event = threading.Event()
+            self._waiters.append(event)
+            self._publish()
+        if event.wait(timeout):
+            return True  # the releasing caller hands its slot over; in_flight is unchanged
+        with self._lock:
+            try:
+                self._waiters.remove(event)
+            except ValueError:
+                return True  # handed over just as the wait timed out
+            self._publish()
+        return False
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.in_flight < self.limit and not self._waiters:
+                self.in_flight += 1
+                self._publish()
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+            self._publish()
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    granted = False
+                except ValueError:
+                    granted = future.done() and not future.cancelled()
+                self._publish()
+            if granted:
+                self.release()  # the slot arrived just as we were cancelled
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    self._publish()
+                    return
+                loop, future = waiter
+                if not future.done():
+                    loop.call_soon_threadsafe(self._hand_over, future)
+                    self._publish()
+                    return
+            self.in_flight -= 1
+            self._publish()
+
+    def _hand_over(self, future: asyncio.Future):
+        if future.done():
+            self.release()  # the waiter was cancelled while the slot was in transit
+        else:
+            future.set_result(None)
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        if not self.acquire(timeout):
+            raise TimeoutError(f"No concurrency slot within {timeout:.1f}s")
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class LLMClientPool:
+    """
+    Chat model clients built once per key (double-checked under a lock, so parallel branches
+    never construct duplicates), plus one concurrency limiter per (provider, model).
+    """
+
+    def __init__(self, factory: Callable[..., Any]):
+        self._factory = factory
+        self._clients: dict[Hashable, Any] = {}
+        self._limiters: dict[tuple, ModelLimiter] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def get(self, key: Hashable, *args, **kwargs) -> Any:
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._clients[key] = self._factory(*args, **kwargs)
+                    self.created += 1
+        return client
+
+    def limiter(self, provider: str, model: str, limit: Optional[int] = None) -> ModelLimiter:
+        key = (provider, model)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(key)
+                if limiter is None:
+                    limiter = self._limiters[key] = ModelLimiter(limit or DEFAULT_MAX_CONCURRENCY, {"provider": provider, "model": model})
+        return limiter
+
+    def stats(self) -> dict:
+        """In-flight and queued requests per provider/model."""
+        return {f"{provider}/{model}": {"in_flight": l.in_flight, "queued": l.queued, "limit": l.limit}
+                for (provider, model), l in list(self._limiters.items())}
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+
+_http_clients: dict[str, Any] = {}
+_http_lock = threading.Lock()
+
+
+def shared_http_client(base_url: str) -> Any:
+    """
+    One keep-alive httpx client per endpoint, shared by every model and timeout variant (and
+    every graph branch thread) that talks to it. Request timeouts are still set per model by the SDK.
+    """
+    client = _http_clients.get(base_url)
+    if client is None:
+        import httpx  # comes with the openai SDK; only needed for OpenAI-compatible providers
+        with _http_lock:
+            client = _http_clients.get(base_url)
+            if client is None:
+                limits = httpx.Limits(max_connections=None, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS)
+                client = _http_clients[base_url] = httpx.Client(limits=limits)
+    return client
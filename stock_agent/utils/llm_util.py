@@ -0,0 +1,279 @@
+import asyncio
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from .config_util import load_config
+from .trace_util import current_span, registry
+from .cancel_util import check_cancelled
+from .llm_pool_util import LLMClientPool, shared_http_client
+
+# Model tiers and per-node routing. Each node/phase lists candidate tiers in order; the first
+# one that answers within the node's latency budget wins, the rest are fallbacks. Routed
+# calls are not retried by the SDK (that would multiply the budget); the next tier is the retry.
+# "max_retries" applies to clients taken directly with get_chat_model.
+# "tool_selection" is an analyst turn that has not seen any tool result yet,
+# "synthesis" is every other turn (writing the report, or nodes without tools).
+# Override with STOCK_AGENT_MODEL_ROUTING (inline JSON or a path to a JSON file).
+DEFAULT_MODEL_ROUTING = {
+    "models": {
+        "fast": {"provider": "google", "model": "gemini-2.5-flash", "max_retries": 1},
+        "heavy": {"provider": "google", "model": "gemini-2.5-pro", "max_retries": 2},
+        "openrouter_fast": {"provider": "openrouter", "model": "google/gemini-2.5-flash", "max_retries": 1},
+        "deepseek": {"provider": "deepseek", "model": "deepseek-chat", "max_retries": 1, "kwargs": {"max_tokens": 8192}},
+        # Optional per model: "max_concurrency" (default STOCK_AGENT_LLM_MAX_CONCURRENCY)
+        "openai_mini": {"provider": "openai", "model": "gpt-4o-mini", "max_retries": 1, "kwargs": {"max_completion_tokens": 16384}},
+    },
+    "nodes": {
+        "default": {
+            "tool_selection": ["fast", "openrouter_fast", "openai_mini"],
+            "synthesis": ["heavy", "deepseek"],
+            "budget_seconds": {"tool_selection": 30, "synthesis": 240},
+        },
+        "financial_advisor": {"synthesis": ["heavy", "deepseek"]},
+        "hedge_fund_manager": {"synthesis": ["heavy", "deepseek"]},
+        "translator": {"synthesis": ["fast", "openrouter_fast", "openai_mini"], "budget_seconds": {"synthesis": 90}},
+        "quick_scan": {"synthesis": ["fast", "openrouter_fast", "openai_mini"], "budget_seconds": {"synthesis": 30}},
+    },
+}
+
+PHASES = ("tool_selection", "synthesis")
+
+ROUTE_TOTAL = registry.counter(
+    "stock_agent_llm_route_total", "LLM routing outcomes per node and model.", ("node", "phase", "model", "outcome"))
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    tier: str
+    provider: str  # google | openrouter | deepseek | openai
+    model: str
+    max_retries: int = 1
+    kwargs: tuple = ()  # extra constructor kwargs as sorted items (hashable for the client cache)
+    max_concurrency: Optional[int] = None  # concurrent requests to this provider/model
+
+    @classmethod
+    def from_config(cls, tier: str, config: dict) -> "ModelSpec":
+        return cls(tier=tier, provider=config["provider"], model=config["model"],
+                   max_retries=config.get("max_retries", 1), kwargs=tuple(sorted(config.get("kwargs", {}).items())),
+                   max_concurrency=config.get("max_concurrency"))
+
+
+@dataclass
+class Route:
+    node: str
+    candidates: dict = field(default_factory=dict)  # phase -> [ModelSpec, ...]
+    budgets: dict = field(default_factory=dict)  # phase -> seconds
+
+
+def _load_routing_config() -> dict:
+    load_config()
+    raw = os.environ.get("STOCK_AGENT_MODEL_ROUTING")
+    if not raw:
+        return DEFAULT_MODEL_ROUTING
+    if os.path.exists(raw):
+        with open(raw) as f:
+            override = json.load(f)
+    else:
+        override = json.loads(raw)
+    return {
+        "models": {**DEFAULT_MODEL_ROUTING["models"], **override.get("models", {})},
+        "nodes": {**DEFAULT_MODEL_ROUTING["nodes"], **override.get("nodes", {})},
+    }
+
+
+_routing_config: Optional[dict] = None
+_routes: dict[str, Route] = {}
+
+
+def node_key(name: str) -> str:
+    """'Financial Analyst 2' -> 'financial_analyst_2' (the graph node name)."""
+    return name.strip().lower().replace(" ", "_")
+
+
+def get_route(node: str) -> Route:
+    global _routing_config
+    node = node_key(node)
+    if node not in _routes:
+        if _routing_config is None:
+            _routing_config = _load_routing_config()
+        models = _routing_config["models"]
+        default = _routing_config["nodes"]["default"]
+        override = _routing_config["nodes"].get(node, {})
+        route = Route(node=node)
+        for phase in PHASES:
+            tiers = override.get(phase, default.get(phase, []))
+            route.candidates[phase] = [ModelSpec.from_config(t, models[t]) for t in tiers]
+            route.budgets[phase] = override.get("budget_seconds", {}).get(phase, default["budget_seconds"][phase])
+        _routes[node] = route
+    return _routes[node]
+
+
+# Default endpoints of the OpenAI-compatible providers, for sharing HTTP connections per endpoint
+_OPENAI_COMPATIBLE_BASE_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "openrouter": "https://openrouter.ai/api/v1",
+    "deepseek": "https://api.deepseek.com",
+}
+
+
+def build_chat_model(spec: ModelSpec, timeout: Optional[float] = None, max_retries: Optional[int] = None):
+    """Instantiate a chat model for a spec. Provider SDKs are imported here, on first use."""
+    kwargs = dict(spec.kwargs)
+    max_retries = spec.max_retries if max_retries is None else max_retries
+    if spec.provider in _OPENAI_COMPATIBLE_BASE_URLS:
+        base_url = kwargs.get("base_url") or _OPENAI_COMPATIBLE_BASE_URLS[spec.provider]
+        # Async clients are bound to the event loop that first uses them, so only the sync
+        # client is shared; each pooled model keeps its own async connection pool.
+        kwargs.setdefault("http_client", shared_http_client(base_url))
+    if spec.provider == "google":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(model=spec.model, timeout=timeout, max_retries=max_retries, **kwargs)
+    if spec.provider == "openrouter":
+        from .openrouter import ChatOpenRouter
+        return ChatOpenRouter(model=spec.model, timeout=timeout, max_retries=max_retries, **kwargs)
+    if spec.provider == "deepseek":
+        from langchain_deepseek import ChatDeepSeek
+        return ChatDeepSeek(model=spec.model, timeout=timeout, max_retries=max_retries, **kwargs)
+    if spec.provider == "openai":
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model=spec.model, timeout=timeout, max_retries=max_retries, **kwargs)
+    raise ValueError(f"Unknown LLM provider: {spec.provider}")
+
+
+# Clients are shared by every node and branch; each is built exactly once
+llm_pool = LLMClientPool(build_chat_model)
+# Sync routed calls run here so the caller can stop waiting at the budget; a call given up on
+# keeps its thread (and its concurrency slot) until the client's own timeout ends it
+_invoke_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("STOCK_AGENT_LLM_WORKERS", "32")),
+                                      thread_name_prefix="llm-invoke")
+
+
+def get_chat_model(spec: ModelSpec, timeout: Optional[float] = None, max_retries: Optional[int] = None):
+    return llm_pool.get((spec, timeout, max_retries), spec, timeout, max_retries)
+
+
+def get_limiter(spec: ModelSpec):
+    return llm_pool.limiter(spec.provider, spec.model, spec.max_concurrency)
+
+
+class _RoutingAttempts:
+    """Bookkeeping for one routed call: per-candidate outcomes, metrics and the trace record."""
+
+    def __init__(self, route: Route, phase: str):
+        self.route = route
+        self.phase = phase
+        self.budget = route.budgets[phase]
+        self.attempts: list[dict] = []
+        self.last_error: Optional[BaseException] = None
+
+    def candidates(self, tools: Optional[list]):
+        budget = self.budget
+        for spec in self.route.candidates[self.phase]:
+            try:
+                # No SDK retries: with them a tier could take (max_retries + 1) x budget before falling back
+                llm = get_chat_model(spec, timeout=budget, max_retries=0)
+            except Exception as e:  # missing API key / SDK for a fallback provider
+                self._add(spec, "unavailable", error=e)
+                continue
+            yield spec, (llm.bind_tools(tools) if tools else llm)
+
+    def failed(self, spec: ModelSpec, started: float, error: Exception):
+        seconds = time.perf_counter() - started
+        print(f"WARNING: {self.route.node}/{self.phase} model {spec.model} failed after {seconds:.1f}s, falling back: {error or type(error).__name__}")
+        self._add(spec, "error", seconds=seconds, error=error)
+
+    def succeeded(self, spec: ModelSpec, started: float):
+        self._add(spec, "ok", seconds=time.perf_counter() - started)
+        self._record(spec)
+
+    def exhausted(self) -> RuntimeError:
+        self._record(None)
+        error = RuntimeError(f"All models failed for {self.route.node}/{self.phase}: {self.attempts}")
+        error.__cause__ = self.last_error
+        return error
+
+    def _add(self, spec: ModelSpec, outcome: str, seconds: Optional[float] = None, error: Optional[Exception] = None):
+        attempt = {"model": spec.model, "outcome": outcome}
+        if seconds is not None:
+            attempt["seconds"] = round(seconds, 3)
+        if error is not None:
+            attempt["error"] = (str(error) or type(error).__name__)[:200]
+            self.last_error = error
+        self.attempts.append(attempt)
+        ROUTE_TOTAL.inc(node=self.route.node, phase=self.phase, model=spec.model, outcome=outcome)
+
+    def _record(self, spec: Optional[ModelSpec]):
+        span = current_span()
+        if span is not None:
+            span.set(phase=self.phase, model=spec.model if spec else None, tier=spec.tier if spec else None,
+                     fallback=len(self.attempts) > 1, attempts=self.attempts)
+
+
+def _invoke_in_slot(limiter, llm, messages: Any, config: Optional[dict]):
+    try:
+        return llm.invoke(messages, config=config)
+    finally:
+        limiter.release()  # held until the call really ends, even after the caller gave up on it
+
+
+def invoke_routed(node: str, phase: str, messages: Any, tools: Optional[list] = None, config: Optional[dict] = None):
+    """Call the node's models in routing order; a budget overrun or provider error falls through to the next one."""
+    routing = _RoutingAttempts(get_route(node), phase)
+    for spec, llm in routing.candidates(tools):
+        check_cancelled()  # no fallback attempts for a cancelled run
+        started = time.perf_counter()
+        try:
+            # The budget covers the whole attempt, the wait for a concurrency slot included
+            limiter = get_limiter(spec)
+            if not limiter.acquire(timeout=routing.budget):
+                raise TimeoutError(f"No {spec.model} slot within the {routing.budget}s budget")
+            future = _invoke_executor.submit(contextvars.copy_context().run, _invoke_in_slot, limiter, llm, messages, config)
+            try:
+                response = future.result(timeout=max(0.0, started + routing.budget - time.perf_counter()))
+            except FutureTimeoutError:
+                raise TimeoutError(f"{spec.model} did not answer within the {routing.budget}s budget") from None
+        except Exception as e:
+            routing.failed(spec, started, e)
+            continue
+        routing.succeeded(spec, started)
+        return response
+    raise routing.exhausted()
+
+
+async def _ainvoke_in_slot(spec: ModelSpec, llm, messages: Any, config: Optional[dict]):
+    async with get_limiter(spec).aslot():
+        return await llm.ainvoke(messages, config=config)
+
+
+async def ainvoke_routed(node: str, phase: str, messages: Any, tools: Optional[list] = None, config: Optional[dict] = None):
+    routing = _RoutingAttempts(get_route(node), phase)
+    for spec, llm in routing.candidates(tools):
+        check_cancelled()
+        started = time.perf_counter()
+        try:
+            # The client timeout bounds each read, not the whole call; this bounds the call, slot wait included
+            response = await asyncio.wait_for(_ainvoke_in_slot(spec, llm, messages, config), timeout=routing.budget)
+        except Exception as e:
+            routing.failed(spec, started, e)
+            continue
+        routing.succeeded(spec, started)
+        return response
+    raise routing.exhausted()
+
+
+def get_routed_llm(node: str, phase: str = "synthesis", tools: Optional[list] = None) -> Runnable:
+    """Runnable facade over invoke_routed, for chains such as `llm | parser`."""
+    def _invoke(messages, config):
+        return invoke_routed(node, phase, messages, tools, config)
+
+    async def _ainvoke(messages, config):
+        return await ainvoke_routed(node, phase, messages, tools, config)
+
+    return RunnableLambda(_invoke, afunc=_ainvoke, name=f"{node_key(node)}:{phase}")
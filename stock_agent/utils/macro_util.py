@@ -0,0 +1,176 @@
+import math
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+
+from .timeseries_util import TimeSeriesStore
+from .trace_util import registry
+
+# Trailing window for z-scores and percentiles
+ZSCORE_DAYS = int(os.environ.get("STOCK_AGENT_MACRO_ZSCORE_DAYS", "365"))
+
+# Series the features are derived from (collected by backend/macro_job.py)
+LEVEL_SERIES = {
+    "FEDFUNDS": "Fed funds rate (%)",
+    "DGS10": "10-year Treasury yield (%)",
+    "T10Y2Y": "10y-2y Treasury spread (%)",
+    "VIXCLS": "VIX",
+    "BAMLC0A0CM": "US corporate OAS (%)",
+    "UNRATE": "Unemployment rate (%)",
+    "UMCSENT": "UMich consumer sentiment",
+    "SP500": "S&P 500",
+}
+GROWTH_SERIES = {
+    "CPIAUCNS": "CPI",
+    "CPILFENS": "Core CPI",
+    "PCEPI": "PCE price index",
+    "PPIACO": "PPI",
+    "ICSA": "Initial jobless claims",
+    "PAYEMS": "Nonfarm payrolls",
+    "INDPRO": "Industrial production",
+    "M2SL": "M2",
+    "HOUST": "Housing starts",
+    "GDPC1": "Real GDP",
+}
+
+FEATURE_CACHE = registry.counter("stock_agent_macro_features_total", "Macro feature lookups.", ("outcome",))
+
+
+def _round(value: Optional[float], digits: int = 3) -> Optional[float]:
+    if value is None or not math.isfinite(value):
+        return None
+    return round(float(value), digits)
+
+
+def _value_at(dates: np.ndarray, values: np.ndarray, day: np.datetime64) -> float:
+    """Last observation on or before `day` (NaN if there is none)."""
+    i = int(np.searchsorted(dates, day, side="right")) - 1
+    return float(values[i]) if i >= 0 else math.nan
+
+
+def _months_before(day: np.datetime64, months: int) -> np.datetime64:
+    """Same day of the month `months` earlier, clipped to that month's last day (Mar 31 -> Feb 28)."""
+    month = day.astype("datetime64[M]")
+    earlier = month - months
+    return min(earlier.astype("datetime64[D]") + (day - month.astype("datetime64[D]")),
+               (earlier + 1).astype("datetime64[D]") - 1)
+
+
+def series_features(dates: np.ndarray, values: np.ndarray, pct: bool = True) -> dict:
+    """
+    Latest level, MoM (QoQ for quarterly series) / YoY change, trailing z-score and percentile
+    of one series. Changes are in % for indexes and counts (pct=True), in points for rates and
+    spreads, against the observation a calendar month / quarter / year before the latest one.
+    """
+    valid = ~np.isnan(values)
+    dates, values = dates[valid], values[valid]
+    if len(values) == 0:
+        return {}
+    last_date, last = dates[-1], float(values[-1])
+    # Quarterly series (GDP) have no month-ago print of their own
+    spacing = np.median(np.diff(dates[-13:]).astype("timedelta64[D]").astype(int)) if len(dates) > 1 else 0
+    period, months = ("qoq", 3) if spacing >= 80 else ("mom", 1)
+    period_ago = _value_at(dates, values, _months_before(last_date, months))
+    year_ago = _value_at(dates, values, _months_before(last_date, 12))
+    window = values[dates > last_date - np.timedelta64(ZSCORE_DAYS, "D")]
+    std = float(window.std()) if len(window) > 1 else 0.0
+    change = (lambda old: (last / old - 1) * 100 if old else math.nan) if pct else (lambda old: last - old)
+    suffix = "pct" if pct else "change"
+    return {
+        "date": str(last_date),
+        "value": _round(last, 4),
+        f"{period}_{suffix}": _round(change(period_ago)),
+        f"yoy_{suffix}": _round(change(year_ago)),
+        "zscore": _round((last - window.mean()) / std) if std > 0 else None,
+        "percentile": _round(float((window <= last).mean()), 2) if len(window) > 1 else None,
+    }
+
+
+def classify_regime(features: dict) -> dict:
+    """Rule-based regime label from a handful of cross-series signals, with the reasons that fired."""
+    get = lambda series, key="value": (features.get(series) or {}).get(key)
+    reasons = []
+    vix, spread_pct, curve = get("VIXCLS"), get("BAMLC0A0CM", "percentile"), get("T10Y2Y")
+    inflation = get("CPIAUCNS", "yoy_pct")
+    claims_yoy = get("ICSA", "yoy_pct")
+
+    if (vix is not None and vix >= 30) or (spread_pct is not None and spread_pct >= 0.9):
+        reasons.append(f"market stress: VIX {vix}, credit spread at the {spread_pct} percentile")
+        label = "risk_off"
+    elif curve is not None and curve < 0:
+        reasons.append(f"inverted yield curve (10y-2y {curve}%)")
+        label = "late_cycle"
+    elif inflation is not None and inflation >= 3.5:
+        reasons.append(f"CPI running {inflation}% YoY")
+        label = "inflationary"
+    elif claims_yoy is not None and claims_yoy >= 15:
+        reasons.append(f"jobless claims up {claims_yoy}% YoY")
+        label = "slowdown"
+    elif curve is not None and (spread_pct is None or spread_pct <= 0.5):
+        reasons.append(f"positive curve ({curve}%) and contained credit spreads")
+        label = "expansion"
+    else:
+        label = "neutral"
+    return {"label": label, "reasons": reasons}
+
+
+class MacroFeatures:
+    """
+    Derived macro indicators over the local time-series store, computed once per store
+    version and served from memory until the macro job stores new or revised observations.
+    """
+
+    def __init__(self, store: Optional[TimeSeriesStore] = None):
+        self._store = store
+        self._cached: Optional[tuple] = None  # (versions, features)
+        self._lock = threading.Lock()
+
+    @property
+    def store(self) -> TimeSeriesStore:
+        if self._store is None:
+            self._store = TimeSeriesStore()
+        return self._store
+
+    def _versions(self) -> tuple:
+        return tuple((series_id, self.store.version(series_id)) for series_id in self.store.series_ids())
+
+    def get(self) -> dict:
+        versions = self._versions()
+        cached = self._cached
+        if cached is not None and cached[0] == versions:
+            FEATURE_CACHE.inc(outcome="hit")
+            return cached[1]
+        with self._lock:
+            if self._cached is not None and self._cached[0] == versions:
+                FEATURE_CACHE.inc(outcome="hit")
+                return self._cached[1]
+            FEATURE_CACHE.inc(outcome="miss")
+            features = self._compute([series_id for series_id, _ in versions])
+            self._cached = (versions, features)
+            return features
+
+    def _compute(self, series_ids: list) -> dict:
+        if not series_ids:
+            return {"error": "No macro data stored yet; the macro job has not run on this host."}
+        series = {}
+        for series_id in series_ids:
+            dates, values = self.store.query(series_id)
+            features = series_features(dates, values, pct=series_id not in LEVEL_SERIES)
+            if features:
+                features["name"] = LEVEL_SERIES.get(series_id) or GROWTH_SERIES.get(series_id, series_id)
+                series[series_id] = features
+        slope = None
+        if "DGS10" in series and "FEDFUNDS" in series:
+            slope = _round(series["DGS10"]["value"] - series["FEDFUNDS"]["value"])
+        return {
+            "as_of": max(f["date"] for f in series.values()) if series else None,
+            "regime": classify_regime(series),
+            "yield_curve": {"10y_2y": (series.get("T10Y2Y") or {}).get("value"), "10y_minus_fed_funds": slope},
+            "credit_spread_percentile": (series.get("BAMLC0A0CM") or {}).get("percentile"),
+            "series": series,
+        }
+
+
+macro_features = MacroFeatures()
@@ -0,0 +1,235 @@
+import fcntl
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+from typing import Callable, NamedTuple, Optional
+
+import numpy as np
+
+from .column_store_util import DATE, VALUE, MappedTable, directory_nbytes
+from .config_util import data_path
+from .trace_util import registry, traced_fetch
+
+# Downloaded on a ticker's first use; longer periods (e.g. "max") extend it on demand
+OHLCV_HISTORY = os.environ.get("STOCK_AGENT_OHLCV_HISTORY", "10y")
+# How long stored bars are served before asking the provider for newer ones
+OHLCV_REFRESH_SECONDS = float(os.environ.get("STOCK_AGENT_OHLCV_REFRESH_SECONDS", "3600"))
+# Bars re-requested before the last stored one on each update. If they no longer match,
+# a split or dividend re-based the adjusted history and the ticker is downloaded again.
+OVERLAP_BARS = 5
+MATCH_TOLERANCE = 1e-4
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+FRAME_COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+_PERIOD = re.compile(r"^(\d+)(d|wk|mo|y)$")
+
+OHLCV_FETCHES = registry.counter("stock_agent_ohlcv_fetches_total", "OHLCV downloads by kind.", ("kind",))
+
+
+class Bars(NamedTuple):
+    """Daily bars as read-only, zero-copy slices of the stored columns."""
+    dates: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def frame(self):
+        """The bars as a DataFrame shaped like yfinance's history() (Open ... Volume, indexed by Date)."""
+        import pandas as pd
+        index = pd.DatetimeIndex(self.dates, name="Date")
+        return pd.DataFrame({FRAME_COLUMNS[c]: getattr(self, c) for c in COLUMNS}, index=index)
+
+
+def period_start(period: str, today: Optional[date] = None) -> Optional[np.datetime64]:
+    """First date covered by a yfinance-style period ("1mo", "1y", "ytd", "max"); None for "max"."""
+    return _period_start(period, today or date.today())
+
+
+@lru_cache(maxsize=256)
+def _period_start(period: str, today: date) -> Optional[np.datetime64]:
+    import pandas as pd
+    today = pd.Timestamp(today)
+    if period == "max":
+        return None
+    if period == "ytd":
+        return np.datetime64(f"{today.year}-01-01", "D")
+    match = _PERIOD.match(period)
+    if not match:
+        raise ValueError(f"Invalid period '{period}' (e.g. 5d, 1mo, 6mo, 1y, 10y, ytd, max)")
+    n, unit = int(match.group(1)), match.group(2)
+    offset = {"d": pd.DateOffset(days=n), "wk": pd.DateOffset(weeks=n),
+              "mo": pd.DateOffset(months=n), "y": pd.DateOffset(years=n)}[unit]
+    return np.datetime64((today - offset).date(), "D")
+
+
+def _columns(history) -> tuple[np.ndarray, dict]:
+    """yfinance history DataFrame -> (dates, {column: float64 array}), one bar per exchange date."""
+    if history is None or history.empty:
+        return np.empty(0, DATE), {c: np.empty(0, VALUE) for c in COLUMNS}
+    history = history.dropna(subset=["Close"])
+    index = history.index
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)  # the exchange's local date, not the UTC one
+    dates = np.asarray(index, dtype=DATE)
+    keep = np.append(dates[1:] != dates[:-1], True)  # last bar of a date wins
+    return dates[keep], {c: history[FRAME_COLUMNS[c]].to_numpy(dtype=VALUE)[keep] for c in COLUMNS}
+
+
+class _Ticker(MappedTable):
+    """On-disk layout of one ticker: dates.bin (datetime64[D]), one float64 file per column, meta.json."""
+
+    def __init__(self, directory: str):
+        super().__init__(directory, COLUMNS, {"covers_from": None, "checked_at": 0.0, "updated_at": None, "rebuilds": 0})
+        self.lock_path = os.path.join(directory, ".lock")
+
+
+class OHLCVStore:
+    """
+    Local columnar store of daily OHLCV bars per ticker.
+
+    A ticker's history is downloaded once; afterwards only bars newer than the last stored
+    one are fetched (at most every OHLCV_REFRESH_SECONDS), with the latest stored bar patched
+    in place since it may have been an intraday snapshot. Any period is a binary search over
+    the mapped dates and comes back as zero-copy slices, so "1mo" and "1y" share one download.
+    Several workers may read and update the same root; updates take a per-ticker file lock.
+    """
+
+    def __init__(self, root: Optional[str] = None, download: Optional[Callable] = None):
+        self.root = root or os.path.dirname(data_path("timeseries", "ohlcv", ".keep"))
+        os.makedirs(self.root, exist_ok=True)
+        self._download = download or _download_history
+        self._tickers: dict[str, _Ticker] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, ticker: str) -> _Ticker:
+        stored = self._tickers.get(ticker)
+        if stored is None:
+            with self._lock:
+                stored = self._tickers.get(ticker)
+                if stored is None:
+                    directory = os.path.join(self.root, ticker)
+                    os.makedirs(directory, exist_ok=True)
+                    stored = self._tickers[ticker] = _Ticker(directory)
+                    self._locks[ticker] = threading.Lock()
+        return stored
+
+    @contextmanager
+    def _writing(self, ticker: str):
+        stored = self._get(ticker)
+        with self._locks[ticker]:
+            fd = os.open(stored.lock_path, os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                stored.refresh()  # another worker may have updated while we waited
+                yield stored
+            finally:
+                os.close(fd)
+
+    def tickers(self) -> list[str]:
+        return sorted(name for name in os.listdir(self.root) if os.path.isfile(os.path.join(self.root, name, "meta.json")))
+
+    def bars(self, ticker: str, period: str = "1y", refresh: bool = True) -> Bars:
+        """Bars covering `period`, fetching only what the store does not have yet."""
+        ticker = ticker.upper()
+        start = period_start(period)
+        stored = self._get(ticker)
+        stored.refresh()
+        if refresh and self._stale(stored, start):
+            with self._writing(ticker) as stored:
+                if self._stale(stored, start):
+                    self._sync(ticker, stored, start, period)
+        dates, columns = stored.arrays()
+        if period.endswith("d") and period != "ytd":
+            lo = max(0, len(dates) - int(period[:-1]))  # "5d" is the last five trading days
+        else:
+            lo = 0 if start is None else int(np.searchsorted(dates, start, side="left"))
+        return Bars(dates[lo:], *(columns[c][lo:] for c in COLUMNS))
+
+    def frame(self, ticker: str, period: str = "1y"):
+        return self.bars(ticker, period).frame()
+
+    @staticmethod
+    def _covers(stored: _Ticker, start: Optional[np.datetime64]) -> bool:
+        covers_from = stored.meta["covers_from"]
+        if covers_from is None:
+            return False
+        if covers_from == "max":
+            return True
+        return start is not None and np.datetime64(covers_from, "D") <= start
+
+    def _stale(self, stored: _Ticker, start: Optional[np.datetime64]) -> bool:
+        return (not self._covers(stored, start)
+                or time.time() - stored.meta["checked_at"] > OHLCV_REFRESH_SECONDS)
+
+    def _sync(self, ticker: str, stored: _Ticker, start: Optional[np.datetime64], period: str):
+        if stored.rows == 0 or not self._covers(stored, start):
+            history_start = period_start(OHLCV_HISTORY)
+            wide = period if start is None or (history_start is not None and start < history_start) else OHLCV_HISTORY
+            self._rebuild(ticker, stored, wide)
+            return
+        dates, _ = stored.arrays()
+        since = str(dates[max(0, len(dates) - OVERLAP_BARS)])
+        OHLCV_FETCHES.inc(kind="incremental")
+        new_dates, new_columns = _columns(self._download(ticker, start=since))
+        if not self._append(stored, new_dates, new_columns):
+            self._rebuild(ticker, stored, stored.meta["period"])
+
+    def _rebuild(self, ticker: str, stored: _Ticker, period: str):
+        OHLCV_FETCHES.inc(kind="full")
+        dates, columns = _columns(self._download(ticker, period=period))
+        start = period_start(period)
+        # A new generation of files, switched to by the meta: never new dates over pre-split closes
+        stored.replace(dates, columns, period=period, covers_from="max" if start is None else str(start),
+                       checked_at=time.time(), updated_at=time.time(), rebuilds=stored.meta.get("rebuilds", 0) + 1)
+
+    def _append(self, stored: _Ticker, dates: np.ndarray, columns: dict) -> bool:
+        """Merge an incremental download; False if the overlap no longer matches (history re-based)."""
+        stored_dates, stored_columns = stored.arrays()
+        last = stored_dates[-1]
+        old = dates <= last
+        index = np.searchsorted(stored_dates, dates[old])
+        if (index >= len(stored_dates)).any() or (stored_dates[np.minimum(index, len(stored_dates) - 1)] != dates[old]).any():
+            return False
+        settled = index < len(stored_dates) - 1  # every overlapping bar but the latest must be unchanged
+        before, after = stored_columns["close"][index[settled]], columns["close"][old][settled]
+        if not np.allclose(before, after, rtol=MATCH_TOLERANCE, atol=0):
+            return False
+        if len(index) and index[-1] == len(stored_dates) - 1:
+            for c in COLUMNS:  # the latest stored bar may have been taken during the session
+                stored.patch(c, -1, columns[c][old][-1])
+        new = ~old
+        if new.any():
+            stored.append(dates[new], {c: columns[c][new] for c in COLUMNS})
+        stored.meta["checked_at"] = stored.meta["updated_at"] = time.time()
+        stored.write_meta()
+        return True
+
+    def nbytes(self) -> int:
+        """Bytes on disk across all tickers."""
+        return directory_nbytes(self.root)
+
+
+@traced_fetch("yfinance")
+def _download_history(ticker: str, period: Optional[str] = None, start: Optional[str] = None):
+    import yfinance as yf
+    from .tool_util import provider_timeout
+    if start is not None:
+        return yf.Ticker(ticker).history(start=start, auto_adjust=True, timeout=provider_timeout())
+    return yf.Ticker(ticker).history(period=period, auto_adjust=True, timeout=provider_timeout())
+
+
+_store: Optional[OHLCVStore] = None
+
+
+def get_ohlcv_store() -> OHLCVStore:
+    global _store
+    if _store is None:
+        _store = OHLCVStore()
+    return _store
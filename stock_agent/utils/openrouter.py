@@ -1,12 +1,13 @@
 import os
 from typing import Optional
 
-from dotenv import load_dotenv
 from langchain_core.utils.utils import secret_from_env
 from langchain_openai import ChatOpenAI
 from pydantic import Field, SecretStr
 
-load_dotenv()
+from .config_util import load_config
+
+load_config()
 
 class ChatOpenRouter(ChatOpenAI):
     openai_api_key: Optional[SecretStr] = Field(
@@ -23,8 +24,8 @@ class ChatOpenRouter(ChatOpenAI):
         openai_api_key = (
             openai_api_key or os.environ.get("OPENROUTER_API_KEY")
         )
+        kwargs.setdefault("base_url", os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"))
         super().__init__(
-            base_url="https://openrouter.ai/api/v1",
             openai_api_key=openai_api_key,
             **kwargs
         )
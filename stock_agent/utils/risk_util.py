@@ -0,0 +1,256 @@
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import NormalDist
+from typing import Callable, Optional
+
+import numpy as np
+
+from .trace_util import registry
+
+TRADING_DAYS = 252
+RISK_BENCHMARK = os.environ.get("STOCK_AGENT_RISK_BENCHMARK", "SPY")
+RISK_PERIOD = os.environ.get("STOCK_AGENT_RISK_PERIOD", "1y")
+VOL_WINDOW = 21  # one trading month
+CONFIDENCE_LEVELS = (0.95, 0.99)
+FETCH_CONCURRENCY = 8
+
+RISK_SECONDS = registry.histogram("stock_agent_risk_seconds", "Risk engine time by phase.", ("phase",))
+
+
+class RiskError(ValueError):
+    """Not enough overlapping price history to compute the requested risk numbers."""
+
+
+# --- Return matrices -----------------------------------------------------------------------
+# All functions below take a T x N matrix of simple daily returns (rows are aligned dates,
+# columns are tickers) and work on every column at once.
+
+def _trading_days(series) -> tuple[np.ndarray, np.ndarray]:
+    index = series.index
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)  # the exchange's local date, not the UTC one
+    return np.asarray(index, dtype="datetime64[D]"), np.asarray(series, dtype=float)
+
+
+def align_returns(closes: dict) -> tuple[list[str], np.ndarray, np.ndarray]:
+    """
+    Daily closes per ticker (pandas Series indexed by date) -> (tickers, dates, T x N returns).
+    Dates are the union of every ticker's trading days from the latest first day on; a day a
+    ticker has no close carries its previous close forward (a zero return), so one sparse
+    history does not shrink the window for the whole watchlist.
+    """
+    tickers = list(closes)
+    columns = [_trading_days(closes[t]) for t in tickers]
+    dates = np.unique(np.concatenate([d for d, _ in columns]))
+    prices = np.full((len(dates), len(tickers)), np.nan)
+    for j, (d, v) in enumerate(columns):
+        prices[np.searchsorted(dates, d), j] = v
+    valid = ~np.isnan(prices)
+    if not valid.any(axis=0).all():
+        raise RiskError(f"No closes for {[t for t, ok in zip(tickers, valid.any(axis=0)) if not ok]}")
+    # Forward fill: the row index of the last valid close at or before each row
+    last = np.maximum.accumulate(np.where(valid, np.arange(len(dates))[:, None], 0), axis=0)
+    prices = prices[last, np.arange(len(tickers))]
+    start = int(valid.argmax(axis=0).max())
+    prices, dates = prices[start:], dates[start:]
+    if len(prices) < 3:
+        raise RiskError(f"Only {len(prices)} overlapping trading days for {sorted(closes)}")
+    return tickers, dates[1:], prices[1:] / prices[:-1] - 1.0
+
+
+def covariance(returns: np.ndarray) -> np.ndarray:
+    demeaned = returns - returns.mean(axis=0)
+    return demeaned.T @ demeaned / (len(returns) - 1)
+
+
+def correlation(returns: np.ndarray) -> np.ndarray:
+    cov = covariance(returns)
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / np.outer(std, std)
+    np.fill_diagonal(corr, 1.0)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def betas(returns: np.ndarray, market: np.ndarray) -> np.ndarray:
+    """Beta of every column against the market return vector."""
+    m = market - market.mean()
+    return (returns - returns.mean(axis=0)).T @ m / (m @ m)
+
+
+def volatility(returns: np.ndarray) -> np.ndarray:
+    """Annualized volatility of every column."""
+    return returns.std(axis=0, ddof=1) * math.sqrt(TRADING_DAYS)
+
+
+def rolling_volatility(returns: np.ndarray, window: int = VOL_WINDOW) -> np.ndarray:
+    """
+    Annualized volatility over each trailing `window` of days, (T - window + 1) x N. Uses running
+    sums of r and r^2, so the cost does not grow with the window.
+    """
+    if len(returns) < window:
+        raise RiskError(f"Need {window} returns for a rolling volatility, have {len(returns)}")
+    zero = np.zeros((1, returns.shape[1]))
+    # Demeaned first: the running-sum variance loses precision when the mean dominates
+    centered = returns - returns.mean(axis=0)
+    s1 = np.concatenate([zero, np.cumsum(centered, axis=0)])
+    s2 = np.concatenate([zero, np.cumsum(centered * centered, axis=0)])
+    total, squares = s1[window:] - s1[:-window], s2[window:] - s2[:-window]
+    variance = np.maximum(squares - total * total / window, 0.0) / (window - 1)
+    return np.sqrt(variance * TRADING_DAYS)
+
+
+def historical_var(returns: np.ndarray, confidence: float = 0.95) -> tuple[np.ndarray, np.ndarray]:
+    """One-day historical VaR and expected shortfall of every column, as positive loss fractions."""
+    cutoff = np.quantile(returns, 1 - confidence, axis=0)
+    tail = np.where(returns <= cutoff, returns, np.nan)
+    return -cutoff, -np.nanmean(tail, axis=0)
+
+
+def parametric_var(returns: np.ndarray, confidence: float = 0.95) -> np.ndarray:
+    """One-day variance-covariance (normal) VaR of every column, as positive loss fractions."""
+    z = NormalDist().inv_cdf(confidence)
+    return z * returns.std(axis=0, ddof=1) - returns.mean(axis=0)
+
+
+def _round(value, digits: int = 4):
+    value = float(value)
+    return round(value, digits) if math.isfinite(value) else None
+
+
+def _var_report(returns: np.ndarray) -> dict:
+    report = {}
+    for confidence in CONFIDENCE_LEVELS:
+        hist, shortfall = historical_var(returns, confidence)
+        label = f"{int(confidence * 100)}"
+        report[f"var_{label}_historical"] = _round(hist[0])
+        report[f"cvar_{label}_historical"] = _round(shortfall[0])
+        report[f"var_{label}_parametric"] = _round(parametric_var(returns, confidence)[0])
+    return report
+
+
+class RiskEngine:
+    """
+    Beta, volatility, correlation and VaR from daily closes. Prices come from the local OHLCV
+    store the stock price tools use, so repeated questions about a ticker cost no fetches.
+    """
+
+    def __init__(self, fetch_closes: Callable[[str, str], object]):
+        self._fetch_closes = fetch_closes
+
+    def closes(self, tickers: list[str], period: str = RISK_PERIOD) -> tuple[dict, list[str]]:
+        """Fetch closes concurrently; returns ({ticker: closes}, tickers without data)."""
+        started = time.perf_counter()
+        found, missing = {}, []
+
+        def fetch(ticker):
+            try:
+                series = self._fetch_closes(ticker, period)
+            except Exception as e:
+                print(f"ERROR: Risk engine could not fetch prices for {ticker}: {e}")
+                series = None
+            if series is None or len(series) == 0:
+                missing.append(ticker)
+            else:
+                found[ticker] = series
+
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        with ThreadPoolExecutor(max_workers=min(FETCH_CONCURRENCY, len(tickers)), thread_name_prefix="risk") as pool:
+            list(pool.map(fetch, tickers))
+        RISK_SECONDS.observe(time.perf_counter() - started, phase="fetch")
+        return found, missing
+
+    def profile(self, ticker: str, benchmark: str = RISK_BENCHMARK, period: str = RISK_PERIOD) -> dict:
+        """Single-stock risk: beta and correlation vs the benchmark, volatility, rolling volatility, VaR."""
+        ticker, benchmark = ticker.upper(), benchmark.upper()
+        closes, missing = self.closes([ticker, benchmark], period)
+        if missing:
+            raise RiskError(f"No price history for {', '.join(missing)}")
+        started = time.perf_counter()
+        tickers, dates, returns = align_returns(closes)
+        stock, market = returns[:, tickers.index(ticker)], returns[:, tickers.index(benchmark)]
+        beta = float(betas(stock[:, None], market)[0])
+        alpha = (stock.mean() - beta * market.mean()) * TRADING_DAYS
+        rolling = rolling_volatility(stock[:, None])[:, 0] if len(stock) >= VOL_WINDOW else np.array([np.nan])
+        result = {
+            "ticker": ticker,
+            "benchmark": benchmark,
+            "period": period,
+            "start": str(dates[0])[:10],
+            "end": str(dates[-1])[:10],
+            "observations": len(stock),
+            "beta": _round(beta),
+            "alpha_annualized": _round(alpha),
+            "correlation_with_benchmark": _round(np.corrcoef(stock, market)[0, 1]),
+            "volatility_annualized": _round(volatility(stock[:, None])[0]),
+            "benchmark_volatility_annualized": _round(volatility(market[:, None])[0]),
+            f"rolling_volatility_{VOL_WINDOW}d": {
+                "latest": _round(rolling[-1]), "min": _round(np.nanmin(rolling)), "max": _round(np.nanmax(rolling)),
+            },
+            **_var_report(stock[:, None]),
+        }
+        RISK_SECONDS.observe(time.perf_counter() - started, phase="compute")
+        return result
+
+    def portfolio(self, tickers: list[str], weights: Optional[list[float]] = None,
+                  benchmark: str = RISK_BENCHMARK, period: str = RISK_PERIOD) -> dict:
+        """Watchlist / portfolio risk: correlation and covariance matrices, per-ticker beta and volatility, portfolio VaR."""
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        if weights is not None and len(weights) != len(tickers):
+            raise RiskError(f"Got {len(weights)} weights for {len(tickers)} tickers")
+        benchmark = benchmark.upper()
+        closes, missing = self.closes(tickers + ([benchmark] if benchmark not in tickers else []), period)
+        if benchmark in missing:
+            raise RiskError(f"No price history for benchmark {benchmark}")
+        held = [t for t in tickers if t in closes]
+        if not held:
+            raise RiskError(f"No price history for {', '.join(tickers)}")
+        started = time.perf_counter()
+        columns, dates, returns = align_returns(closes)
+        index = [columns.index(t) for t in held]
+        matrix, market = returns[:, index], returns[:, columns.index(benchmark)]
+        if weights is None:
+            w = np.full(len(held), 1.0 / len(held))
+        else:
+            w = np.array([weights[tickers.index(t)] for t in held], dtype=float)
+            total = w.sum()
+            if not np.isfinite(w).all() or not math.isfinite(total) or abs(total) < 1e-12:
+                # Weights are normalized to sum to 1; a fully hedged (zero net) book has no such scaling
+                raise RiskError(f"Weights must be finite with a non-zero sum, got sum {total:g}")
+            w = w / total
+        cov = covariance(matrix)
+        book = matrix @ w
+        result = {
+            "tickers": held,
+            "weights": [_round(x) for x in w],
+            "benchmark": benchmark,
+            "period": period,
+            "start": str(dates[0])[:10],
+            "end": str(dates[-1])[:10],
+            "observations": len(matrix),
+            "beta": dict(zip(held, (_round(x) for x in betas(matrix, market)))),
+            "volatility_annualized": dict(zip(held, (_round(x) for x in volatility(matrix)))),
+            "correlation": {t: dict(zip(held, (_round(x, 3) for x in row))) for t, row in zip(held, correlation(matrix))},
+            "covariance_annualized": {t: dict(zip(held, (_round(x * TRADING_DAYS, 6) for x in row))) for t, row in zip(held, cov)},
+            "portfolio": {
+                "beta": _round(betas(book[:, None], market)[0]),
+                "volatility_annualized": _round(math.sqrt(w @ cov @ w * TRADING_DAYS)),
+                **_var_report(book[:, None]),
+            },
+        }
+        if missing:
+            result["unavailable"] = [t for t in missing if t != benchmark]
+        RISK_SECONDS.observe(time.perf_counter() - started, phase="compute")
+        return result
+
+
+def _fetch_closes(ticker: str, period: str):
+    import pandas as pd
+    from .ohlcv_util import get_ohlcv_store
+    bars = get_ohlcv_store().bars(ticker, period)
+    return pd.Series(bars.close, index=pd.DatetimeIndex(bars.dates), copy=False)
+
+
+risk_engine = RiskEngine(_fetch_closes)
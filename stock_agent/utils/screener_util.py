@@ -0,0 +1,303 @@
+import ast
+import math
+import operator
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+
+from .storage_util import DocumentStore, SQLiteDocumentStore
+from .trace_util import registry
+
+METRICS_COLLECTION = "finnhub/basic_financials"
+FETCH_CONCURRENCY = 8
+
+# Short names for the Finnhub `metric` keys people actually screen on; any raw key also works
+# (quote keys that are not identifiers with backticks, e.g. `totalDebt/totalEquityAnnual`)
+ALIASES = {
+    "pe": "peTTM",
+    "pb": "pbAnnual",
+    "ps": "psTTM",
+    "roe": "roeTTM",
+    "roa": "roaTTM",
+    "net_margin": "netProfitMarginTTM",
+    "gross_margin": "grossMarginTTM",
+    "revenue_growth": "revenueGrowthTTMYoy",
+    "eps_growth": "epsGrowthTTMYoy",
+    "current_ratio": "currentRatioAnnual",
+    "debt_to_equity": "totalDebt/totalEquityAnnual",
+    "beta": "beta",
+    "dividend_yield": "dividendYieldIndicatedAnnual",
+    "market_cap": "marketCapitalization",
+    "high_52w": "52WeekHigh",
+    "low_52w": "52WeekLow",
+}
+DEFAULT_COLUMNS = ("pe", "revenue_growth", "roe", "net_margin", "debt_to_equity", "market_cap")
+
+SCREEN_SECONDS = registry.histogram("stock_agent_screener_seconds", "Screener query time.", ("phase",))
+
+
+class ScreenerError(ValueError):
+    """Invalid filter / sort expression or unknown metric."""
+
+
+_COMPARE = {ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+            ast.Eq: operator.eq, ast.NotEq: operator.ne}
+_ARITH = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+
+
+def _parse(expression: str) -> tuple[ast.AST, dict]:
+    # `raw key` -> a placeholder identifier, so keys with "/" or leading digits still parse
+    quoted = {}
+    parts = expression.split("`")
+    if len(parts) % 2 == 0:
+        raise ScreenerError("Unbalanced backtick in expression")
+    for i in range(1, len(parts), 2):
+        quoted[f"__q{i}"] = parts[i]
+        parts[i] = f"__q{i}"
+    try:
+        tree = ast.parse("".join(parts), mode="eval").body
+    except SyntaxError as e:
+        raise ScreenerError(f"Cannot parse expression {expression!r}: {e.msg}") from None
+    return tree, quoted
+
+
+def compile_expression(expression: str) -> tuple[Callable[[Callable[[str], np.ndarray]], np.ndarray], set]:
+    """
+    Compile a filter or rank expression over metric columns into a function of a column
+    lookup, plus the set of metric keys it reads. Only comparisons, and/or/not, + - * /,
+    unary minus, numbers and metric names are allowed.
+    """
+    tree, quoted = _parse(expression)
+    used = set()
+
+    def build(node):
+        if isinstance(node, ast.BoolOp):
+            parts = [build(v) for v in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            def boolop(col):
+                result = parts[0](col)
+                for part in parts[1:]:
+                    result = combine(result, part(col))
+                return result
+            return boolop
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+            inner = build(node.operand)
+            return (lambda col: np.logical_not(inner(col))) if isinstance(node.op, ast.Not) else (lambda col: -inner(col))
+        if isinstance(node, ast.Compare):
+            operands = [build(node.left)] + [build(c) for c in node.comparators]
+            ops = []
+            for op in node.ops:
+                if type(op) not in _COMPARE:
+                    raise ScreenerError(f"Unsupported comparison {type(op).__name__}")
+                ops.append(_COMPARE[type(op)])
+            def compare(col):  # chained: a < b < c
+                values = [o(col) for o in operands]
+                result = ops[0](values[0], values[1])
+                for i, op in enumerate(ops[1:], start=1):
+                    result = result & op(values[i], values[i + 1])
+                return result
+            return compare
+        if isinstance(node, ast.BinOp) and type(node.op) in _ARITH:
+            left, right, op = build(node.left), build(node.right), _ARITH[type(node.op)]
+            return lambda col: op(left(col), right(col))
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            try:
+                value = np.float64(node.value)  # numpy scalars: 1/0 is inf under errstate, not ZeroDivisionError
+            except OverflowError:
+                raise ScreenerError(f"Number out of range: {node.value}") from None
+            return lambda col: value
+        if isinstance(node, ast.Name):
+            key = quoted.get(node.id) or ALIASES.get(node.id, node.id)
+            used.add(key)
+            return lambda col: col(key)
+        raise ScreenerError(f"Unsupported syntax in expression: {ast.dump(node)[:60]}")
+
+    return build(tree), used
+
+
+class MetricsMatrix:
+    """Tickers x metrics float64 matrix (NaN where a metric is missing) from numeric-only metric dicts."""
+
+    def __init__(self, metrics_by_ticker: dict[str, dict]):
+        tickers = sorted(metrics_by_ticker)
+        rows = [metrics_by_ticker[t] for t in tickers]
+        keys = sorted(set().union(*rows))
+        self.tickers = np.array(tickers, dtype=object)
+        self.row = {t: i for i, t in enumerate(tickers)}
+        self.column = {k: j for j, k in enumerate(keys)}
+        self.values = np.empty((len(tickers), len(keys)))
+        nan = math.nan
+        for j, key in enumerate(keys):  # column by column: one C-level fill per metric
+            self.values[:, j] = np.fromiter((m.get(key, nan) for m in rows), dtype=float, count=len(rows))
+
+    def with_rows(self, metrics_by_ticker: dict[str, dict]) -> "MetricsMatrix":
+        """A copy with these tickers' rows replaced or appended (new metrics become new columns)."""
+        matrix = MetricsMatrix.__new__(MetricsMatrix)
+        new_tickers = [t for t in metrics_by_ticker if t not in self.row]
+        new_keys = sorted(set().union(*metrics_by_ticker.values()) - self.column.keys())
+        matrix.tickers = np.concatenate([self.tickers, np.array(new_tickers, dtype=object)])
+        matrix.row = {**self.row, **{t: len(self.row) + i for i, t in enumerate(new_tickers)}}
+        matrix.column = {**self.column, **{k: len(self.column) + j for j, k in enumerate(new_keys)}}
+        matrix.values = np.full((len(matrix.row), len(matrix.column)), np.nan)
+        matrix.values[:self.values.shape[0], :self.values.shape[1]] = self.values
+        for ticker, metrics in metrics_by_ticker.items():
+            i = matrix.row[ticker]
+            matrix.values[i] = np.nan
+            for key, value in metrics.items():
+                matrix.values[i, matrix.column[key]] = value
+        return matrix
+
+    def col(self, key: str) -> np.ndarray:
+        j = self.column.get(key)
+        if j is None:
+            raise ScreenerError(f"Unknown metric {key!r}")
+        return self.values[:, j]
+
+
+class Screener:
+    """
+    Cross-sectional screens over Finnhub basic financials. Metrics are recorded (write-through)
+    whenever a ticker's basic financials are fetched, persisted in the local document store,
+    and screened as one columnar matrix that is built once and patched as new metrics arrive.
+    """
+
+    def __init__(self, store: Optional[DocumentStore] = None, fetch: Optional[Callable[[str], dict]] = None):
+        self._store = store
+        self._fetch = fetch
+        self._metrics: Optional[dict[str, dict]] = None
+        self._matrix: Optional[MetricsMatrix] = None
+        self._dirty: set[str] = set()  # recorded since the matrix was built
+        self._lock = threading.Lock()
+
+    @property
+    def store(self) -> DocumentStore:
+        if self._store is None:
+            self._store = SQLiteDocumentStore()
+        return self._store
+
+    def _loaded(self) -> dict[str, dict]:
+        if self._metrics is None:
+            with self._lock:
+                if self._metrics is None:
+                    self._metrics = {ticker: doc.get("metric") or {} for ticker, doc in self.store.items(METRICS_COLLECTION)}
+        return self._metrics
+
+    def record(self, ticker: str, metric: Optional[dict]):
+        """Keep a freshly fetched `metric` dict (called from the basic-financials fetch path)."""
+        if not metric:
+            return
+        ticker = ticker.upper()
+        clean = {k: v for k, v in metric.items() if isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v)}
+        self.store.upsert(METRICS_COLLECTION, ticker, {"metric": clean, "fetched_at": time.time()}, merge=False)
+        metrics = self._loaded()
+        with self._lock:
+            metrics[ticker] = clean
+            self._dirty.add(ticker)
+
+    def ensure(self, tickers: list[str], concurrency: int = FETCH_CONCURRENCY) -> list[str]:
+        """Fetch basic financials for tickers not seen yet; returns the tickers that failed."""
+        missing = [t for t in {t.upper() for t in tickers} if t not in self._loaded()]
+        if not missing or self._fetch is None:
+            return missing
+        failed = []
+
+        def fetch(ticker):
+            try:
+                result = self._fetch(ticker) or {}
+                if ticker not in self._loaded():  # a provider-cache hit skips the write-through
+                    self.record(ticker, result.get("metric"))
+            except Exception as e:
+                print(f"ERROR: Screener could not fetch {ticker}: {e}")
+                failed.append(ticker)
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="screener") as pool:
+            list(pool.map(fetch, missing))
+        return failed
+
+    def matrix(self) -> MetricsMatrix:
+        matrix = self._matrix
+        if matrix is None or self._dirty:
+            metrics = self._loaded()
+            with self._lock:
+                started = time.perf_counter()
+                if self._matrix is None:
+                    self._matrix = MetricsMatrix(dict(metrics))
+                elif self._dirty:
+                    # A few fetched tickers: patch a copy, readers keep the old matrix meanwhile
+                    self._matrix = self._matrix.with_rows({t: metrics[t] for t in self._dirty})
+                self._dirty.clear()
+                SCREEN_SECONDS.observe(time.perf_counter() - started, phase="build")
+                matrix = self._matrix
+        return matrix
+
+    def screen(self, filter: str = "", sort_by: str = "", ascending: bool = False, limit: int = 20,
+               tickers: Optional[list[str]] = None, columns: Optional[list[str]] = None) -> dict:
+        """
+        Tickers passing `filter` (e.g. "pe < 20 and revenue_growth > 10"), ranked by the
+        `sort_by` expression (e.g. "roe"), restricted to `tickers` when given.
+        Tickers missing any metric the filter reads are filtered out; missing sort values sort last.
+        """
+        if limit < 0:
+            raise ScreenerError("limit must be 0 (no limit) or positive")
+        started = time.perf_counter()
+        matrix = self.matrix()
+        n = len(matrix.tickers)
+        if n == 0:  # nothing fetched yet: no metric is known, but no ticker can match either
+            return {"universe": 0, "matched": 0, "results": [], "query_ms": round((time.perf_counter() - started) * 1000, 3)}
+        mask = np.ones(n, dtype=bool)
+        used = set()
+        if tickers:
+            mask[:] = False
+            rows = [matrix.row[t.upper()] for t in tickers if t.upper() in matrix.row]
+            mask[rows] = True
+        if filter.strip():
+            predicate, used = compile_expression(filter)
+            with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+                result = predicate(matrix.col)
+            if np.ndim(result) == 0:
+                raise ScreenerError("Filter must compare at least one metric")
+            mask &= np.asarray(result, dtype=bool)
+            # NaN fails < and > but passes != and `not`; missing data must never match
+            for key in used:
+                mask &= ~np.isnan(matrix.col(key))
+        candidates = np.flatnonzero(mask)
+
+        sort_key = None
+        if sort_by.strip():
+            rank, sort_used = compile_expression(sort_by)
+            used |= sort_used
+            with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+                sort_key = np.broadcast_to(np.asarray(rank(matrix.col), dtype=float), (n,))[candidates]
+            key = sort_key if ascending else -sort_key
+            key = np.where(np.isnan(key), np.inf, key)  # missing values rank last
+            if limit and limit < len(candidates):
+                top = np.argpartition(key, limit - 1)[:limit]
+                order = top[np.argsort(key[top], kind="stable")]
+            else:
+                order = np.argsort(key, kind="stable")
+            selected = candidates[order]
+        else:
+            selected = candidates[:limit] if limit else candidates
+
+        show = list(dict.fromkeys([ALIASES.get(c, c) for c in (columns or DEFAULT_COLUMNS)] + sorted(used)))
+        show = [c for c in show if c in matrix.column]
+        block = matrix.values[np.ix_(selected, [matrix.column[c] for c in show])]
+        names = {v: k for k, v in ALIASES.items()}
+        results = [
+            {"ticker": matrix.tickers[i], **{names.get(c, c): (None if math.isnan(v) else round(float(v), 4)) for c, v in zip(show, row)}}
+            for i, row in zip(selected, block)
+        ]
+        seconds = time.perf_counter() - started
+        SCREEN_SECONDS.observe(seconds, phase="query")
+        return {"universe": n, "matched": int(mask.sum()), "results": results, "query_ms": round(seconds * 1000, 3)}
+
+
+def _fetch_basic_financials(ticker: str) -> dict:
+    from ..tools.custom_tools import _get_basic_financials, _get_finnhub_client
+    return _get_basic_financials(ticker, _get_finnhub_client())
+
+
+screener = Screener(fetch=_fetch_basic_financials)
@@ -0,0 +1,187 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Iterable, Optional
+
+from .config_util import data_path
+
+# local: SQLite under the data directory, STOCK_AGENT_DATA_DIR (no credentials needed). firestore: Google Cloud Firestore.
+# auto: Firestore when a service-account key is available, local otherwise.
+STORAGE_KIND = os.environ.get("STOCK_AGENT_STORAGE", "auto")
+# Writes per SQLite transaction / Firestore batch (Firestore allows at most 500 per batch)
+BATCH_SIZE = 500
+
+# Top-level merge of `excluded.data` into `data`, inside SQLite: every given field replaces the
+# stored one whole (nested objects included) and null is stored as null, as with Firestore's
+# set(merge=True). json_patch would deep-merge objects and delete null fields instead.
+# json() keeps objects, arrays and booleans JSON-typed through json_each.
+_MERGE_SQL = """(SELECT json_group_object(key, CASE type WHEN 'object' THEN json(value) WHEN 'array' THEN json(value)
+        WHEN 'true' THEN json('true') WHEN 'false' THEN json('false') ELSE value END) FROM (
+    SELECT key, value, type FROM json_each(data) WHERE key NOT IN (SELECT key FROM json_each(excluded.data))
+    UNION ALL SELECT key, value, type FROM json_each(excluded.data)))"""
+
+
+class DocumentStore(ABC):
+    """
+    Documents (JSON-serializable dicts) addressed by a collection path and a key, e.g.
+    ("users/ramus/macro_economics", "2024-06-03"). Writes are upserts: they never read the
+    existing document first. merge=True replaces only the given top-level fields (each
+    one whole; a None value is stored as null) and keeps the others.
+    """
+
+    @abstractmethod
+    def get(self, collection: str, key: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def upsert_many(self, collection: str, documents: dict[str, dict], merge: bool = True) -> int:
+        """Write many documents in batches; returns the number written."""
+
+    def upsert(self, collection: str, key: str, data: dict, merge: bool = True):
+        self.upsert_many(collection, {key: data}, merge=merge)
+
+    @abstractmethod
+    def delete(self, collection: str, key: str):
+        ...
+
+    @abstractmethod
+    def keys(self, collection: str) -> list[str]:
+        ...
+
+    def items(self, collection: str) -> Iterable[tuple[str, dict]]:
+        """(key, document) pairs of a whole collection."""
+        for key in self.keys(collection):
+            data = self.get(collection, key)
+            if data is not None:
+                yield key, data
+
+    def close(self):
+        pass
+
+
+def _chunks(items: list, size: int) -> Iterable[list]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class SQLiteDocumentStore(DocumentStore):
+    """Local backend: one WAL-mode SQLite table; merges are applied inside SQLite (no prior read)."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or data_path("documents.sqlite3")
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    collection TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (collection, key)
+                ) WITHOUT ROWID
+            """)
+
+    def get(self, collection: str, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM documents WHERE collection = ? AND key = ?", (collection, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def upsert_many(self, collection: str, documents: dict[str, dict], merge: bool = True) -> int:
+        update = _MERGE_SQL if merge else "excluded.data"
+        sql = (f"INSERT INTO documents (collection, key, data, updated_at) VALUES (?, ?, ?, ?) "
+               f"ON CONFLICT (collection, key) DO UPDATE SET data = {update}, updated_at = excluded.updated_at")
+        now = time.time()
+        rows = [(collection, key, json.dumps(data, allow_nan=False), now) for key, data in documents.items()]
+        with self._lock:
+            for chunk in _chunks(rows, BATCH_SIZE):
+                self._conn.execute("BEGIN")
+                try:
+                    self._conn.executemany(sql, chunk)
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        return len(rows)
+
+    def delete(self, collection: str, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE collection = ? AND key = ?", (collection, key))
+
+    def keys(self, collection: str) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key FROM documents WHERE collection = ? ORDER BY key", (collection,)).fetchall()
+        return [row[0] for row in rows]
+
+    def items(self, collection: str) -> Iterable[tuple[str, dict]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, data FROM documents WHERE collection = ? ORDER BY key", (collection,)).fetchall()
+        return [(key, json.loads(data)) for key, data in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class FirestoreDocumentStore(DocumentStore):
+    """Firestore backend. The client (and google.cloud itself) is only built on first use."""
+
+    def __init__(self, client_factory: Callable[[], Any]):
+        self._client_factory = client_factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    def get(self, collection: str, key: str) -> Optional[dict]:
+        snapshot = self.client.collection(collection).document(key).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def upsert_many(self, collection: str, documents: dict[str, dict], merge: bool = True) -> int:
+        from google.cloud.firestore_v1.field_path import FieldPath
+        ref = self.client.collection(collection)
+        for chunk in _chunks(list(documents.items()), BATCH_SIZE):
+            batch = self.client.batch()
+            for key, data in chunk:
+                # merge=True would deep-merge nested maps; naming the top-level fields replaces each whole
+                fields = [FieldPath(field) for field in data] if merge and data else merge
+                batch.set(ref.document(key), data, merge=fields)
+            batch.commit()
+        return len(documents)
+
+    def delete(self, collection: str, key: str):
+        self.client.collection(collection).document(key).delete()
+
+    def keys(self, collection: str) -> list[str]:
+        return sorted(doc.id for doc in self.client.collection(collection).list_documents())
+
+    def items(self, collection: str) -> Iterable[tuple[str, dict]]:
+        return [(snapshot.id, snapshot.to_dict()) for snapshot in self.client.collection(collection).stream()]
+
+
+def make_document_store(kind: str = STORAGE_KIND, firestore_key_path: Optional[str] = None) -> DocumentStore:
+    if kind == "auto":
+        kind = "firestore" if firestore_key_path and os.path.exists(firestore_key_path) else "local"
+    if kind == "local":
+        return SQLiteDocumentStore()
+    if kind == "firestore":
+        if not firestore_key_path:
+            raise ValueError("STOCK_AGENT_STORAGE=firestore needs a service-account key path")
+
+        def client():
+            from google.cloud import firestore
+            return firestore.Client.from_service_account_json(str(firestore_key_path))
+        return FirestoreDocumentStore(client)
+    raise ValueError(f"Unknown STOCK_AGENT_STORAGE '{kind}' (expected 'auto', 'local' or 'firestore')")
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from .column_store_util import DATE, VALUE, MappedTable, directory_nbytes
+from .config_util import data_path
+
+# Observations re-requested before a series' last stored date on each update, so that
+# revisions to recent prints (payrolls, GDP, CPI) are picked up without a full re-download
+REVISION_OBSERVATIONS = int(os.environ.get("STOCK_AGENT_TS_REVISION_OBSERVATIONS", "3"))
+
+
+def to_dates(dates) -> np.ndarray:
+    """ISO date strings (or anything numpy accepts) -> datetime64[D] array."""
+    return np.asarray(dates, dtype=DATE)
+
+
+class _Series(MappedTable):
+    """On-disk layout of one series: dates.bin (datetime64[D]), values.bin (float64), meta.json."""
+
+    def __init__(self, directory: str):
+        super().__init__(directory, ("values",), {"last_date": None, "revisions": 0, "updated_at": None})
+
+    def series(self) -> tuple[np.ndarray, np.ndarray]:
+        dates, columns = self.arrays()
+        return dates, columns["values"]
+
+
+class TimeSeriesStore:
+    """
+    Local columnar store for daily/monthly/quarterly series (FRED macro data).
+
+    Each series is a pair of memory-mapped arrays sorted by date. New observations are
+    appended; revised values of dates already stored are patched in place, visible at once
+    to readers holding earlier slices (see MappedTable).
+    Range queries are a binary search over the mapped dates and return zero-copy slices.
+    A single writer (the macro job) is assumed; readers may run in any thread or process.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.path.dirname(data_path("timeseries", "macro", ".keep"))
+        os.makedirs(self.root, exist_ok=True)
+        self._series: dict[str, _Series] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, series_id: str) -> _Series:
+        series = self._series.get(series_id)
+        if series is None:
+            with self._lock:
+                series = self._series.get(series_id)
+                if series is None:
+                    directory = os.path.join(self.root, series_id)
+                    os.makedirs(directory, exist_ok=True)
+                    series = self._series[series_id] = _Series(directory)
+        return series
+
+    def series_ids(self) -> list[str]:
+        return sorted(name for name in os.listdir(self.root) if os.path.isfile(os.path.join(self.root, name, "meta.json")))
+
+    def _fresh(self, series_id: str) -> _Series:
+        series = self._get(series_id)
+        series.refresh()
+        return series
+
+    def last_date(self, series_id: str) -> Optional[str]:
+        return self._fresh(series_id).meta["last_date"]
+
+    def fetch_start(self, series_id: str) -> Optional[str]:
+        """observation_start for an incremental update: a few observations before the last one, None if empty."""
+        dates, _ = self._fresh(series_id).series()
+        if len(dates) == 0:
+            return None
+        return str(dates[max(0, len(dates) - REVISION_OBSERVATIONS)])
+
+    def version(self, series_id: str) -> tuple:
+        """Changes whenever the series gains or revises observations (cache key for derived data)."""
+        meta = self._fresh(series_id).meta
+        return meta["rows"], meta["revisions"], meta["updated_at"]
+
+    def query(self, series_id: str, start: Optional[str] = None, end: Optional[str] = None) -> tuple[np.ndarray, np.ndarray]:
+        """(dates, values) with start <= date <= end; NaN marks a missing observation."""
+        dates, values = self._fresh(series_id).series()
+        lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(start, "D"), side="left"))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(end, "D"), side="right"))
+        return dates[lo:hi], values[lo:hi]
+
+    def upsert(self, series_id: str, dates, values) -> dict:
+        """
+        Merge fetched observations: dates after the last stored one are appended, stored
+        dates whose value changed are revised in place. Returns {"appended", "revised"}.
+        """
+        dates = to_dates(dates)
+        values = np.asarray(values, dtype=VALUE)
+        order = np.argsort(dates, kind="stable")
+        dates, values = dates[order], values[order]
+        series = self._fresh(series_id)
+        with self._lock:
+            stored_dates, stored_values = series.series()
+            last = stored_dates[-1] if len(stored_dates) else None
+            new = np.ones(len(dates), bool) if last is None else dates > last
+            revised = 0
+            if not new.all():
+                old_dates, old_values = dates[~new], values[~new]
+                index = np.searchsorted(stored_dates, old_dates)
+                found = index < len(stored_dates)
+                found[found] = stored_dates[index[found]] == old_dates[found]
+                if not found.all():
+                    # A date inside the stored range that was never seen (rare: a backfilled print)
+                    return self._rewrite(series, dates, values)
+                changed = _changed(stored_values[index], old_values)
+                if changed.any():
+                    revised = int(changed.sum())
+                    series.patch("values", index[changed], old_values[changed])
+            appended = int(new.sum())
+            if appended:
+                series.append(dates[new], {"values": values[new]})
+            if appended or revised:
+                series.meta["revisions"] += revised
+                series.meta["last_date"] = str(dates[-1]) if appended else series.meta["last_date"]
+                series.meta["updated_at"] = time.time()
+                series.write_meta()
+        return {"appended": appended, "revised": revised}
+
+    def _rewrite(self, series: _Series, dates: np.ndarray, values: np.ndarray) -> dict:
+        stored_dates, stored_values = series.series()
+        index = np.minimum(np.searchsorted(stored_dates, dates), len(stored_dates) - 1)
+        present = stored_dates[index] == dates
+        revised = int(_changed(stored_values[index[present]], values[present]).sum())
+        all_dates = np.concatenate([stored_dates, dates])
+        all_values = np.concatenate([stored_values, values])
+        # Fetched values win over stored ones for the same date
+        _, last_index = np.unique(all_dates[::-1], return_index=True)
+        keep = len(all_dates) - 1 - last_index
+        merged_dates, merged_values = all_dates[keep], all_values[keep]
+        appended = len(merged_dates) - len(stored_dates)
+        series.replace(merged_dates, {"values": merged_values}, last_date=str(merged_dates[-1]),
+                       revisions=series.meta["revisions"] + revised, updated_at=time.time())
+        return {"appended": appended, "revised": revised}
+
+    def nbytes(self) -> int:
+        """Bytes on disk across all series."""
+        return directory_nbytes(self.root)
+
+
+def _changed(stored: np.ndarray, fetched: np.ndarray) -> np.ndarray:
+    """Where a fetched value differs from the stored one (NaN == NaN)."""
+    return ~((stored == fetched) | (np.isnan(stored) & np.isnan(fetched)))
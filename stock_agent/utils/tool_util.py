@@ -0,0 +1,255 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from .trace_util import current_span, registry
+from .cancel_util import current_token
+
+# Per-tool deadline (seconds) before the agent gets a "timed out" result instead of waiting forever.
+DEFAULT_TOOL_DEADLINE = float(os.environ.get("STOCK_AGENT_TOOL_DEADLINE_SECONDS", "45"))
+# Delay before a fallback provider is tried while a tool has too few samples for a p95
+# estimate. Duplicate (same-provider) hedges are never sent until there is a real p95.
+DEFAULT_HEDGE_DELAY = float(os.environ.get("STOCK_AGENT_TOOL_HEDGE_DELAY_SECONDS", "5"))
+MIN_HEDGE_DELAY = 0.25
+MIN_SAMPLES_FOR_P95 = 20
+# How often a waiting tool call checks whether its run was cancelled
+CANCEL_POLL_SECONDS = 0.25
+# Upper bound on one provider HTTP request; less when the tool's deadline is closer
+PROVIDER_TIMEOUT_SECONDS = float(os.environ.get("STOCK_AGENT_PROVIDER_TIMEOUT_SECONDS", "15"))
+# Attempts of one provider still running (including stragglers past their deadline) before
+# new attempts for it are refused, so a hung provider cannot take over the whole worker pool
+MAX_IN_FLIGHT_PER_PROVIDER = int(os.environ.get("STOCK_AGENT_TOOL_MAX_IN_FLIGHT", "8"))
+
+TOOL_OUTCOMES = registry.counter(
+    "stock_agent_tool_outcome_total", "Bounded tool call outcomes (ok, hedged, fallback, timed_out, failed, cancelled).", ("tool", "outcome"))
+TOOL_IN_FLIGHT = registry.gauge("stock_agent_tool_in_flight", "Provider attempts running in the tool pool.", ("provider",))
+
+# Provider calls are blocking; a straggler keeps its worker until the provider answers or its
+# request times out (provider_timeout), and still warms the TTL caches; the agent just stops
+# waiting for it. MAX_IN_FLIGHT_PER_PROVIDER keeps one hung provider from filling the pool.
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("STOCK_AGENT_TOOL_WORKERS", "32")), thread_name_prefix="tool")
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per tool, used to derive the hedge delay."""
+
+    def __init__(self, window: int = 200):
+        self._samples: dict[str, deque] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self._window)).append(seconds)
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < MIN_SAMPLES_FOR_P95:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def hedge_delay(self, key: str, deadline: float) -> Optional[float]:
+        """The tool's p95 latency (clamped), or None while there are too few samples for one."""
+        p95 = self.percentile(key, 0.95)
+        if p95 is None:
+            return None
+        return min(max(p95, MIN_HEDGE_DELAY), deadline)
+
+
+latency_tracker = LatencyTracker()
+
+_attempt_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("tool_attempt_deadline", default=None)
+_in_flight: dict[str, int] = {}
+_in_flight_lock = threading.Lock()
+
+
+def provider_timeout() -> float:
+    """
+    Timeout for one provider HTTP request made inside a bounded tool: the time left before
+    the tool's deadline, capped at PROVIDER_TIMEOUT_SECONDS (the cap alone outside a tool).
+    """
+    end = _attempt_deadline.get()
+    if end is None:
+        return PROVIDER_TIMEOUT_SECONDS
+    return max(1.0, min(PROVIDER_TIMEOUT_SECONDS, end - time.perf_counter()))
+
+
+def _run_attempt(end: float, thunk: Callable[[], Any]) -> Any:
+    _attempt_deadline.set(end)
+    return thunk()
+
+
+def _reserve(provider: str) -> bool:
+    with _in_flight_lock:
+        count = _in_flight.get(provider, 0)
+        if count >= MAX_IN_FLIGHT_PER_PROVIDER:
+            return False
+        _in_flight[provider] = count + 1
+    TOOL_IN_FLIGHT.set(count + 1, provider=provider)
+    return True
+
+
+def _release(provider: str):
+    with _in_flight_lock:
+        count = _in_flight[provider] = _in_flight[provider] - 1
+    TOOL_IN_FLIGHT.set(count, provider=provider)
+
+_policies: dict[str, dict] = {}
+
+
+def register_tool_policy(tool: BaseTool, deadline: Optional[float] = None, fallbacks: tuple = (), hedge: bool = False):
+    """
+    Configure how a tool is bounded inside agent subgraphs.
+    fallbacks: alternate-provider tools taking the same arguments, tried in order once the
+    primary is slower than its p95 or fails.
+    hedge: send a duplicate request to the same provider once the first is slower than its p95.
+    Only for cheap, idempotent network calls: a duplicate doubles paid and rate-limited requests
+    and misses the TTL cache together with the original, and CPU-bound local tools gain nothing.
+    """
+    _policies[tool.name] = {"deadline": deadline, "fallbacks": tuple(fallbacks), "hedge": hedge}
+
+
+def _is_error_payload(result: Any) -> bool:
+    # fetch helpers return {"error": "..."} for non-200 responses instead of raising
+    if isinstance(result, dict) and result:
+        if set(result) == {"error"}:
+            return True
+        return all(_is_error_payload(v) for v in result.values())
+    return False
+
+
+def call_with_deadline(
+    name: str,
+    attempts: list[tuple[str, Callable[[], Any]]],
+    deadline: Optional[float] = None,
+    hedge_delay: Optional[float] = None,
+    hedge: bool = False,
+) -> Any:
+    """
+    Run `attempts` (provider label, thunk) in order, launching the next one whenever the
+    current ones are slower than the hedge delay or have failed. The first successful
+    result wins. With `hedge` and a single attempt, a duplicate request is sent once the
+    tool's p95 is known and exceeded. If nothing succeeds before the deadline a structured
+    "timed out" result is returned instead of raising, so the agent can carry on.
+    """
+    deadline = deadline or DEFAULT_TOOL_DEADLINE
+    if hedge_delay is None:
+        hedge_delay = latency_tracker.hedge_delay(name, deadline)
+    queue = list(attempts)
+    if hedge and len(queue) == 1 and hedge_delay is not None:
+        queue.append(queue[0])  # hedge with a duplicate request
+    if hedge_delay is None:
+        hedge_delay = min(DEFAULT_HEDGE_DELAY, deadline)  # no p95 yet: only fallbacks use this
+
+    start = time.perf_counter()
+    end = start + deadline
+    pending: dict = {}  # future -> (provider, launched_at, attempt index)
+    errors: list[str] = []
+    launched = 0
+
+    def launch():
+        nonlocal launched
+        provider, thunk = queue.pop(0)
+        launched += 1
+        if not _reserve(provider):
+            errors.append(f"{provider}: {MAX_IN_FLIGHT_PER_PROVIDER} earlier calls still running, not launched")
+            return
+        future = _executor.submit(contextvars.copy_context().run, _run_attempt, end, thunk)
+        future.add_done_callback(lambda _, provider=provider: _release(provider))
+        pending[future] = (provider, time.perf_counter(), launched - 1)
+
+    token = current_token()
+    launch()
+    last_launch = start
+    while pending or queue:
+        now = time.perf_counter()
+        if now >= end:
+            break
+        if token is not None and token.cancelled:
+            # Stragglers finish in the background (and still warm the caches); stop waiting for them
+            _record(name, "cancelled", time.perf_counter() - start, None)
+            return {"status": "cancelled", "tool": name, "partial": True, "reason": token.reason}
+        if not pending or (queue and now >= last_launch + hedge_delay):
+            launch()
+            last_launch = time.perf_counter()
+            continue
+        timeout = end - now
+        if queue:
+            timeout = min(timeout, max(0.0, last_launch + hedge_delay - now))
+        if token is not None:
+            timeout = min(timeout, CANCEL_POLL_SECONDS)
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            provider, launched_at, index = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append(f"{provider}: {e}")
+                continue
+            if _is_error_payload(result):
+                errors.append(f"{provider}: {result}")
+                continue
+            elapsed = time.perf_counter() - launched_at
+            if provider == name:
+                latency_tracker.record(name, elapsed)
+            outcome = "ok" if index == 0 else ("hedged" if provider == name else "fallback")
+            _record(name, outcome, time.perf_counter() - start, provider)
+            if provider != name:
+                return {"provider": provider, "fallback_from": name, "data": result}
+            return result
+
+    timed_out = time.perf_counter() >= end
+    outcome = "timed_out" if timed_out else "failed"
+    _record(name, outcome, time.perf_counter() - start, None)
+    return {
+        "status": outcome,
+        "tool": name,
+        "partial": True,
+        "elapsed_seconds": round(time.perf_counter() - start, 2),
+        "deadline_seconds": deadline,
+        "errors": errors,
+        "message": (
+            f"{name} did not return within {deadline:.0f}s. Continue with the data you already have "
+            f"and mention that this source was unavailable."
+            if timed_out else f"{name} failed for every provider. Continue with the data you already have."
+        ),
+    }
+
+
+def _record(name: str, outcome: str, seconds: float, provider: Optional[str]):
+    TOOL_OUTCOMES.inc(tool=name, outcome=outcome)
+    span = current_span()
+    if span is not None:
+        span.set(**{f"tool.{name}": {"outcome": outcome, "seconds": round(seconds, 3), "provider": provider}})
+    if outcome != "ok":
+        print(f"INFO: tool {name} finished with outcome={outcome} after {seconds:.1f}s (provider={provider})")
+
+
+def _invoke_quietly(tool: BaseTool, kwargs: dict) -> Any:
+    # The bounded wrapper already reports start/end to the callbacks; don't repeat it per attempt
+    return tool.invoke(kwargs, config={"callbacks": []})
+
+
+def bounded_tool(tool: BaseTool) -> BaseTool:
+    """Same name, description and schema as `tool`, but deadline-bounded and hedged per its policy."""
+    policy = _policies.get(tool.name, {})
+    fallbacks = policy.get("fallbacks", ())
+
+    def _run(**kwargs):
+        attempts = [(tool.name, lambda: _invoke_quietly(tool, kwargs))]
+        attempts += [(alt.name, (lambda alt=alt: _invoke_quietly(alt, kwargs))) for alt in fallbacks]
+        return call_with_deadline(tool.name, attempts, deadline=policy.get("deadline"), hedge=policy.get("hedge", False))
+
+    return StructuredTool.from_function(
+        func=_run,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+    )
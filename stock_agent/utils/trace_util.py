@@ -0,0 +1,389 @@
+import contextvars
+import functools
+import inspect
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from cachetools.keys import hashkey
+from langchain_core.runnables import Runnable, RunnableLambda
+
+# Span currently open in this context (node -> llm/tool nesting) and the run it belongs to.
+# LangGraph copies the context into every task/executor thread, so parallel branches share the run.
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("trace_span", default=None)
+_current_run: contextvars.ContextVar[Optional["RunTrace"]] = contextvars.ContextVar("trace_run", default=None)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+BYTES_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram keyed by label values."""
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {bucket_count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Counter:
+    """Prometheus-style monotonically increasing counter keyed by label values."""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge:
+    """Prometheus-style gauge (current value) keyed by label values."""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: Any):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any):
+        self.inc(-amount, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory: Callable[[], Any]):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = SECONDS_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, help, labels, buckets))
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple = ()) -> Gauge:
+        return self._get_or_create(name, lambda: Gauge(name, help, labels))
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+NODE_SECONDS = registry.histogram("stock_agent_node_duration_seconds", "Graph node wall time.", ("node",))
+LLM_SECONDS = registry.histogram("stock_agent_llm_duration_seconds", "LLM call wall time.", ("node",))
+LLM_TOKENS = registry.counter("stock_agent_llm_tokens_total", "LLM tokens by direction.", ("node", "direction"))
+TOOL_SECONDS = registry.histogram("stock_agent_tool_duration_seconds", "Tool/provider call wall time.", ("tool", "provider", "cache"))
+TOOL_BYTES = registry.histogram("stock_agent_tool_payload_bytes", "Approximate tool payload size.", ("tool", "provider"), BYTES_BUCKETS)
+
+
+def render_prometheus() -> str:
+    return registry.render_prometheus()
+
+
+def payload_size(obj: Any, overhead: bool = False) -> int:
+    """
+    Approximate in-memory size of a tool payload without serialising it. With `overhead`,
+    strings are counted with their object headers, so the total is what holding the payload
+    costs (the cache budget) rather than how much data it carries (the payload metric).
+    """
+    total = 0
+    seen = set()
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if item is None or id(item) in seen:
+            continue
+        seen.add(id(item))
+        if isinstance(item, (str, bytes, bytearray)):
+            total += sys.getsizeof(item) if overhead else len(item)
+            continue
+        memory_usage = getattr(item, "memory_usage", None)  # pandas DataFrame / Series
+        if callable(memory_usage) and hasattr(item, "index"):
+            try:
+                usage = memory_usage(index=True, deep=True)
+                total += int(usage.sum() if hasattr(usage, "sum") else usage)
+                continue
+            except Exception:
+                pass
+        nbytes = getattr(item, "nbytes", None)  # numpy arrays
+        if isinstance(nbytes, int):
+            total += nbytes
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str  # "node" | "llm" | "tool"
+    start: float
+    end: Optional[float] = None
+    parent: Optional["Span"] = None
+    attributes: dict = field(default_factory=dict)
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def node(self) -> Optional["Span"]:
+        """Closest enclosing graph node span (or self)."""
+        span = self
+        while span is not None and span.kind != "node":
+            span = span.parent
+        return span
+
+
+class RunTrace:
+    """Collects the spans of one graph run and derives its critical path."""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.start = time.perf_counter()
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def critical_path(self) -> list[Span]:
+        """
+        Walk back from the last node to finish, each step picking the predecessor that
+        finished latest before the current node started (the branch it was waiting on).
+        """
+        with self._lock:
+            nodes = [s for s in self.spans if s.kind == "node" and s.end is not None]
+        if not nodes:
+            return []
+        current = max(nodes, key=lambda s: s.end)
+        path = [current]
+        while True:
+            predecessors = [s for s in nodes if s.end <= current.start + 1e-6 and s is not current]
+            if not predecessors:
+                break
+            current = max(predecessors, key=lambda s: s.end)
+            path.append(current)
+        path.reverse()
+        return path
+
+    def summary(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        llm_spans = [s for s in spans if s.kind == "llm"]
+        tool_spans = [s for s in spans if s.kind == "tool"]
+        path = []
+        for node in self.critical_path():
+            children = [s for s in spans if s.kind != "node" and s.node() is node]
+            path.append({
+                "node": node.name,
+                "seconds": round(node.duration, 3),
+                "llm_seconds": round(sum(s.duration for s in children if s.kind == "llm"), 3),
+                "tool_seconds": round(sum(s.duration for s in children if s.kind == "tool"), 3),
+            })
+        return {
+            "run_id": self.run_id,
+            "wall_seconds": round(time.perf_counter() - self.start, 3),
+            "critical_path": path,
+            "critical_path_seconds": round(sum(p["seconds"] for p in path), 3),
+            "llm_calls": len(llm_spans),
+            "prompt_tokens": sum(s.attributes.get("prompt_tokens", 0) for s in llm_spans),
+            "completion_tokens": sum(s.attributes.get("completion_tokens", 0) for s in llm_spans),
+            "tool_calls": len(tool_spans),
+            "cache_hits": sum(1 for s in tool_spans if s.attributes.get("cache") == "hit"),
+        }
+
+
+def _record(span: Span):
+    attrs = span.attributes
+    if span.kind == "node":
+        NODE_SECONDS.observe(span.duration, node=span.name)
+    elif span.kind == "llm":
+        node = attrs.get("node", span.name)
+        LLM_SECONDS.observe(span.duration, node=node)
+        LLM_TOKENS.inc(attrs.get("prompt_tokens", 0), node=node, direction="prompt")
+        LLM_TOKENS.inc(attrs.get("completion_tokens", 0), node=node, direction="completion")
+    elif span.kind == "tool":
+        TOOL_SECONDS.observe(span.duration, tool=span.name, provider=attrs.get("provider", ""), cache=attrs.get("cache", "none"))
+        if "payload_bytes" in attrs:
+            TOOL_BYTES.observe(attrs["payload_bytes"], tool=span.name, provider=attrs.get("provider", ""))
+    run = _current_run.get()
+    if run is not None:
+        run.add(span)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, kind: str, **attributes: Any):
+    s = Span(name=name, kind=kind, start=time.perf_counter(), parent=_current_span.get(), attributes=dict(attributes))
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.set(error=type(e).__name__)
+        raise
+    finally:
+        s.end = time.perf_counter()
+        _current_span.reset(token)
+        _record(s)
+
+
+@contextmanager
+def trace_run(run_id: str):
+    """Collect every span opened in this context (and tasks spawned from it) into one RunTrace."""
+    run = RunTrace(run_id)
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        try:
+            _current_run.reset(token)
+        except ValueError:  # async generator finalised from another context
+            pass
+
+
+def traced_node(name: str, node: Callable) -> Runnable:
+    """
+    Wrap a graph node in a "node" span. Nodes in agents.py return a compiled subgraph,
+    which is invoked here with the same config so callbacks keep propagating.
+    """
+    if inspect.iscoroutinefunction(node):
+        async def _anode(state):
+            with span(name, "node"):
+                return await node(state)
+        return RunnableLambda(_anode, name=name)
+
+    def _invoke(state, config):
+        with span(name, "node"):
+            result = node(state)
+            if isinstance(result, Runnable):
+                result = result.invoke(state, config)
+        return result
+
+    async def _ainvoke(state, config):
+        with span(name, "node"):
+            result = node(state)
+            if isinstance(result, Runnable):
+                result = await result.ainvoke(state, config)
+        return result
+
+    return RunnableLambda(_invoke, afunc=_ainvoke, name=name)
+
+
+def traced_fetch(provider: str):
+    """
+    Wrap a provider fetch (or a cachetools-cached helper) in a "tool" span recording
+    provider, cache hit/miss and payload size.
+    """
+    def decorator(func):
+        cache = getattr(func, "cache", None)
+        cache_key = getattr(func, "cache_key", hashkey)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if cache is None:
+                cache_state = "none"
+            else:
+                try:
+                    cache_state = "hit" if cache_key(*args, **kwargs) in cache else "miss"
+                except TypeError:  # unhashable arguments
+                    cache_state = "miss"
+            with span(func.__name__, "tool", provider=provider, cache=cache_state) as s:
+                result = func(*args, **kwargs)
+                s.set(payload_bytes=payload_size(result))
+            return result
+
+        return wrapper
+    return decorator
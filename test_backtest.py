@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from stock_agent.utils import backtest_util
+from stock_agent.utils.backtest_util import BacktestError, backtest_ticker, evaluate, sweep
+
+
+def test_position_earns_the_next_day_return():
+    close = np.array([100.0, 110.0, 99.0])
+    positions = np.array([
+        [1.0, 0.0, 0.0],  # long at the first close: earns 100 -> 110
+        [0.0, 1.0, 0.0],  # long at the second close: earns 110 -> 99
+        [0.0, 0.0, 1.0],  # long at the last close: nothing left to earn
+    ])
+    stats = evaluate(positions, close, cost_bps=0.0)
+    np.testing.assert_allclose(stats["total_return"], [0.1, -0.1, 0.0])
+    np.testing.assert_array_equal(stats["trades"], [1, 1, 0])
+
+
+def test_no_look_ahead():
+    # Long exactly on the days before a rise: with look-ahead this would never lose
+    close = np.array([100.0, 101.0, 100.0, 102.0, 101.0, 103.0])
+    peek = (np.diff(close, append=close[-1]) > 0).astype(float)[None, :]
+    lagged = np.concatenate([[0.0], peek[0, :-1]])[None, :]  # the same signal one day late
+    assert evaluate(peek, close, cost_bps=0.0)["total_return"][0] > 0
+    assert evaluate(lagged, close, cost_bps=0.0)["total_return"][0] < 0
+
+
+def test_costs_are_charged_per_position_change():
+    close = np.full(4, 100.0)  # flat prices: only costs move equity
+    positions = np.array([[1.0, 1.0, 1.0, 1.0], [1.0, 0.0, 1.0, 0.0]])
+    stats = evaluate(positions, close, cost_bps=10.0)
+    np.testing.assert_allclose(stats["total_return"], [0.999 - 1, 0.999 ** 3 - 1])
+
+
+def test_chunked_sweep_matches_one_batch(monkeypatch):
+    close = 100 * np.cumprod(1 + np.random.default_rng(0).normal(0, 0.01, 400))
+    grid = {"fast": (5, 10, 20), "slow": (30, 50, 100)}
+    whole = sweep(close, "sma_cross", grid, top=20)
+    monkeypatch.setattr(backtest_util, "CHUNK_ROWS", 2)
+    chunked = sweep(close, "sma_cross", grid, top=20)
+    assert chunked["best"] == whole["best"]
+    assert chunked["standard"] == whole["standard"]
+
+
+def test_unknown_strategy_is_rejected_before_fetching(monkeypatch):
+    monkeypatch.setattr(backtest_util, "_fetch_closes", lambda *args: pytest.fail("fetched prices"))
+    with pytest.raises(BacktestError):
+        backtest_ticker("AAPL", ["sma_cross", "momentum"])
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+
+from cachetools import cached
+from cachetools.keys import hashkey
+
+from stock_agent.utils.cache_util import BudgetedTTLCache, CacheBudget, deep_sizeof
+
+
+def test_deep_sizeof_counts_nested_payloads():
+    payload = {"values": ["x" * 1000, "y" * 1000]}
+    assert deep_sizeof(payload) >= 2 * sys.getsizeof("x" * 1000)
+
+
+def test_largest_entry_goes_first():
+    budget = CacheBudget(limit=2500)
+    cache = BudgetedTTLCache("a", ttl=3600, budget=budget)
+    cache["small"] = "s" * 100
+    cache["big"] = "b" * 2000
+    cache["mid"] = "m" * 400  # over the budget: equal hits and cost, so the biggest entry is cheapest to lose
+    assert set(cache) == {"small", "mid"}
+    assert budget.currsize <= budget.limit and budget.evictions == 1
+
+
+def test_hits_keep_an_entry():
+    budget = CacheBudget(limit=2 * deep_sizeof("x" * 1000) + 100)
+    cache = BudgetedTTLCache("a", ttl=3600, budget=budget)
+    cache["hot"] = "h" * 1000
+    cache["cold"] = "c" * 1000
+    for _ in range(3):
+        cache["hot"]
+    cache["new"] = "n" * 1000
+    assert set(cache) == {"hot", "new"}
+
+
+def test_budget_is_shared_and_weighs_refetch_cost():
+    budget = CacheBudget(limit=2 * deep_sizeof("x" * 1000) + 100)
+    slow_cache = BudgetedTTLCache("slow", ttl=3600, budget=budget)
+    fast_cache = BudgetedTTLCache("fast", ttl=3600, budget=budget)
+
+    @cached(cache=slow_cache)
+    def slow(key):
+        time.sleep(0.05)
+        return "s" * 1000
+
+    @cached(cache=fast_cache)
+    def fast(key):
+        return "f" * 1000
+
+    slow(1)
+    fast(1)
+    fast(2)  # one fast entry goes, not the slow one: that costs far more to refetch
+    assert list(slow_cache) == [hashkey(1)] and len(fast_cache) == 1
+    assert budget.currsize <= budget.limit
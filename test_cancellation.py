@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import operator
+import threading
+import time
+from typing import Annotated, TypedDict
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+from backend.coalescing import RunCoalescer
+from stock_agent.utils.agent_util import create_agent_with_tool
+from stock_agent.utils.cancel_util import CancelToken, cancel_scope
+from stock_agent.utils.tool_util import call_with_deadline
+from stock_agent.utils.trace_util import traced_node
+
+LLM_LATENCY = 2.0
+# Work must stop this soon after the grace period following the disconnect
+STOP_BOUND = 1.0
+
+
+class StubLLM:
+    """Async chat model stand-in that records started, cancelled and finished calls."""
+
+    def __init__(self):
+        self.started = 0
+        self.cancelled = 0
+        self.finished = 0
+
+    async def _ainvoke(self, messages):
+        self.started += 1
+        try:
+            await asyncio.sleep(LLM_LATENCY)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.finished += 1
+        return AIMessage(content="stub analysis")
+
+    def runnable(self):
+        return RunnableLambda(lambda messages: AIMessage(content="stub analysis"), afunc=self._ainvoke)
+
+
+class State(TypedDict):
+    messages: Annotated[list[AnyMessage], add_messages]
+    done: Annotated[list, operator.add]
+
+
+def build_graph(llm):
+    # Two parallel analyst branches joined by a manager, as in app.py
+    builder = StateGraph(State)
+    for name in ("analyst_a", "analyst_b", "manager"):
+        builder.add_node(name, traced_node(name, lambda state, name=name: create_agent_with_tool(llm=llm, system_prompt="", name=name)))
+    builder.add_edge(START, "analyst_a")
+    builder.add_edge(START, "analyst_b")
+    builder.add_edge(["analyst_a", "analyst_b"], "manager")
+    builder.add_edge("manager", END)
+    return builder.compile()
+
+
+def make_source(graph, tokens):
+    async def source(run_id):
+        token = CancelToken()
+        tokens.append(token)
+        try:
+            yield {"run_id": run_id}
+            with cancel_scope(token):
+                async for event in graph.astream({"messages": [HumanMessage(content="Analyze AAPL stock.")]}, stream_mode="updates"):
+                    yield {"content": str(list(event))}
+        except asyncio.CancelledError as e:
+            token.cancel((e.args[0] if e.args else None) or "cancelled")
+            raise
+    return source
+
+
+def test_disconnect_cancels_parallel_llm_calls():
+    async def scenario():
+        stub = StubLLM()
+        tokens = []
+        coalescer = RunCoalescer(window=0, cancel_grace=0.05)
+        run = coalescer.attach(("AAPL", "analyze aapl stock.", "full"), make_source(build_graph(stub.runnable()), tokens))
+
+        stream = coalescer.stream(run)
+        await stream.__anext__()  # the run_id event
+        while stub.started < 2:
+            await asyncio.sleep(0.01)
+        disconnected_at = time.perf_counter()
+        await stream.aclose()  # the SSE client goes away
+
+        await asyncio.wait_for(asyncio.gather(run.task, return_exceptions=True), timeout=0.05 + STOP_BOUND)
+        return stub, run, tokens[0], time.perf_counter() - disconnected_at
+
+    stub, run, token, stopped_after = asyncio.run(scenario())
+    assert stopped_after < 0.05 + STOP_BOUND
+    assert stub.started == 2 and stub.cancelled == 2 and stub.finished == 0  # both branches cancelled, manager never ran
+    assert run.done and run.task.cancelled()
+    assert run.cancel_reason == "client_disconnected" and token.reason == "client_disconnected"
+    assert run.events[-1][1] == {"cancelled": "client_disconnected"}
+
+
+def test_reconnect_within_grace_keeps_run_alive():
+    async def scenario():
+        stub = StubLLM()
+        coalescer = RunCoalescer(window=0, cancel_grace=0.2)
+        run = coalescer.attach("key", make_source(build_graph(stub.runnable()), []))
+        first = coalescer.stream(run)
+        await first.__anext__()
+        await first.aclose()
+        await asyncio.sleep(0.05)
+        events = [event async for _, batch in coalescer.stream(run, after=1) for _, event in batch]
+        return stub, run, events
+
+    stub, run, events = asyncio.run(scenario())
+    assert not run.task.cancelled()
+    assert stub.finished == 3 and stub.cancelled == 0
+    assert "cancelled" not in events[-1]
+
+
+def test_cancelled_token_stops_waiting_for_tool():
+    release = threading.Event()
+
+    def slow_provider():
+        release.wait(10)
+        return {"price": 1}
+
+    token = CancelToken()
+    threading.Timer(0.1, token.cancel, args=("client_disconnected",)).start()
+    start = time.perf_counter()
+    with cancel_scope(token):
+        result = call_with_deadline("slow_tool", [("slow_tool", slow_provider)], deadline=10, hedge=False)
+    release.set()
+    assert result["status"] == "cancelled" and result["reason"] == "client_disconnected"
+    assert time.perf_counter() - start < 0.1 + STOP_BOUND
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Cold-start budget for `import stock_agent.app`, in milliseconds (override for slow CI boxes).
+IMPORT_BUDGET_MS = float(os.environ.get("STOCK_AGENT_IMPORT_BUDGET_MS", "2500"))
+
+# Provider SDKs that must only be imported when a tool or LLM is first used.
+LAZY_MODULES = (
+    "yfinance",
+    "finnhub",
+    "langchain_google_genai",
+    "langchain_deepseek",
+    "langchain_openai",
+    "langchain_tavily",
+    "google.cloud.firestore",
+)
+
+def _importtime(module: str) -> dict:
+    """Run `python -X importtime -c 'import <module>'` in a fresh interpreter; returns {module: cumulative_us}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if len(parts) != 3 or not parts[1].isdigit():
+            continue  # header line
+        timings[parts[2]] = int(parts[1])
+    return timings
+
+def test_stock_agent_import_time():
+    pytest.importorskip("langgraph")
+    timings = _importtime("stock_agent.app")
+
+    eager = [m for m in LAZY_MODULES if m in timings]
+    assert not eager, f"Provider modules imported eagerly: {eager}"
+
+    total_ms = timings["stock_agent.app"] / 1000
+    print(f"import stock_agent.app: {total_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    assert total_ms <= IMPORT_BUDGET_MS, f"Cold import took {total_ms:.0f} ms, budget is {IMPORT_BUDGET_MS:.0f} ms"
+
+if __name__ == "__main__":
+    test_stock_agent_import_time()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_agent.utils import ohlcv_util
+from stock_agent.utils.ohlcv_util import OHLCVStore
+
+
+class Provider:
+    """yfinance history() stand-in over one adjusted daily history; records every download."""
+
+    def __init__(self, days: int = 300):
+        index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=days)
+        close = np.linspace(100.0, 200.0, days)
+        self.full = pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+                                  "Volume": np.full(days, 1e6)}, index=index)
+        self.history = self.full.iloc[:-1]  # today's bar is not out yet
+        self.calls = []
+
+    def __call__(self, ticker, period=None, start=None):
+        self.calls.append("full" if start is None else "incremental")
+        return self.history if start is None else self.history[self.history.index >= pd.Timestamp(start)]
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setattr(ohlcv_util, "OHLCV_REFRESH_SECONDS", -1)  # every read asks for newer bars
+    return Provider()
+
+
+def test_new_bars_are_appended(tmp_path, provider):
+    store = OHLCVStore(str(tmp_path), download=provider)
+    assert len(store.bars("AAA", "max").dates) == 299
+    provider.history = provider.full
+    bars = store.bars("AAA", "max")
+    assert provider.calls == ["full", "incremental"]
+    np.testing.assert_array_equal(bars.dates, provider.full.index.to_numpy(dtype="datetime64[D]"))
+    np.testing.assert_array_equal(bars.close, provider.full["Close"].to_numpy())
+
+
+def test_latest_bar_is_patched_without_a_rebuild(tmp_path, provider):
+    store = OHLCVStore(str(tmp_path), download=provider)
+    store.bars("AAA", "1y")
+    provider.history = provider.history.copy()
+    provider.history.iloc[-1, provider.history.columns.get_loc("Close")] = 250.0  # intraday snapshot settled
+    bars = store.bars("AAA", "1y")
+    assert provider.calls == ["full", "incremental"]
+    assert bars.close[-1] == 250.0
+
+
+def test_changed_overlap_triggers_a_rebuild(tmp_path, provider):
+    store = OHLCVStore(str(tmp_path), download=provider)
+    store.bars("AAA", "1y")
+    provider.history = provider.history / 2  # a split re-based the adjusted history
+    store.bars("AAA", "1y")
+    assert provider.calls == ["full", "incremental", "full"]
+    np.testing.assert_array_equal(store.bars("AAA", "max", refresh=False).close, provider.history["Close"].to_numpy())
+    assert store._get("AAA").meta["rebuilds"] == 2
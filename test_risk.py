@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_agent.utils.risk_util import (
+    TRADING_DAYS, RiskEngine, RiskError, betas, historical_var, parametric_var, rolling_volatility)
+
+
+def test_rolling_volatility_matches_naive_std():
+    rng = np.random.default_rng(0)
+    # A large mean on one column: the running sums must not lose the small variance to it
+    returns = np.column_stack([rng.normal(0.0, 0.02, 300), rng.normal(0.5, 0.001, 300)])
+    window = 21
+    naive = np.array([returns[i:i + window].std(axis=0, ddof=1) for i in range(len(returns) - window + 1)])
+    np.testing.assert_allclose(rolling_volatility(returns, window), naive * math.sqrt(TRADING_DAYS), rtol=1e-9)
+
+
+def test_rolling_volatility_needs_a_full_window():
+    with pytest.raises(RiskError):
+        rolling_volatility(np.zeros((5, 1)), window=21)
+
+
+def test_historical_var_and_shortfall():
+    # -0.50, -0.49, ..., 0.50: the 5% quantile falls exactly on the sixth-worst day
+    returns = np.round(np.arange(-50, 51) / 100, 2)[:, None]
+    var, shortfall = historical_var(returns, 0.95)
+    assert var[0] == pytest.approx(0.45)
+    assert shortfall[0] == pytest.approx(0.475)  # mean of -0.50 ... -0.45
+
+
+def test_parametric_var():
+    returns = np.array([0.01, -0.01, 0.01, -0.01])[:, None]  # mean 0, sample std 0.01 * sqrt(4/3)
+    expected = NormalDist().inv_cdf(0.99) * 0.01 * math.sqrt(4 / 3)
+    assert parametric_var(returns, 0.99)[0] == pytest.approx(expected)
+
+
+def test_betas():
+    market = np.array([0.01, -0.02, 0.015, 0.0, -0.005, 0.03])
+    returns = np.column_stack([2 * market + 0.001, -0.5 * market, np.full(6, 0.002)])
+    np.testing.assert_allclose(betas(returns, market), [2.0, -0.5, 0.0], atol=1e-12)
+
+
+def _engine() -> RiskEngine:
+    index = pd.bdate_range("2024-01-01", periods=60)
+    rng = np.random.default_rng(1)
+    closes = {t: pd.Series(100 * np.cumprod(1 + rng.normal(0, 0.01, len(index))), index=index)
+              for t in ("AAA", "BBB", "SPY")}
+    return RiskEngine(lambda ticker, period: closes.get(ticker))
+
+
+def test_portfolio_weights_are_normalized():
+    result = _engine().portfolio(["AAA", "BBB"], weights=[3, 1])
+    assert result["weights"] == [0.75, 0.25]
+
+
+def test_portfolio_rejects_zero_weight_sum():
+    with pytest.raises(RiskError):
+        _engine().portfolio(["AAA", "BBB"], weights=[1, -1])
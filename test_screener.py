@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from stock_agent.utils.screener_util import Screener, ScreenerError
+
+METRICS = {
+    "AAA": {"peTTM": 10.0, "roeTTM": 30.0},
+    "BBB": {"peTTM": 15.0, "roeTTM": 10.0},
+    "CCC": {"peTTM": 40.0, "roeTTM": 20.0},
+    "DDD": {"roeTTM": 50.0},  # no P/E
+}
+
+
+class MemoryStore:
+    """Just enough of a DocumentStore for the screener."""
+
+    def __init__(self):
+        self.documents = {}
+
+    def items(self, collection):
+        return list(self.documents.items())
+
+    def upsert(self, collection, key, data, merge=True):
+        self.documents[key] = data
+
+
+@pytest.fixture
+def screener():
+    screener = Screener(store=MemoryStore(), fetch=lambda ticker: {"metric": METRICS[ticker]})
+    screener.ensure(list(METRICS))
+    return screener
+
+
+def tickers(result: dict) -> list[str]:
+    return [row["ticker"] for row in result["results"]]
+
+
+def test_filter_and_sort(screener):
+    assert tickers(screener.screen("pe < 20", "roe")) == ["AAA", "BBB"]
+    assert tickers(screener.screen("", "roe", ascending=True)) == ["BBB", "CCC", "AAA", "DDD"]
+
+
+def test_missing_metric_never_matches(screener):
+    # NaN fails < but passes != and `not`; DDD has no P/E and must match none of these
+    for expression in ("pe != 10", "not pe < 20", "pe < 20 or pe >= 20"):
+        assert "DDD" not in tickers(screener.screen(expression))
+
+
+def test_missing_sort_values_rank_last(screener):
+    assert tickers(screener.screen("", "pe", ascending=True)) == ["AAA", "BBB", "CCC", "DDD"]
+
+
+def test_limit(screener):
+    assert tickers(screener.screen("", "roe", limit=2)) == ["DDD", "AAA"]
+    assert len(screener.screen("", "roe", limit=0)["results"]) == 4  # 0: no limit
+    with pytest.raises(ScreenerError):
+        screener.screen("", "roe", limit=-1)
+
+
+def test_unknown_metric(screener):
+    with pytest.raises(ScreenerError):
+        screener.screen("nonsense > 1")
+
+
+def test_empty_universe():
+    result = Screener(store=MemoryStore()).screen("pe < 20", "roe")
+    assert result["universe"] == 0 and result["results"] == []
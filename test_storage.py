@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from stock_agent.utils.storage_util import DocumentStore, SQLiteDocumentStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteDocumentStore(str(tmp_path / "documents.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_merge_replaces_top_level_fields_only(store):
+    store.upsert("c", "AAPL", {"metric": {"pe": 30, "pb": 40}, "name": "Apple", "tags": [1, 2]})
+    store.upsert("c", "AAPL", {"metric": {"pe": 25}, "tags": [3]})
+    # Nested objects are replaced whole (no deep merge); untouched fields stay
+    assert store.get("c", "AAPL") == {"metric": {"pe": 25}, "name": "Apple", "tags": [3]}
+
+
+def test_merge_stores_none_as_null(store):
+    store.upsert("c", "AAPL", {"name": "Apple", "sector": "Tech"})
+    store.upsert("c", "AAPL", {"sector": None})
+    assert store.get("c", "AAPL") == {"name": "Apple", "sector": None}
+
+
+def test_upsert_without_merge_replaces_the_document(store):
+    store.upsert("c", "AAPL", {"name": "Apple", "sector": "Tech"})
+    store.upsert("c", "AAPL", {"name": "Apple Inc."}, merge=False)
+    assert store.get("c", "AAPL") == {"name": "Apple Inc."}
+
+
+def test_upsert_many_merges_per_key(store):
+    store.upsert_many("c", {"A": {"x": 1, "y": 1}, "B": {"x": 1}})
+    assert store.upsert_many("c", {"A": {"y": 2}, "C": {"z": 3}}) == 2
+    assert dict(store.items("c")) == {"A": {"x": 1, "y": 2}, "B": {"x": 1}, "C": {"z": 3}}
+
+
+def test_document_store_is_abstract():
+    with pytest.raises(TypeError):
+        DocumentStore()